@@ -0,0 +1,4 @@
+from movies.asgi import create_asgi_app
+
+# Serve with any ASGI server, e.g. `uvicorn asgi:app`.
+app = create_asgi_app()
@@ -0,0 +1,34 @@
+import csv
+import os
+import shutil
+
+from movies.adapters.memory_repository import read_csv_file
+
+BUNDLED_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'movies', 'adapters',
+                                 'data')
+
+MOVIES_HEADER = ['Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)', 'Rating',
+                 'Votes', 'Revenue (Millions)', 'Metascore']
+
+
+def write_scaled_catalog(data_path: str, number_of_movies: int):
+    """ Writes a movies.csv with number_of_movies rows, cycling through the bundled movies with fresh ids and titles.
+
+    The bundled users.csv and comments.csv are copied alongside it.
+    """
+    os.makedirs(data_path, exist_ok=True)
+    rows = list(read_csv_file(os.path.join(BUNDLED_DATA_PATH, 'movies.csv')))
+
+    with open(os.path.join(data_path, 'movies.csv'), 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(MOVIES_HEADER)
+        for index in range(number_of_movies):
+            row = list(rows[index % len(rows)])
+            row[0] = str(index + 1)
+            if index >= len(rows):
+                # Movies compare equal on their attributes, so copies need a distinct title.
+                row[1] = f'{row[1]} ({index // len(rows) + 1})'
+            writer.writerow(row)
+
+    for filename in ('users.csv', 'comments.csv'):
+        shutil.copyfile(os.path.join(BUNDLED_DATA_PATH, filename), os.path.join(data_path, filename))
@@ -0,0 +1,269 @@
+"""Deterministic synthetic catalog generator for load testing.
+
+Writes movies.csv, users.csv and comments.csv in the formats read by movies.adapters.memory_repository.populate.
+Rows are streamed to disk one at a time, so memory use doesn't grow with the number of rows.
+
+Usage:
+    python -m benchmarks.generate_catalog /tmp/catalog --movies 1000000 --users 100000 --comments 5000000 --seed 7
+    python -m benchmarks.generate_catalog /tmp/catalog --movies 100000 --hash-passwords --hash-method pbkdf2:sha256:1000
+
+User n is called 'user<n>' and its password is password_for(n, seed), so load tests can log in as any generated user.
+"""
+import argparse
+import csv
+import hashlib
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+MOVIES_HEADER = ['Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)', 'Rating',
+                 'Votes', 'Revenue (Millions)', 'Metascore']
+USERS_HEADER = ['id', 'username', 'password']
+COMMENTS_HEADER = ['id', 'author-id', 'movie-id', 'comment-text', 'timestamp']
+
+# Genres of the bundled catalog, most popular first.
+GENRES = ['Drama', 'Action', 'Comedy', 'Adventure', 'Thriller', 'Crime', 'Romance', 'Sci-Fi', 'Horror', 'Mystery',
+          'Fantasy', 'Biography', 'Family', 'Animation', 'History', 'Sport', 'Music', 'War', 'Western', 'Musical']
+
+# Proportions measured on the bundled movies.csv.
+REVENUE_NOT_AVAILABLE_RATE = 0.128
+METASCORE_NOT_AVAILABLE_RATE = 0.064
+GENRES_PER_MOVIE_WEIGHTS = ((1, 0.105), (2, 0.235), (3, 0.66))
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Betty', 'Mark', 'Margaret', 'Steven', 'Sandra',
+               'Paul', 'Ashley', 'Andrew', 'Emily', 'Kenneth', 'Donna', 'Joshua', 'Michelle', 'Kevin', 'Carol']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+              'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores']
+ADJECTIVES = ['Silent', 'Crimson', 'Last', 'Hidden', 'Broken', 'Golden', 'Dark', 'Lost', 'Endless', 'Frozen',
+              'Burning', 'Secret', 'Wild', 'Distant', 'Final', 'Forgotten', 'Hollow', 'Electric', 'Savage', 'Quiet']
+NOUNS = ['Horizon', 'Kingdom', 'River', 'Empire', 'Shadow', 'Promise', 'Signal', 'Garden', 'Storm', 'Frontier',
+         'Memory', 'Island', 'Machine', 'Harbor', 'Crown', 'Witness', 'Voyage', 'Circle', 'Dawn', 'Legacy']
+SUBJECTS = ['A retired detective', 'An estranged sibling', 'A young engineer', 'A small-town teacher',
+            'A group of friends', 'An ambitious journalist', 'A reluctant soldier', 'A gifted musician']
+ACTIONS = ['must uncover', 'set out to find', 'is forced to confront', 'discovers', 'races against time to stop',
+           'struggles to protect', 'stumbles upon', 'fights to reclaim']
+OBJECTS = ['a conspiracy that reaches the highest levels of power.', 'the truth about their family.',
+           'a threat from beyond the stars.', 'a secret buried for decades.', 'the city they call home.',
+           'a love they thought was lost.', 'an ancient and dangerous artifact.', 'the people who betrayed them.']
+COMMENT_OPENINGS = ['Loved it.', 'Not my thing.', 'Surprisingly good.', 'A bit too long.', 'Great cast.',
+                    'Stunning visuals.', 'The ending was a letdown.', 'Would watch again.']
+COMMENT_DETAILS = ['The soundtrack stayed with me for days.', 'The pacing dragged in the middle.',
+                   'The lead performance carries the whole film.', 'The script needed another draft.',
+                   'Every scene looks like a painting.', 'The humour landed far more often than not.']
+
+
+class ZipfSampler:
+    """ Draws ranks 1..n with probability proportional to 1 / rank ** exponent in constant time and memory.
+
+    Implements rejection-inversion sampling (Hormann and Derflinger, 1996), so no table of n weights is needed.
+    """
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        if n < 1:
+            raise ValueError('n must be at least 1')
+        self._n = n
+        self._exponent = exponent
+        self._rng = rng
+        self._h_integral_x1 = self._h_integral(1.5) - 1.0
+        self._h_integral_n = self._h_integral(n + 0.5)
+        self._s = 2.0 - self._h_integral_inverse(self._h_integral(2.5) - self._h(2.0))
+
+    def sample(self) -> int:
+        while True:
+            u = self._h_integral_n + self._rng.random() * (self._h_integral_x1 - self._h_integral_n)
+            x = self._h_integral_inverse(u)
+            k = min(max(int(x + 0.5), 1), self._n)
+            if k - x <= self._s or u >= self._h_integral(k + 0.5) - self._h(k):
+                return k
+
+    def sample_distinct(self, count: int):
+        count = min(count, self._n)
+        ranks = list()
+        while len(ranks) < count:
+            rank = self.sample()
+            if rank not in ranks:
+                ranks.append(rank)
+        return ranks
+
+    def _h(self, x: float) -> float:
+        return math.exp(-self._exponent * math.log(x))
+
+    def _h_integral(self, x: float) -> float:
+        log_x = math.log(x)
+        return _helper2((1.0 - self._exponent) * log_x) * log_x
+
+    def _h_integral_inverse(self, x: float) -> float:
+        t = max(x * (1.0 - self._exponent), -1.0)
+        return math.exp(_helper1(t) * x)
+
+
+def _helper1(x: float) -> float:
+    """ log(1 + x) / x, accurate near 0. """
+    if abs(x) > 1e-8:
+        return math.log1p(x) / x
+    return 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x))
+
+
+def _helper2(x: float) -> float:
+    """ (exp(x) - 1) / x, accurate near 0. """
+    if abs(x) > 1e-8:
+        return math.expm1(x) / x
+    return 1.0 + x * 0.5 * (1.0 + x * (1.0 / 3.0) * (1.0 + 0.25 * x))
+
+
+def person_name(index: int) -> str:
+    """ Deterministic, unique name for the person with the given 0-based index. """
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    generation = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+    if generation:
+        return f'{first} {last} {generation + 1}'
+    return f'{first} {last}'
+
+
+def username_for(user_id: int) -> str:
+    return f'user{user_id}'
+
+
+def password_for(user_id: int, seed: int = 0) -> str:
+    """ Plain text password of a generated user. It satisfies the registration password rules. """
+    digest = hashlib.sha256(f'{seed}:{user_id}'.encode('utf-8')).hexdigest()
+    return f'Pw{digest[:10]}9z'
+
+
+class CatalogGenerator:
+    def __init__(self, number_of_movies: int, number_of_users: int = None, number_of_comments: int = None,
+                 number_of_actors: int = None, number_of_directors: int = None, seed: int = 0,
+                 zipf_exponent: float = 0.8):
+        self.number_of_movies = number_of_movies
+        self.number_of_users = number_of_users if number_of_users is not None else max(2, number_of_movies // 100)
+        self.number_of_comments = number_of_comments if number_of_comments is not None else number_of_movies // 10
+        self.number_of_actors = number_of_actors or max(4, number_of_movies * 2)
+        self.number_of_directors = number_of_directors or max(1, number_of_movies // 5)
+        self.seed = seed
+        self.zipf_exponent = zipf_exponent
+
+    def _rng(self, stream: str) -> random.Random:
+        # Each file gets its own stream, so it is reproducible on its own.
+        return random.Random(f'{self.seed}:{stream}')
+
+    def movie_rows(self):
+        rng = self._rng('movies')
+        genres = ZipfSampler(len(GENRES), self.zipf_exponent, rng)
+        actors = ZipfSampler(self.number_of_actors, self.zipf_exponent, rng)
+        directors = ZipfSampler(self.number_of_directors, self.zipf_exponent, rng)
+        genre_counts, genre_weights = zip(*GENRES_PER_MOVIE_WEIGHTS)
+
+        for movie_id in range(1, self.number_of_movies + 1):
+            number_of_genres = rng.choices(genre_counts, genre_weights)[0]
+            movie_genres = [GENRES[rank - 1] for rank in genres.sample_distinct(number_of_genres)]
+            movie_actors = [person_name(rank - 1) for rank in actors.sample_distinct(4)]
+            director = person_name(directors.sample() - 1)
+
+            title = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+            if rng.random() < 0.1:
+                title = f'{title} {rng.randint(2, 5)}'
+            description = f'{rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} {rng.choice(OBJECTS)}'
+
+            rating = min(10.0, max(1.0, rng.gauss(6.7, 0.95)))
+            votes = max(10, int(rng.lognormvariate(11.5, 1.2)))
+            if rng.random() < REVENUE_NOT_AVAILABLE_RATE:
+                revenue = 'N/A'
+            else:
+                revenue = f'{rng.lognormvariate(3.6, 1.4):.2f}'
+            if rng.random() < METASCORE_NOT_AVAILABLE_RATE:
+                metascore = 'N/A'
+            else:
+                metascore = str(min(100, max(1, int(rng.gauss(59, 17)))))
+
+            yield [
+                movie_id,
+                title,
+                ','.join(movie_genres),
+                description,
+                director,
+                ', '.join(movie_actors),
+                rng.randint(2006, 2016),
+                min(240, max(60, int(rng.gauss(113, 19)))),
+                f'{rating:.1f}',
+                votes,
+                revenue,
+                metascore,
+            ]
+
+    def user_rows(self, hash_passwords: bool = False, hash_method: str = 'pbkdf2:sha256'):
+        for user_id in range(1, self.number_of_users + 1):
+            password = password_for(user_id, self.seed)
+            if hash_passwords:
+                password = generate_password_hash(password, method=hash_method)
+            yield [user_id, username_for(user_id), password]
+
+    def comment_rows(self):
+        rng = self._rng('comments')
+        authors = ZipfSampler(self.number_of_users, self.zipf_exponent, rng)
+        movies = ZipfSampler(self.number_of_movies, self.zipf_exponent, rng)
+        timestamp = datetime(2020, 1, 1)
+
+        for comment_id in range(1, self.number_of_comments + 1):
+            timestamp += timedelta(seconds=int(rng.expovariate(1 / 30)) + 1)
+            yield [
+                comment_id,
+                authors.sample(),
+                movies.sample(),
+                f'{rng.choice(COMMENT_OPENINGS)} {rng.choice(COMMENT_DETAILS)}',
+                timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            ]
+
+    def write(self, data_path: str, hash_passwords: bool = False, hash_method: str = 'pbkdf2:sha256'):
+        os.makedirs(data_path, exist_ok=True)
+        _write_csv(os.path.join(data_path, 'movies.csv'), MOVIES_HEADER, self.movie_rows())
+        _write_csv(os.path.join(data_path, 'users.csv'), USERS_HEADER, self.user_rows(hash_passwords, hash_method))
+        _write_csv(os.path.join(data_path, 'comments.csv'), COMMENTS_HEADER, self.comment_rows())
+
+
+def _write_csv(filename: str, header, rows):
+    with open(filename, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic movies catalog.')
+    parser.add_argument('output', help='Directory to write movies.csv, users.csv and comments.csv to.')
+    parser.add_argument('--movies', type=int, default=100000)
+    parser.add_argument('--users', type=int, help='Defaults to one user per 100 movies.')
+    parser.add_argument('--comments', type=int, help='Defaults to one comment per 10 movies.')
+    parser.add_argument('--actors', type=int, help='Size of the actor pool, defaults to two per movie.')
+    parser.add_argument('--directors', type=int, help='Size of the director pool, defaults to one per 5 movies.')
+    parser.add_argument('--zipf-exponent', type=float, default=0.8,
+                        help='Skew of actor, director, genre, author and commented movie popularity.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hash-passwords', action='store_true',
+                        help='Write password hashes instead of plain text passwords.')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256',
+                        help='werkzeug hash method, e.g. pbkdf2:sha256:1000 for a cheap hash.')
+    args = parser.parse_args(argv)
+
+    generator = CatalogGenerator(
+        number_of_movies=args.movies,
+        number_of_users=args.users,
+        number_of_comments=args.comments,
+        number_of_actors=args.actors,
+        number_of_directors=args.directors,
+        seed=args.seed,
+        zipf_exponent=args.zipf_exponent
+    )
+    generator.write(args.output, args.hash_passwords, args.hash_method)
+
+
+if __name__ == '__main__':
+    main()
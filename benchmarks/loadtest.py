@@ -0,0 +1,279 @@
+"""In-process load generator for the movies web application.
+
+Drives the WSGI app returned by create_app() through Flask test clients, with no network involved, from several
+threads or processes. Each request is drawn from a weighted mix of routes, and the report gives the throughput and the
+p50, p95 and p99 latency of every route.
+
+Usage:
+    python -m benchmarks.loadtest --workers 8 --requests 5000
+    python -m benchmarks.loadtest --mode processes --workers 4 --mix home=50,filter=20,details=20,login=5,comment=5
+    python -m benchmarks.loadtest --data-path /tmp/catalog --catalog-seed 7 --config METRICS_ENABLED=False
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlencode
+
+import movies.adapters.repository as repo
+from movies import create_app
+from movies.adapters.memory_repository import is_password_hash
+
+from benchmarks.catalog import BUNDLED_DATA_PATH
+from benchmarks.generate_catalog import password_for
+
+ROUTES = ('home', 'filter', 'details', 'login', 'comment')
+DEFAULT_MIX = {'home': 40, 'filter': 25, 'details': 25, 'login': 5, 'comment': 5}
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(text: str) -> dict:
+    mix = dict()
+    for item in text.split(','):
+        route, weight = item.split('=')
+        if route not in ROUTES:
+            raise ValueError(f'Unknown route {route}, expected one of {", ".join(ROUTES)}')
+        mix[route] = float(weight)
+    return mix
+
+
+def load_credentials(data_path: str, catalog_seed: int = None):
+    """ Returns (username, password) pairs for the users in data_path/users.csv that can log in.
+
+    Users stored with a password hash can only be used when they come from a generated catalog whose seed is known.
+    """
+    credentials = list()
+    with open(os.path.join(data_path, 'users.csv'), encoding='utf-8-sig') as infile:
+        reader = csv.reader(infile)
+        next(reader)
+        for user_id, username, password in reader:
+            if is_password_hash(password):
+                if catalog_seed is None:
+                    continue
+                password = password_for(int(user_id), catalog_seed)
+            credentials.append((username, password))
+    return credentials
+
+
+class Scenario:
+    """ Turns route names into concrete requests against the catalog loaded in the repository. """
+
+    def __init__(self, credentials, seed: int, movies_per_page: int = 4):
+        self._rng = random.Random(seed)
+        self._credentials = credentials
+        self._movie_ids = repo.repo_instance.get_all_movie_ids()
+        self._genres = [genre.genre_name for genre in repo.repo_instance.get_genres()]
+        self._movies_per_page = movies_per_page
+
+    def credentials(self):
+        return self._rng.choice(self._credentials)
+
+    def request(self, route: str, username: str, password: str):
+        """ Returns (method, url, form data) for one request to route. """
+        rng = self._rng
+        if route == 'home':
+            page = rng.randrange(max(1, len(self._movie_ids) // self._movies_per_page))
+            return 'GET', f'/?cursor={page * self._movies_per_page}', None
+        if route == 'filter':
+            movie = repo.repo_instance.get_movie(rng.choice(self._movie_ids))
+            kind = rng.choice(('genre', 'actor', 'director'))
+            if kind == 'genre':
+                value = rng.choice(self._genres)
+            elif kind == 'actor':
+                value = rng.choice([actor.actor_name for actor in movie.actors] or [''])
+            else:
+                value = movie.director.director_name if movie.director else ''
+            return 'GET', f'/filter_movies?{urlencode({kind: value.lower()})}', None
+        if route == 'details':
+            return 'GET', f'/details/{rng.choice(self._movie_ids)}/', None
+        if route == 'login':
+            return 'POST', '/authentication/login', {'username': username, 'password': password}
+        if route == 'comment':
+            return 'POST', '/comment', {'comment': 'A load test comment', 'movieID': rng.choice(self._movie_ids)}
+        raise ValueError(f'Unknown route {route}')
+
+
+def run_worker(app, worker_id: int, number_of_requests: int, mix: dict, credentials, seed: int) -> dict:
+    """ Sends number_of_requests requests from one client, returning the latencies and failures of every route. """
+    scenario = Scenario(credentials, seed * 1000 + worker_id, app.config.get('MOVIES_PER_PAGE', 4))
+    rng = random.Random(seed * 1000 + worker_id)
+    routes, weights = zip(*mix.items())
+    client = app.test_client()
+    results = {route: {'latencies': list(), 'errors': 0} for route in routes}
+
+    username, password = scenario.credentials() if credentials else (None, None)
+    if username is not None:
+        # Comments need a logged in session; logging in here isn't measured.
+        client.post('/authentication/login', data={'username': username, 'password': password})
+
+    for route in rng.choices(routes, weights, k=number_of_requests):
+        if route in ('login', 'comment') and username is None:
+            continue
+        method, url, data = scenario.request(route, username, password)
+        started = perf_counter()
+        response = client.open(url, method=method, data=data)
+        elapsed = perf_counter() - started
+        results[route]['latencies'].append(elapsed)
+        if response.status_code >= 400:
+            results[route]['errors'] += 1
+
+    return results
+
+
+_process_app = None
+_process_credentials = None
+
+
+def _init_process(app_config: dict, data_path: str, catalog_seed: int):
+    global _process_app, _process_credentials
+    _process_app = create_app(app_config)
+    _process_credentials = load_credentials(data_path, catalog_seed)
+
+
+def _run_process_worker(worker_id: int, number_of_requests: int, mix: dict, seed: int) -> dict:
+    return run_worker(_process_app, worker_id, number_of_requests, mix, _process_credentials, seed)
+
+
+def percentile(sorted_values, percent: float) -> float:
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def merge(worker_results) -> dict:
+    merged = dict()
+    for results in worker_results:
+        for route, result in results.items():
+            route_result = merged.setdefault(route, {'latencies': list(), 'errors': 0})
+            route_result['latencies'].extend(result['latencies'])
+            route_result['errors'] += result['errors']
+    return merged
+
+
+def summarise(merged: dict, elapsed: float) -> dict:
+    summary = dict()
+    for route, result in merged.items():
+        latencies = sorted(result['latencies'])
+        summary[route] = {
+            'requests': len(latencies),
+            'errors': result['errors'],
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        }
+        for percent in PERCENTILES:
+            summary[route][f'p{percent}'] = percentile(latencies, percent)
+    total = sum(route['requests'] for route in summary.values())
+    return {
+        'elapsed': elapsed,
+        'requests': total,
+        'throughput': total / elapsed if elapsed else 0.0,
+        'routes': summary,
+    }
+
+
+def run_load_test(data_path: str = BUNDLED_DATA_PATH, workers: int = 4, mode: str = 'threads',
+                  requests: int = 1000, mix: dict = None, seed: int = 0, catalog_seed: int = None,
+                  app_config: dict = None) -> dict:
+    mix = mix or DEFAULT_MIX
+    config = {
+        'TESTING': True,
+        'TEST_DATA_PATH': data_path,
+        'WTF_CSRF_ENABLED': False,
+        # Finish computing the similar movies before the clock starts rather than competing with the load.
+        'SIMILAR_MOVIES_BACKGROUND': False,
+    }
+    config.update(app_config or dict())
+
+    per_worker = [requests // workers + (1 if worker_id < requests % workers else 0) for worker_id in range(workers)]
+
+    if mode == 'threads':
+        app = create_app(config)
+        credentials = load_credentials(data_path, catalog_seed)
+        # Start every worker at the same time so the measured interval only covers the load itself.
+        barrier = threading.Barrier(workers + 1)
+
+        def worker(worker_id):
+            barrier.wait()
+            return run_worker(app, worker_id, per_worker[worker_id], mix, credentials, seed)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(worker, worker_id) for worker_id in range(workers)]
+            barrier.wait()
+            started = perf_counter()
+            worker_results = [future.result() for future in futures]
+            elapsed = perf_counter() - started
+
+    elif mode == 'processes':
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_process,
+                                 initargs=(config, data_path, catalog_seed)) as executor:
+            # Make sure every process has loaded the catalog before the clock starts.
+            list(executor.map(_noop, range(workers * 2)))
+            started = perf_counter()
+            futures = [executor.submit(_run_process_worker, worker_id, per_worker[worker_id], mix, seed)
+                       for worker_id in range(workers)]
+            worker_results = [future.result() for future in futures]
+            elapsed = perf_counter() - started
+
+    else:
+        raise ValueError(f'Unknown mode {mode}, expected threads or processes')
+
+    return summarise(merge(worker_results), elapsed)
+
+
+def _noop(_):
+    return None
+
+
+def format_report(summary: dict) -> str:
+    lines = [
+        f'{summary["requests"]} requests in {summary["elapsed"]:.2f}s, {summary["throughput"]:.1f} requests/s',
+        f'{"route":<10}{"requests":>10}{"errors":>8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}',
+    ]
+    for route, result in summary['routes'].items():
+        lines.append(f'{route:<10}{result["requests"]:>10}{result["errors"]:>8}{result["throughput"]:>10.1f}'
+                     f'{result["p50"] * 1000:>10.2f}{result["p95"] * 1000:>10.2f}{result["p99"] * 1000:>10.2f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the movies web application in-process.')
+    parser.add_argument('--data-path', default=BUNDLED_DATA_PATH, help='Directory holding the catalog CSV files.')
+    parser.add_argument('--catalog-seed', type=int,
+                        help='Seed of a generated catalog, needed to log in as users stored with hashed passwords.')
+    parser.add_argument('--mode', choices=('threads', 'processes'), default='threads')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=1000, help='Total number of requests.')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Route weights, e.g. home=40,filter=25,details=25,login=5,comment=5')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', action='append', default=list(),
+                        help='App config override NAME=VALUE (True/False/ints are converted), may be repeated.')
+    args = parser.parse_args(argv)
+
+    app_config = dict(_parse_config_value(item) for item in args.config)
+    summary = run_load_test(args.data_path, args.workers, args.mode, args.requests, args.mix, args.seed,
+                            args.catalog_seed, app_config)
+    print(format_report(summary))
+    return 0
+
+
+def _parse_config_value(item: str):
+    name, value = item.split('=', 1)
+    if value in ('True', 'False'):
+        return name, value == 'True'
+    try:
+        return name, int(value)
+    except ValueError:
+        return name, value
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Benchmarks for the repository, the service layer and full page renders at several catalog sizes.
+
+Usage:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output results.json
+    python -m benchmarks.run --sizes 1000 --baseline benchmarks/baseline.json
+    python -m benchmarks.run --sizes 1000 --save-baseline benchmarks/baseline.json
+
+When a baseline is given, any benchmark whose median time exceeds the baseline median by more than the tolerance is
+reported as a regression and the command exits with status 1.
+
+Each size loads its catalog twice, once timed and once for the app, and populate takes roughly 0.4 ms per movie, so
+the default sizes take about 3 s, 15 s and 3 minutes. A million movies is left out of the defaults: expect well over
+ten minutes for it.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+import movies.adapters.repository as repo
+from movies import create_app
+from movies.adapters.memory_repository import MemoryRepository, populate
+from movies.movies import services as movies_services
+
+from benchmarks.catalog import write_scaled_catalog
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_TOLERANCE = 0.25
+
+
+def measure(func, repeat: int = 5, number: int = 1) -> dict:
+    """ Runs func number times per round for repeat rounds, returning per-call timings in seconds. """
+    timings = list()
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((perf_counter() - started) / number)
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def make_app(data_path: str):
+    return create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': data_path,
+        'METRICS_ENABLED': False,
+        'REPOSITORY_PROFILING': False,
+        'SIMILAR_MOVIES_ENABLED': False,
+    })
+
+
+def run_size(size: int, repeat: int, seed: int = 0) -> dict:
+    results = dict()
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as data_path:
+        write_scaled_catalog(data_path, size)
+
+        # Large catalogs take long enough to load that a single round is representative.
+        populate_rounds = repeat if size <= 10000 else 1
+        results['populate'] = measure(lambda: populate(data_path, MemoryRepository()), repeat=populate_rounds)
+
+        app = make_app(data_path)
+        repository = repo.repo_instance
+        client = app.test_client()
+    movies_per_page = app.config['MOVIES_PER_PAGE']
+
+    movie_ids = [rng.randint(1, size) for _ in range(100)]
+    movie = repository.get_movie(movie_ids[0])
+
+    results['filter_movies.genre'] = measure(lambda: repository.filter_movies(genre_name='Sci-Fi'), repeat)
+    results['filter_movies.actor'] = measure(lambda: repository.filter_movies(actor_name='Chris Pratt'), repeat)
+    results['filter_movies.director'] = measure(lambda: repository.filter_movies(director_name='James Gunn'), repeat)
+    results['filter_movies.combined'] = measure(
+        lambda: repository.filter_movies('Chris Pratt', 'James Gunn', 'Action'), repeat)
+    results['get_user'] = measure(lambda: repository.get_user('fmercury'), repeat, number=100)
+    results['get_movies_by_id.page'] = measure(
+        lambda: repository.get_movies_by_id(movie_ids[:movies_per_page]), repeat, number=100)
+    results['get_movies_by_id.100'] = measure(lambda: repository.get_movies_by_id(movie_ids), repeat, number=10)
+    results['add_comment'] = measure(
+        lambda: movies_services.add_comment(movie.id, 'A benchmark comment', 'fmercury', repository), repeat,
+        number=100)
+    results['movie_to_dict'] = measure(lambda: movies_services.movie_to_dict(movie), repeat, number=100)
+
+    # Cursors are offsets into the listing, so start a page where the configured page size would.
+    middle_cursor = (size // 2) // movies_per_page * movies_per_page
+    results['render.home'] = measure(lambda: client.get(f'/?cursor={middle_cursor}'), repeat)
+    results['render.filter'] = measure(
+        lambda: client.get(f'/filter_movies?genre=sci-fi&cursor={2 * movies_per_page}'), repeat)
+    results['render.details'] = measure(lambda: client.get(f'/details/{movie_ids[1]}/'), repeat)
+
+    return results
+
+
+def run(sizes, repeat: int = 5) -> dict:
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': repeat,
+        },
+        'results': {str(size): run_size(size, repeat) for size in sizes},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE):
+    """ Returns (size, benchmark, baseline median, current median) for every benchmark slower than the baseline. """
+    regressions = list()
+    for size, benchmarks in results['results'].items():
+        baseline_benchmarks = baseline.get('results', dict()).get(size, dict())
+        for name, timing in benchmarks.items():
+            if name not in baseline_benchmarks:
+                continue
+            baseline_median = baseline_benchmarks[name]['median']
+            if timing['median'] > baseline_median * (1 + tolerance):
+                regressions.append((size, name, baseline_median, timing['median']))
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = list()
+    for size, benchmarks in results['results'].items():
+        lines.append(f'{int(size):,} movies')
+        for name, timing in benchmarks.items():
+            lines.append(f'  {name:<28} median {timing["median"] * 1000:10.3f} ms   min {timing["min"] * 1000:10.3f} ms')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the movies repository and page rendering.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma separated catalog sizes.')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds per benchmark.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against the results stored in this JSON file.')
+    parser.add_argument('--save-baseline', help='Store the results as the new baseline in this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown relative to the baseline before failing, e.g. 0.25 for 25%%.')
+    args = parser.parse_args(argv)
+    # Checked before benchmarking: a missing baseline must not turn the regression check into a silent pass.
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f'baseline {args.baseline} does not exist')
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = run(sizes, args.repeat)
+    print(format_results(results))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as outfile:
+                json.dump(results, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, baseline_median, median in regressions:
+            print(f'REGRESSION {int(size):,} movies {name}: {baseline_median * 1000:.3f} ms -> {median * 1000:.3f} ms')
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
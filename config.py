@@ -15,4 +15,59 @@ class Config:
     FLASK_APP = environ.get('FLASK_APP')
     FLASK_ENV = environ.get('FLASK_ENV')
 
-    SECRET_KEY = environ.get('SECRET_KEY')
\ No newline at end of file
+    SECRET_KEY = environ.get('SECRET_KEY')
+
+    # Start serving (health checks first) before the catalog is loaded, loading it and compiling the profanity
+    # screener in a background thread; other requests wait until that has finished
+    FAST_START = environ.get('FAST_START', 'False').lower() == 'true'
+
+    # Bearer token required by the /admin endpoints, which are disabled when it isn't set
+    ADMIN_TOKEN = environ.get('ADMIN_TOKEN')
+
+    # Comment sharing between worker processes
+    COMMENT_LOG_PATH = environ.get('COMMENT_LOG_PATH')
+    COMMENT_LOG_POLL_INTERVAL = float(environ.get('COMMENT_LOG_POLL_INTERVAL', 1.0))
+
+    # Bounded executor for CPU-bound work (password hashing, profanity checks)
+    CPU_EXECUTOR_WORKERS = int(environ.get('CPU_EXECUTOR_WORKERS', os.cpu_count() or 1))
+    CPU_EXECUTOR_QUEUE = int(environ.get('CPU_EXECUTOR_QUEUE', 4 * CPU_EXECUTOR_WORKERS))
+
+    # Threads used by the ASGI entry point to run requests against the Flask app
+    ASGI_THREADS = int(environ.get('ASGI_THREADS', 32))
+
+    # Number of movies per page on the home, filter and search listings, and whether those listings are streamed:
+    # the page head and sidebar go out at once and each movie follows as it's fetched from the repository
+    MOVIES_PER_PAGE = int(environ.get('MOVIES_PER_PAGE', 4))
+    STREAM_LISTINGS = environ.get('STREAM_LISTINGS', 'False').lower() == 'true'
+
+    # Number of comments shown per page on a movie's details page, newest first
+    COMMENTS_PER_PAGE = int(environ.get('COMMENTS_PER_PAGE', 10))
+
+    # Movies with fewer votes than this are left off the top rated leaderboards
+    LEADERBOARD_MIN_VOTES = int(environ.get('LEADERBOARD_MIN_VOTES', 10000))
+
+    # Similar movies shown on the details page: how many per movie, whether they're computed in a background thread
+    # after startup and how many processes compute them (0 computes them in that thread)
+    SIMILAR_MOVIES_ENABLED = environ.get('SIMILAR_MOVIES_ENABLED', 'True').lower() == 'true'
+    SIMILAR_MOVIES_K = int(environ.get('SIMILAR_MOVIES_K', 5))
+    SIMILAR_MOVIES_BACKGROUND = environ.get('SIMILAR_MOVIES_BACKGROUND', 'True').lower() == 'true'
+    SIMILAR_MOVIES_WORKERS = int(environ.get('SIMILAR_MOVIES_WORKERS', 0))
+
+    # Wordlist compiled into the comment profanity screener (defaults to the one shipped with better_profanity)
+    PROFANITY_WORDLIST_PATH = environ.get('PROFANITY_WORDLIST_PATH')
+
+    # Per-endpoint latency histograms exposed, without authentication, on /metrics
+    METRICS_ENABLED = environ.get('METRICS_ENABLED', 'False').lower() == 'true'
+
+    # Per-request breakdown of repository calls: 'log', 'header' (X-Repository-Calls) or 'both'
+    REPOSITORY_PROFILING = environ.get('REPOSITORY_PROFILING', 'False').lower() == 'true'
+    REPOSITORY_PROFILING_OUTPUT = environ.get('REPOSITORY_PROFILING_OUTPUT', 'log')
+    REPOSITORY_PROFILING_SLOWEST = int(environ.get('REPOSITORY_PROFILING_SLOWEST', 5))
+
+    # Password hashing: PBKDF2 iterations, size of the dedicated process pool (0 uses the CPU executor), number of
+    # hashes allowed to wait for it and how long, in seconds, a request may wait before being turned away
+    PASSWORD_HASH_ITERATIONS = int(environ.get('PASSWORD_HASH_ITERATIONS', 150000))
+    PASSWORD_HASH_WORKERS = int(environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_QUEUE = int(environ.get('PASSWORD_HASH_QUEUE', 4 * max(PASSWORD_HASH_WORKERS, 1)))
+    PASSWORD_HASH_TIMEOUT = float(environ.get('PASSWORD_HASH_TIMEOUT', 5.0))
+    PASSWORD_HASH_BENCHMARK = environ.get('PASSWORD_HASH_BENCHMARK', 'False').lower() == 'true'
@@ -1,10 +1,12 @@
 import os
 
-from flask import Flask
+from flask import Flask, abort, current_app, g, request
 from flask_wtf import CSRFProtect
 
 import movies.adapters.repository as repo
 from movies.adapters.memory_repository import MemoryRepository, populate
+from movies.adapters.hot_reload import CatalogReloader, SwappableRepository
+from movies.utilities.startup import Warmup, timed
 
 csrf = CSRFProtect()
 
@@ -21,8 +23,62 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
         data_path = app.config["TEST_DATA_PATH"]
 
-    repo.repo_instance = MemoryRepository()
-    populate(data_path, repo.repo_instance)
+    from .utilities import offload
+    offload.configure(app.config.get('CPU_EXECUTOR_WORKERS'), app.config.get('CPU_EXECUTOR_QUEUE'))
+
+    from .authentication import hashing
+    hashing.configure(
+        iterations=app.config.get('PASSWORD_HASH_ITERATIONS', hashing.DEFAULT_ITERATIONS),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 0),
+        max_pending=app.config.get('PASSWORD_HASH_QUEUE'),
+        acquire_timeout=app.config.get('PASSWORD_HASH_TIMEOUT')
+    )
+    startup_timings = app.extensions['startup_timings'] = dict()
+    warmup = app.extensions['warmup'] = Warmup(startup_timings)
+    # With FAST_START the catalog and everything else that can wait is loaded after the app starts serving.
+    fast_start = app.config.get('FAST_START')
+
+    if fast_start:
+        repo.repo_instance = SwappableRepository(MemoryRepository())
+        warmup.add('repository', lambda: repo.repo_instance.swap(build_repository(app, data_path, startup_timings)),
+                   required=True)
+    else:
+        with timed(startup_timings, 'repository'):
+            repo.repo_instance = SwappableRepository(build_repository(app, data_path, startup_timings))
+    app.before_request(_wait_for_warmup)
+    app.before_request(_pin_repository)
+    app.teardown_request(_unpin_repository)
+
+    if app.config.get('COMMENT_LOG_PATH'):
+        # Replay the comments other workers have already shared, then keep tailing the log in the background.
+        from .adapters.comment_log import CommentLog
+        comment_log = CommentLog(app.config['COMMENT_LOG_PATH'], app.config.get('COMMENT_LOG_POLL_INTERVAL', 1.0))
+        app.extensions['comment_log'] = comment_log
+
+        def replay_comment_log():
+            comment_log.apply_new(repo.repo_instance)
+            comment_log.start()
+        warmup.add('comment_log', replay_comment_log)
+
+    after_reload = list()
+    if app.config.get('SIMILAR_MOVIES_ENABLED'):
+        from .movies import recommendations
+        warmup.add('similar_movies', lambda: recommendations.init_app(app, repo.repo_instance))
+        after_reload.append(lambda repository: recommendations.init_app(app, repository))
+    app.extensions['catalog_reloader'] = CatalogReloader(
+        repo.repo_instance, lambda: build_repository(app, data_path), after_reload)
+
+    # Compile the profanity screening automaton now rather than on the first comment.
+    def compile_profanity_screener():
+        from .utilities import profanity
+        profanity.configure(app.config.get('PROFANITY_WORDLIST_PATH'))
+    warmup.add('profanity', compile_profanity_screener)
+
+    if app.config.get('PASSWORD_HASH_BENCHMARK'):
+        def benchmark_password_hashing():
+            hash_time = hashing.hasher.benchmark()
+            app.logger.info('Password hashing with %s takes %.1f ms', hashing.hasher.method, hash_time * 1000)
+        warmup.add('password_hash_benchmark', benchmark_password_hashing)
 
     with app.app_context():
         from .home import home
@@ -34,4 +90,60 @@ def create_app(test_config=None):
         from .authentication import authentication
         app.register_blueprint(authentication.authentication_blueprint)
 
+        from .admin import admin
+        # Admin clients authenticate with a bearer token rather than a session, so there is no CSRF to guard against.
+        csrf.exempt(admin.admin_blueprint)
+        app.register_blueprint(admin.admin_blueprint)
+
+        if app.config.get('METRICS_ENABLED'):
+            from .metrics import metrics
+            metrics.init_app(app)
+
+        if app.config.get('REPOSITORY_PROFILING'):
+            from .metrics import metrics
+            metrics.init_repository_profiling(app)
+
+    # Point the templates at the fingerprinted, precompressed static files, if they have been built.
+    from .utilities import assets
+    assets.init_app(app)
+
+    warmup.start(background=fast_start)
     return app
+
+
+def build_repository(app, data_path: str, timings: dict = None):
+    """ Returns a new repository populated from data_path, instrumented as app is configured to. """
+    repository = MemoryRepository(app.config['LEADERBOARD_MIN_VOTES'])
+    populate(data_path, repository, timings)
+
+    repository_observers = list()
+    if app.config.get('METRICS_ENABLED'):
+        from .metrics.services import RepositoryPhaseObserver
+        repository_observers.append(RepositoryPhaseObserver())
+    if app.config.get('REPOSITORY_PROFILING'):
+        from .metrics.services import RepositoryProfiler
+        repository_observers.append(RepositoryProfiler())
+    if repository_observers:
+        from .adapters.instrumented_repository import InstrumentedRepository
+        repository = InstrumentedRepository(repository, *repository_observers)
+    return repository
+
+
+def _wait_for_warmup():
+    # Only the health check answers before a fast start has loaded the catalog, or once it failed to.
+    if request.endpoint != 'home_bp.health':
+        warmup = current_app.extensions['warmup']
+        warmup.wait()
+        if warmup.failed:
+            abort(503)
+
+
+def _pin_repository():
+    # A catalog reload swaps the repository; this request keeps reading the generation it started with.
+    g.repository_pin = repo.repo_instance.pin()
+
+
+def _unpin_repository(exception=None):
+    token = g.pop('repository_pin', None)
+    if token is not None:
+        repo.repo_instance.unpin(token)
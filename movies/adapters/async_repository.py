@@ -0,0 +1,111 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import List, Sequence, Tuple
+
+from movies.adapters.repository import AbstractAsyncRepository, AbstractRepository
+from movies.domain.model import User, Movie, Genre, Actor, Director, Comment
+
+
+class AsyncRepositoryAdapter(AbstractAsyncRepository):
+    """ Exposes a synchronous repository through the async interface.
+
+    With an executor, each call runs on it so that a blocking (I/O-backed) repository doesn't stall the event loop.
+    Without one, calls run inline, which suits the in-memory repository whose methods never block.
+    """
+
+    def __init__(self, repo: AbstractRepository, executor: Executor = None):
+        self._repo = repo
+        self._executor = executor
+
+    @property
+    def repo(self) -> AbstractRepository:
+        return self._repo
+
+    async def _call(self, method, *args, **kwargs):
+        if self._executor is None:
+            return method(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(method, *args, **kwargs))
+
+    async def add_user(self, user: User):
+        return await self._call(self._repo.add_user, user)
+
+    async def get_user(self, username) -> User:
+        return await self._call(self._repo.get_user, username)
+
+    async def get_users(self) -> List[User]:
+        return await self._call(self._repo.get_users)
+
+    async def add_movie(self, movie: Movie):
+        return await self._call(self._repo.add_movie, movie)
+
+    async def upsert_movie(self, movie: Movie, genre_names: List[str], actor_names: List[str],
+                           director_name: str) -> Movie:
+        return await self._call(self._repo.upsert_movie, movie, genre_names, actor_names, director_name)
+
+    async def upsert_movies(self, rows: List[Tuple[Movie, List[str], List[str], str]]) -> List[Movie]:
+        return await self._call(self._repo.upsert_movies, rows)
+
+    async def get_movie(self, id: int) -> Movie:
+        return await self._call(self._repo.get_movie, id)
+
+    async def filter_movies(self, actor_name: str = "", director_name: str = "", genre_name: str = "") -> List[int]:
+        return await self._call(self._repo.filter_movies, actor_name, director_name, genre_name)
+
+    async def query_movies(self, expression) -> List[int]:
+        return await self._call(self._repo.query_movies, expression)
+
+    async def explain_query(self, expression) -> dict:
+        return await self._call(self._repo.explain_query, expression)
+
+    async def get_number_of_movies(self) -> int:
+        return await self._call(self._repo.get_number_of_movies)
+
+    async def get_first_movie(self) -> Movie:
+        return await self._call(self._repo.get_first_movie)
+
+    async def get_last_movie(self) -> Movie:
+        return await self._call(self._repo.get_last_movie)
+
+    async def get_movies_by_id(self, id_list) -> List[Movie]:
+        return await self._call(self._repo.get_movies_by_id, id_list)
+
+    async def get_all_movie_ids(self) -> Sequence[int]:
+        return await self._call(self._repo.get_all_movie_ids)
+
+    async def get_movie_ids_for_genre(self, genre_name: str) -> List[int]:
+        return await self._call(self._repo.get_movie_ids_for_genre, genre_name)
+
+    async def add_genre(self, genre: Genre):
+        return await self._call(self._repo.add_genre, genre)
+
+    async def add_director(self, director: Director):
+        return await self._call(self._repo.add_director, director)
+
+    async def add_actor(self, actor: Actor):
+        return await self._call(self._repo.add_actor, actor)
+
+    async def get_genre(self, genre_name: str) -> Genre:
+        return await self._call(self._repo.get_genre, genre_name)
+
+    async def get_actor(self, actor_name: str) -> Actor:
+        return await self._call(self._repo.get_actor, actor_name)
+
+    async def get_director(self, director_name: str) -> Director:
+        return await self._call(self._repo.get_director, director_name)
+
+    async def get_genres(self) -> List[Genre]:
+        return await self._call(self._repo.get_genres)
+
+    async def get_leaderboard(self, board: str, k: int, genre_name: str = None, year: int = None) -> List[Movie]:
+        return await self._call(self._repo.get_leaderboard, board, k, genre_name, year)
+
+    async def get_facet_counts(self, movie_ids: List[int], limits: dict = None) -> dict:
+        return await self._call(self._repo.get_facet_counts, movie_ids, limits)
+
+    async def add_comment(self, comment: Comment):
+        return await self._call(self._repo.add_comment, comment)
+
+    async def get_comments(self):
+        return await self._call(self._repo.get_comments)
@@ -0,0 +1,374 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+from movies.domain.model import Movie
+from movies.domain.query import Term, Range, And, Or, Not, QuerySyntaxException
+
+GENRE = 'genre'
+ACTOR = 'actor'
+DIRECTOR = 'director'
+YEAR = 'year'
+DECADE = 'decade'
+RATING = 'rating'
+RUNTIME = 'runtime'
+VOTES = 'votes'
+# Free text terms match a genre of that name, or else every one of their words in a title or description.
+TEXT = 'text'
+WORD = 'word'
+
+_WORD = re.compile(r'\w+')
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bitmap: int) -> int:
+        return bin(bitmap).count('1')
+
+
+def popcount(bitmap: int) -> int:
+    return _popcount(bitmap)
+
+
+# Numeric fields are indexed by bucket: (the movie's value, the bucket a value falls in, the bucket's display name).
+# Ratings are bucketed by their whole part, so 7 stands for ratings from 7.0 up to, not including, 8.0; runtimes by
+# half hour and votes by order of magnitude.
+NUMERIC_FIELDS = {
+    YEAR: (lambda movie: movie.year, int, str),
+    DECADE: (lambda movie: movie.year, lambda value: int(value) // 10 * 10, lambda bucket: f'{bucket}s'),
+    RATING: (lambda movie: movie.rating, lambda value: int(float(value)), lambda bucket: f'{bucket}-{bucket + 1}'),
+    RUNTIME: (lambda movie: movie.runtime, lambda value: int(value) // 30 * 30,
+              lambda bucket: f'{bucket}-{bucket + 29} min'),
+    VOTES: (lambda movie: movie.votes, lambda value: 10 ** (len(str(int(value))) - 1),
+            lambda bucket: f'{bucket:,}-{bucket * 10 - 1:,}'),
+}
+
+
+def words_of(text: str) -> List[str]:
+    return _WORD.findall(text.lower()) if text else []
+
+
+def bucket_of(field: str, value) -> int:
+    """ Returns the bucket of a numeric field that value, a number or its text (e.g. '7.5' or '2010s'), falls in. """
+    if isinstance(value, str):
+        value = value.strip().rstrip('s')
+    try:
+        return NUMERIC_FIELDS[field][1](value)
+    except ValueError:
+        raise QuerySyntaxException(f'{field} needs a number, not {value!r}')
+
+
+class BitmapIndex:
+    """ One bitmap per genre, actor, director and numeric bucket, over dense movie ordinals.
+
+    Movies get consecutive ordinals as they are added and bit n of a bitmap is set when the movie with ordinal n has
+    that value. Bitmaps are built in bytearrays, which can be updated in place, and handed out as Python ints, which
+    intersect and count quickly; the int form is cached until the bitmap changes again.
+
+    Names are matched case insensitively: keys are the lower case names, and the names as first seen are kept for
+    display.
+    """
+
+    def __init__(self):
+        self._ordinals: Dict[int, int] = dict()
+        self._movie_ids: List[int] = list()
+        self._bits: Dict[str, Dict[object, bytearray]] = defaultdict(dict)
+        self._bitmaps: Dict[str, Dict[object, int]] = defaultdict(dict)
+        self._names: Dict[str, Dict[object, str]] = defaultdict(dict)
+        # For every field, the keys each ordinal has, used to count small result sets one movie at a time.
+        self._keys_by_ordinal: Dict[str, List[list]] = defaultdict(list)
+        # For every numeric field, the values in increasing order with the ordinal of their movie, which answer range
+        # queries with two bisects, and each ordinal's value, which checks a single movie.
+        self._sorted_values: Dict[str, List[float]] = defaultdict(list)
+        self._sorted_ordinals: Dict[str, List[int]] = defaultdict(list)
+        self._values_by_ordinal: Dict[str, list] = defaultdict(list)
+        # While a bulk load runs, numeric values are appended unsorted and each column is sorted once at its end.
+        self._sorting_deferred = False
+
+    @property
+    def number_of_movies(self) -> int:
+        return len(self._movie_ids)
+
+    def add_movie(self, movie: Movie):
+        if movie.id in self._ordinals:
+            return
+        self._ordinals[movie.id] = len(self._movie_ids)
+        self._movie_ids.append(movie.id)
+        for field in NUMERIC_FIELDS:
+            self._values_by_ordinal[field].append(None)
+        self._index(movie)
+
+    @contextmanager
+    def bulk_load(self):
+        """ Indexes the numeric values of the movies added in the with block without keeping their columns sorted,
+        then sorts each column once. """
+        self._sorting_deferred = True
+        try:
+            yield self
+        finally:
+            self._sorting_deferred = False
+            for field in NUMERIC_FIELDS:
+                pairs = sorted(zip(self._sorted_values[field], self._sorted_ordinals[field]))
+                self._sorted_values[field] = [value for value, _ in pairs]
+                self._sorted_ordinals[field] = [ordinal for _, ordinal in pairs]
+
+    def update_movie(self, movie: Movie):
+        """ Re-indexes a movie whose details, genres, actors or director have changed, or adds a new one. """
+        if movie.id not in self._ordinals:
+            self.add_movie(movie)
+            return
+        self._clear(self._ordinals[movie.id])
+        self._index(movie)
+
+    def _index(self, movie: Movie):
+        ordinal = self._ordinals[movie.id]
+        for field, (value_of, bucket, name_of) in NUMERIC_FIELDS.items():
+            value = value_of(movie)
+            self._values_by_ordinal[field][ordinal] = value
+            if value is not None:
+                self.add_value(movie, field, bucket(value), name_of(bucket(value)))
+                if self._sorting_deferred:
+                    self._sorted_values[field].append(value)
+                    self._sorted_ordinals[field].append(ordinal)
+                    continue
+                index = bisect_right(self._sorted_values[field], value)
+                self._sorted_values[field].insert(index, value)
+                self._sorted_ordinals[field].insert(index, ordinal)
+        for word in set(words_of(movie.title) + words_of(movie.description)):
+            self.add_value(movie, WORD, word)
+        for genre in movie.genres:
+            self.add_value(movie, GENRE, genre.genre_name)
+        for actor in movie.actors:
+            self.add_value(movie, ACTOR, actor.actor_name)
+        if movie.director is not None:
+            self.add_value(movie, DIRECTOR, movie.director.director_name)
+
+    def _clear(self, ordinal: int):
+        """ Removes the movie with ordinal from every bitmap and numeric column, keeping its ordinal. """
+        byte, bit = ordinal >> 3, 1 << (ordinal & 7)
+        for field, keys_by_ordinal in self._keys_by_ordinal.items():
+            if ordinal >= len(keys_by_ordinal):
+                continue
+            for key in keys_by_ordinal[ordinal]:
+                bits = self._bits[field][key]
+                bits[byte] &= ~bit
+                self._bitmaps[field].pop(key, None)
+                if not any(bits):
+                    del self._bits[field][key]
+            keys_by_ordinal[ordinal] = list()
+
+        for field, values_by_ordinal in self._values_by_ordinal.items():
+            value = values_by_ordinal[ordinal]
+            if value is None:
+                continue
+            values, ordinals = self._sorted_values[field], self._sorted_ordinals[field]
+            if self._sorting_deferred:
+                # The column isn't sorted yet; only movies upserted twice in one bulk load get here.
+                index = ordinals.index(ordinal)
+            else:
+                index = bisect_left(values, value)
+                while ordinals[index] != ordinal:
+                    index += 1
+            del values[index]
+            del ordinals[index]
+            values_by_ordinal[ordinal] = None
+
+    def add_value(self, movie: Movie, field: str, value, name: str = None):
+        """ Records that movie, which must already be in the index, has value for field. """
+        ordinal = self._ordinals[movie.id]
+        key = value.lower() if isinstance(value, str) else value
+        if key not in self._names[field]:
+            self._names[field][key] = name if name is not None else value
+
+        keys_by_ordinal = self._keys_by_ordinal[field]
+        while len(keys_by_ordinal) < len(self._movie_ids):
+            keys_by_ordinal.append(list())
+        if key in keys_by_ordinal[ordinal]:
+            return
+        keys_by_ordinal[ordinal].append(key)
+
+        bits = self._bits[field].setdefault(key, bytearray())
+        byte = ordinal >> 3
+        if len(bits) <= byte:
+            bits.extend(bytes(byte + 1 - len(bits)))
+        bits[byte] |= 1 << (ordinal & 7)
+        self._bitmaps[field].pop(key, None)
+
+    def values(self, field: str) -> List:
+        return list(self._bits[field])
+
+    def name(self, field: str, key) -> str:
+        return self._names[field].get(key)
+
+    @property
+    def universe(self) -> int:
+        """ The bitmap of every movie in the index. """
+        return (1 << len(self._movie_ids)) - 1
+
+    def bitmap(self, field: str, value) -> int:
+        if field == TEXT:
+            return self.evaluate(Term(TEXT, value))
+        if field in NUMERIC_FIELDS:
+            value = bucket_of(field, value)
+        key = value.lower() if isinstance(value, str) else value
+        bitmap = self._bitmaps[field].get(key)
+        if bitmap is None:
+            bits = self._bits[field].get(key)
+            if bits is None:
+                return 0
+            bitmap = int.from_bytes(bits, 'little')
+            self._bitmaps[field][key] = bitmap
+        return bitmap
+
+    def _text_keys(self, value: str):
+        """ Returns the field and keys a free text value means: a genre if one has that name, else its words. """
+        if value.lower() in self._bits[GENRE]:
+            return GENRE, [value.lower()]
+        return WORD, words_of(value)
+
+    def _range_slice(self, expression: Range):
+        values = self._sorted_values[expression.field]
+        start, end = 0, len(values)
+        if expression.low is not None:
+            start = (bisect_left if expression.include_low else bisect_right)(values, expression.low)
+        if expression.high is not None:
+            end = (bisect_right if expression.include_high else bisect_left)(values, expression.high)
+        return start, max(start, end)
+
+    def evaluate(self, expression) -> int:
+        """ Returns the bitmap of the movies matching an expression tree of Term, Range, And, Or and Not nodes. """
+        if isinstance(expression, Term):
+            if expression.field != TEXT:
+                return self.bitmap(expression.field, expression.value)
+            field, keys = self._text_keys(expression.value)
+            if not keys:
+                return 0
+            bitmap = self.universe
+            for key in keys:
+                bitmap &= self.bitmap(field, key)
+            return bitmap
+        if isinstance(expression, Range):
+            start, end = self._range_slice(expression)
+            return self.bitmap_of_ordinals(self._sorted_ordinals[expression.field][start:end])
+        if isinstance(expression, And):
+            bitmap = self.universe
+            for operand in expression.operands:
+                bitmap &= self.evaluate(operand)
+                if not bitmap:
+                    break
+            return bitmap
+        if isinstance(expression, Or):
+            bitmap = 0
+            for operand in expression.operands:
+                bitmap |= self.evaluate(operand)
+            return bitmap
+        if isinstance(expression, Not):
+            return self.universe & ~self.evaluate(expression.operand)
+        raise TypeError(f'Not a query expression: {expression!r}')
+
+    def estimate(self, expression) -> int:
+        """ Returns how many movies expression matches, or an upper bound on it, from the index statistics alone.
+
+        Terms and ranges are counted exactly; free text with several words is bounded by its rarest word and the
+        boolean operators combine their operands' estimates. A negation is only counted when its operand is, since the
+        complement of an upper bound would be a lower one; otherwise it is bounded by the number of movies.
+        """
+        if isinstance(expression, Term):
+            if expression.field != TEXT:
+                return popcount(self.bitmap(expression.field, expression.value))
+            field, keys = self._text_keys(expression.value)
+            return min((popcount(self.bitmap(field, key)) for key in keys), default=0)
+        if isinstance(expression, Range):
+            start, end = self._range_slice(expression)
+            return end - start
+        if isinstance(expression, And):
+            return min(self.estimate(operand) for operand in expression.operands)
+        if isinstance(expression, Or):
+            return min(self.number_of_movies, sum(self.estimate(operand) for operand in expression.operands))
+        if isinstance(expression, Not):
+            if not self.is_exact(expression.operand):
+                return self.number_of_movies
+            return self.number_of_movies - self.estimate(expression.operand)
+        raise TypeError(f'Not a query expression: {expression!r}')
+
+    def is_exact(self, expression) -> bool:
+        """ Whether estimate counts the movies expression matches exactly, rather than bounding them. """
+        if isinstance(expression, Term):
+            return expression.field != TEXT or len(self._text_keys(expression.value)[1]) <= 1
+        if isinstance(expression, Range):
+            return True
+        if isinstance(expression, Not):
+            return self.is_exact(expression.operand)
+        return len(expression.operands) == 1 and self.is_exact(expression.operands[0])
+
+    def matches(self, ordinal: int, expression) -> bool:
+        """ Checks the single movie with ordinal against expression, without building any bitmap. """
+        if isinstance(expression, Term):
+            if expression.field == TEXT:
+                field, keys = self._text_keys(expression.value)
+            elif expression.field in NUMERIC_FIELDS:
+                field, keys = expression.field, [bucket_of(expression.field, expression.value)]
+            else:
+                field, keys = expression.field, [expression.value.lower()]
+            keys_by_ordinal = self._keys_by_ordinal[field]
+            movie_keys = keys_by_ordinal[ordinal] if ordinal < len(keys_by_ordinal) else []
+            return bool(keys) and all(key in movie_keys for key in keys)
+        if isinstance(expression, Range):
+            return expression.contains(self._values_by_ordinal[expression.field][ordinal])
+        if isinstance(expression, And):
+            return all(self.matches(ordinal, operand) for operand in expression.operands)
+        if isinstance(expression, Or):
+            return any(self.matches(ordinal, operand) for operand in expression.operands)
+        if isinstance(expression, Not):
+            return not self.matches(ordinal, expression.operand)
+        raise TypeError(f'Not a query expression: {expression!r}')
+
+    def bitmap_of_ordinals(self, ordinals: Iterable[int]) -> int:
+        bits = bytearray((len(self._movie_ids) + 7) >> 3)
+        for ordinal in ordinals:
+            bits[ordinal >> 3] |= 1 << (ordinal & 7)
+        return int.from_bytes(bits, 'little')
+
+    def bitmap_of_ids(self, movie_ids: Iterable[int]) -> int:
+        ordinals = (self._ordinals.get(movie_id) for movie_id in movie_ids)
+        return self.bitmap_of_ordinals(ordinal for ordinal in ordinals if ordinal is not None)
+
+    def ordinals_of(self, bitmap: int):
+        """ Yields the ordinals set in bitmap, in increasing order. """
+        for byte_index, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, 'little')):
+            while byte:
+                low_bit = byte & -byte
+                yield (byte_index << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    def ids_of(self, bitmap: int) -> List[int]:
+        return [self._movie_ids[ordinal] for ordinal in self.ordinals_of(bitmap)]
+
+    def facet_counts(self, bitmap: int, field: str, limit: int = None) -> List[dict]:
+        """ Returns how many movies of bitmap have each value of field, most frequent first.
+
+        Each count is an intersection with a value's bitmap, unless the result set is smaller than the number of
+        values, as it often is for directors; then the movies in it are counted one by one instead.
+        """
+        keys = self._bits[field]
+        total = popcount(bitmap)
+        if total < len(keys):
+            keys_by_ordinal = self._keys_by_ordinal[field]
+            counts = Counter()
+            for ordinal in self.ordinals_of(bitmap):
+                if ordinal < len(keys_by_ordinal):
+                    counts.update(keys_by_ordinal[ordinal])
+        else:
+            counts = dict()
+            for key in keys:
+                count = popcount(bitmap & self.bitmap(field, key))
+                if count:
+                    counts[key] = count
+
+        names = self._names[field]
+        facets = sorted(counts.items(), key=lambda item: (-item[1], str(names[item[0]])))
+        if limit is not None:
+            facets = facets[:limit]
+        return [{'value': key, 'name': names[key], 'count': count} for key, count in facets]
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import uuid
+import weakref
+from datetime import datetime
+
+import movies.adapters.repository as repo
+from movies.adapters.repository import AbstractRepository
+from movies.domain.model import User, make_comment
+
+logger = logging.getLogger(__name__)
+
+# Every live CommentLog, so that a single fork hook serves them all however many apps are created.
+_logs = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for comment_log in list(_logs):
+        comment_log._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    # Workers forked from a preloaded app must not share the parent's origin, and the tailing thread does not
+    # survive the fork.
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class CommentLog:
+    """ Append-only JSON Lines file that lets several worker processes share new comments and users.
+
+    Every worker appends the comments (and registrations) it accepts, and tails the file from the byte offset it
+    last read, applying records written by the other workers to its own repository. History is read once, when the
+    log is first applied; after that each poll only reads the bytes appended since the previous one.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._origin = self._new_origin()
+        self._offset = 0
+        self._partial = b''
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        _logs.add(self)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def poll_interval(self) -> float:
+        return self._poll_interval
+
+    def append_comment(self, comment_dict: dict):
+        self._append({
+            'kind': 'comment',
+            'username': comment_dict['username'],
+            'movie_id': comment_dict['movie_id'],
+            'comment_text': comment_dict['comment_text'],
+            # The exact time, so comments posted within the same second keep their order in every worker.
+            'timestamp': comment_dict['posted_at'],
+        })
+
+    def append_user(self, user_dict: dict):
+        self._append({
+            'kind': 'user',
+            'username': user_dict['username'],
+            'password': user_dict['password'],
+        })
+
+    def apply_new(self, repository: AbstractRepository) -> int:
+        """ Applies the records appended by other workers since the last call, returning how many were applied. """
+        applied = 0
+        with self._lock:
+            for record in self._read_new():
+                if record.get('origin') == self._origin:
+                    continue
+                if self._apply(record, repository):
+                    applied += 1
+        return applied
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='comment-log-tail', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self._poll_interval):
+            try:
+                self.apply_new(repo.repo_instance)
+            except Exception:
+                logger.exception('Could not apply records from comment log %s', self._path)
+
+    def _append(self, record: dict):
+        record['origin'] = self._origin
+        line = (json.dumps(record) + '\n').encode('utf-8')
+
+        # A single write to a file opened with O_APPEND lands at the end of the file even when several processes
+        # append concurrently.
+        fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _read_new(self):
+        try:
+            size = os.path.getsize(self._path)
+        except FileNotFoundError:
+            return []
+
+        if size < self._offset:
+            # The log has been truncated or replaced, start again from the beginning.
+            self._offset = 0
+            self._partial = b''
+
+        with open(self._path, 'rb') as infile:
+            infile.seek(self._offset)
+            data = infile.read()
+        self._offset += len(data)
+
+        # Keep any trailing, partially written line for the next poll.
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+
+        records = list()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                logger.warning('Skipping malformed record in comment log %s', self._path)
+        return records
+
+    def _apply(self, record: dict, repository: AbstractRepository) -> bool:
+        kind = record.get('kind')
+
+        if kind == 'user':
+            if repository.get_user(record['username']) is not None:
+                return False
+            repository.add_user(User(record['username'], record['password']))
+            return True
+
+        if kind == 'comment':
+            user = repository.get_user(record['username'])
+            movie = repository.get_movie(record['movie_id'])
+            if user is None or movie is None:
+                logger.warning('Skipping comment by %s on unknown movie or user', record['username'])
+                return False
+            comment = make_comment(
+                comment_text=record['comment_text'],
+                user=user,
+                movie=movie,
+                timestamp=datetime.fromtimestamp(record['timestamp'])
+            )
+            repository.add_comment(comment)
+            return True
+
+        return False
+
+    def _after_fork(self):
+        self._origin = self._new_origin()
+        self._lock = threading.Lock()
+        was_running = self._thread is not None
+        self._thread = None
+        if was_running and not self._stopped.is_set():
+            self.start()
+
+    @staticmethod
+    def _new_origin() -> str:
+        return f'{os.getpid()}-{uuid.uuid4().hex}'
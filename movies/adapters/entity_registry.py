@@ -0,0 +1,46 @@
+import sys
+from typing import Dict, List, Optional, Type, Union
+
+from movies.domain.model import Genre, Actor, Director
+
+Entity = Union[Genre, Actor, Director]
+
+_NAME_ATTRIBUTES = {Genre: '_genre_name', Actor: '_name', Director: '_name'}
+
+
+class EntityRegistry:
+    """ The single shared Genre, Actor and Director for each name.
+
+    Interning an entity gives it the next integer id of its kind, which keys the per-id indexes, and stores its name
+    as an interned string, so the catalog keeps one copy of every name however many movies mention it. Entities still
+    compare by name, so instances from different registries, or not registered at all, agree on equality and hash. Later entities with a registered name resolve to the instance registered first.
+    """
+
+    def __init__(self):
+        self._by_name: Dict[type, Dict[str, Entity]] = {kind: dict() for kind in _NAME_ATTRIBUTES}
+        self._by_id: Dict[type, List[Entity]] = {kind: list() for kind in _NAME_ATTRIBUTES}
+
+    def intern(self, entity: Entity) -> Entity:
+        """ Returns the registered entity with entity's kind and name, registering entity itself if there is none. """
+        kind = type(entity)
+        attribute = _NAME_ATTRIBUTES[kind]
+        name = getattr(entity, attribute)
+        canonical = self._by_name[kind].get(name)
+        if canonical is None:
+            name = sys.intern(name)
+            setattr(entity, attribute, name)
+            entity._id = len(self._by_id[kind])
+            self._by_id[kind].append(entity)
+            self._by_name[kind][name] = entity
+            canonical = entity
+        return canonical
+
+    def get(self, kind: Type[Entity], name: str) -> Optional[Entity]:
+        return self._by_name[kind].get(name)
+
+    def get_by_id(self, kind: Type[Entity], id: int) -> Optional[Entity]:
+        entities = self._by_id[kind]
+        return entities[id] if 0 <= id < len(entities) else None
+
+    def number_of(self, kind: Type[Entity]) -> int:
+        return len(self._by_id[kind])
@@ -0,0 +1,184 @@
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, List
+
+from movies.adapters.repository import AbstractRepository
+from movies.domain.model import Comment, User, make_comment
+
+logger = logging.getLogger(__name__)
+
+# The (SwappableRepository, repository) a request has pinned, so a swap halfway through it doesn't change what it reads.
+_pinned = ContextVar('pinned_repository', default=None)
+
+# Catalog changes (imports and reloads) are applied one at a time; requests reading the catalog don't wait for them.
+catalog_lock = threading.Lock()
+
+
+class SwappableRepository:
+    """ Stands in for the current generation of the repository, which a reload replaces as a whole.
+
+    Swapping is a single reference assignment: requests already running keep the generation they pinned when they
+    started, new requests get the new one, and nothing on the read path takes a lock. Outside a request (background
+    threads, the command line) calls go to the current generation.
+    """
+
+    def __init__(self, repo: AbstractRepository):
+        self._current = repo
+        self._generation = 1
+
+    @property
+    def current(self) -> AbstractRepository:
+        return self._current
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def pin(self):
+        """ Makes the current generation the one this context sees until unpin is called with the returned token. """
+        return _pinned.set((self, self._current))
+
+    def unpin(self, token):
+        _pinned.reset(token)
+
+    def swap(self, repo: AbstractRepository) -> AbstractRepository:
+        """ Makes repo the current generation, returning the one it replaces. """
+        previous = self._current
+        self._current = repo
+        self._generation += 1
+        return previous
+
+    def __getattr__(self, name):
+        pinned = _pinned.get()
+        if pinned is not None and pinned[0] is self:
+            return getattr(pinned[1], name)
+        return getattr(self._current, name)
+
+
+AbstractRepository.register(SwappableRepository)
+
+
+def migrate_runtime_state(source: AbstractRepository, target: AbstractRepository) -> dict:
+    """ Copies the users and comments of source that target doesn't have yet into target.
+
+    Users already in target take the password they have in source, which may have been rehashed since the catalog
+    was loaded. Comments on movies target no longer has are dropped. Running it again only copies what is new.
+    """
+    users = comments = dropped = 0
+    for source_user in list(source.get_users()):
+        user = target.get_user(source_user.username)
+        if user is None:
+            target.add_user(User(source_user.username, source_user.password))
+            users += 1
+        elif user.password != source_user.password:
+            user.password = source_user.password
+
+    for source_comment in list(source.get_comments()):
+        user = target.get_user(source_comment.user.username)
+        movie = target.get_movie(source_comment.movie.id)
+        if user is None or movie is None:
+            dropped += 1
+            continue
+        timestamp = datetime.fromtimestamp(source_comment.timestamp)
+        if movie.has_comment(Comment(user, movie, source_comment.comment, timestamp)):
+            continue
+        target.add_comment(make_comment(source_comment.comment, user, movie, timestamp))
+        comments += 1
+
+    return {'users': users, 'comments': comments, 'dropped_comments': dropped}
+
+
+class CatalogReloader:
+    """ Reloads the catalog into a new repository generation without pausing requests.
+
+    build makes and populates the new repository. The users and comments of the current generation are migrated into
+    it, it is swapped in, and the comments added to the old generation while that happened are migrated once more.
+    Callbacks in after_swap are then handed the new generation, to rebuild anything derived from the catalog; imports
+    hand them the generation they changed through catalog_changed. Only one reload runs at a time.
+    """
+
+    def __init__(self, repositories: SwappableRepository, build: Callable[[], AbstractRepository],
+                 after_swap: List[Callable[[AbstractRepository], None]] = None):
+        self._repositories = repositories
+        self._build = build
+        self._after_swap = list(after_swap or [])
+        self._running = threading.Lock()
+        self._thread = None
+        self._last_result = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._running.locked()
+
+    @property
+    def last_result(self) -> dict:
+        return self._last_result
+
+    def status(self) -> dict:
+        return {
+            'generation': self._repositories.generation,
+            'in_progress': self.in_progress,
+            'last_reload': self._last_result,
+        }
+
+    def start(self):
+        """ Reloads in a background thread, returning the thread, or None if a reload is already running. """
+        if not self._running.acquire(blocking=False):
+            return None
+        self._thread = threading.Thread(target=self._reload_and_release, name='catalog-reload', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout: float = None):
+        """ Waits for the reload started last to finish. """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def reload(self) -> dict:
+        """ Reloads in the calling thread, returning what the reload did, or None if one is already running. """
+        if not self._running.acquire(blocking=False):
+            return None
+        return self._reload_and_release()
+
+    def catalog_changed(self, repository: AbstractRepository):
+        """ Rebuilds whatever is derived from the catalog, after repository was changed in place. """
+        for callback in self._after_swap:
+            callback(repository)
+
+    def _reload_and_release(self):
+        try:
+            self._last_result = self._reload()
+        except Exception as exception:
+            logger.exception('Could not reload the catalog')
+            self._last_result = {'error': str(exception)}
+        finally:
+            self._running.release()
+        return self._last_result
+
+    def _reload(self) -> dict:
+        started = perf_counter()
+        # Imports wait for the reload and then write to the generation current by then, so none of them land on the
+        # generation being replaced.
+        with catalog_lock:
+            repository = self._build()
+            migrated = migrate_runtime_state(self._repositories.current, repository)
+            previous = self._repositories.swap(repository)
+
+        # Requests that started before the swap may still have commented on the previous generation.
+        caught_up = migrate_runtime_state(previous, repository)
+        self.catalog_changed(repository)
+
+        result = {
+            'generation': self._repositories.generation,
+            'number_of_movies': repository.get_number_of_movies(),
+            'users': migrated['users'] + caught_up['users'],
+            'comments': migrated['comments'] + caught_up['comments'],
+            'dropped_comments': migrated['dropped_comments'],
+            'seconds': round(perf_counter() - started, 3),
+        }
+        logger.info('Reloaded the catalog as generation %d with %d movies in %.3f s', result['generation'],
+                    result['number_of_movies'], result['seconds'])
+        return result
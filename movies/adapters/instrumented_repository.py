@@ -0,0 +1,44 @@
+from time import perf_counter
+
+from movies.adapters.repository import AbstractRepository
+
+
+class InstrumentedRepository:
+    """ Wraps a repository and reports every public method call to a list of observers.
+
+    Observers implement call_started(method_name) and call_finished(method_name, elapsed_seconds). Attributes that
+    aren't methods are passed through untouched.
+    """
+
+    def __init__(self, repo: AbstractRepository, *observers):
+        self._repo = repo
+        self._observers = observers
+
+    @property
+    def wrapped_repository(self) -> AbstractRepository:
+        return self._repo
+
+    def __getattr__(self, name):
+        attribute = getattr(self._repo, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        observers = self._observers
+
+        def instrumented(*args, **kwargs):
+            for observer in observers:
+                observer.call_started(name)
+            started = perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - started
+                for observer in observers:
+                    observer.call_finished(name, elapsed)
+
+        # Cache the wrapper so later lookups don't go through __getattr__ again.
+        self.__dict__[name] = instrumented
+        return instrumented
+
+
+AbstractRepository.register(InstrumentedRepository)
@@ -0,0 +1,145 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from movies.domain.model import Movie
+
+# The value each leaderboard ranks movies by, highest first. Movies without a value (no revenue) are left out.
+LEADERBOARDS = {
+    'top_rated': lambda movie: movie.rating,
+    'most_voted': lambda movie: movie.votes,
+    'highest_grossing': lambda movie: movie.revenue,
+}
+
+DEFAULT_MIN_VOTES = 10000
+
+# Keys per block of a SortedKeys; a block is split once it holds twice as many.
+BLOCK_SIZE = 512
+
+
+class SortedKeys:
+    """ A sorted set of keys kept as a list of sorted blocks, each with its largest key in a separate list.
+
+    Adding or removing a key bisects the block maxima, then the block, and moves at most one block's worth of keys,
+    where a single sorted list would move half the board on average.
+    """
+
+    def __init__(self, keys: Iterable = ()):
+        keys = sorted(set(keys))
+        self._blocks = [keys[start:start + BLOCK_SIZE] for start in range(0, len(keys), BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._length = len(keys)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        for block in self._blocks:
+            yield from block
+
+    def add(self, key):
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._length = 1
+            return
+        position = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[position]
+        index = bisect_left(block, key)
+        if index < len(block) and block[index] == key:
+            return
+        block.insert(index, key)
+        self._maxes[position] = block[-1]
+        self._length += 1
+        if len(block) > 2 * BLOCK_SIZE:
+            self._blocks[position:position + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self._maxes[position:position + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+
+    def discard(self, key):
+        position = bisect_left(self._maxes, key)
+        if position == len(self._blocks):
+            return
+        block = self._blocks[position]
+        index = bisect_left(block, key)
+        if block[index] != key:
+            return
+        del block[index]
+        self._length -= 1
+        if block:
+            self._maxes[position] = block[-1]
+        else:
+            del self._blocks[position]
+            del self._maxes[position]
+
+    def head(self, k: int) -> List:
+        """ Returns the k smallest keys, smallest first. """
+        keys = list()
+        for block in self._blocks:
+            if len(keys) >= k:
+                break
+            keys.extend(block[:k - len(keys)])
+        return keys
+
+
+class Leaderboards:
+    """ Every leaderboard, overall, per genre, per year and per genre and year, kept sorted as movies arrive.
+
+    Each board is a SortedKeys of (-value, movie id) keys, so the top k movies are its first k keys and adding or
+    removing a movie costs a couple of bisects rather than a pass over the board. A whole catalog is better entered
+    with rebuild, which sorts each board once. Only movies with at least min_votes votes make the top rated boards,
+    which keeps a movie rated 9.5 by a handful of people from heading them.
+    """
+
+    def __init__(self, min_votes: int = DEFAULT_MIN_VOTES):
+        self._min_votes = min_votes
+        self._boards: Dict[Tuple[str, str, int], SortedKeys] = defaultdict(SortedKeys)
+
+    @property
+    def min_votes(self) -> int:
+        return self._min_votes
+
+    def rebuild(self, movies: Iterable[Movie]):
+        """ Replaces every board with the boards of movies, by their current figures and genres. """
+        keys = defaultdict(list)
+        for movie in movies:
+            for genre_name in (None,) + tuple(genre.genre_name for genre in movie.genres):
+                for board, key in self._keys(movie, genre_name):
+                    keys[board].append(key)
+        self._boards = defaultdict(SortedKeys, {board: SortedKeys(board_keys) for board, board_keys in keys.items()})
+
+    def add_movie(self, movie: Movie):
+        """ Enters the movie on the overall and year boards, and on the boards of the genres it already has. """
+        for genre_name in (None,) + tuple(genre.genre_name for genre in movie.genres):
+            self.add_to_genre(movie, genre_name)
+
+    def add_to_genre(self, movie: Movie, genre_name: str):
+        for board, key in self._keys(movie, genre_name):
+            self._boards[board].add(key)
+
+    def remove_movie(self, movie: Movie):
+        """ Takes the movie off every board it is on, going by its current figures and genres. """
+        for genre_name in (None,) + tuple(genre.genre_name for genre in movie.genres):
+            for board, key in self._keys(movie, genre_name):
+                if board in self._boards:
+                    self._boards[board].discard(key)
+
+    def top(self, board: str, k: int, genre_name: str = None, year: int = None) -> List[int]:
+        if board not in LEADERBOARDS:
+            raise KeyError(board)
+        if genre_name is not None:
+            genre_name = genre_name.lower()
+        entries = self._boards.get((board, genre_name, year))
+        return [movie_id for _, movie_id in entries.head(k)] if entries is not None else []
+
+    def _keys(self, movie: Movie, genre_name: str):
+        """ Yields the boards movie belongs on for genre_name (None for the overall boards), with its key on each. """
+        if genre_name is not None:
+            # Genre names are matched case insensitively, as in the genre links.
+            genre_name = genre_name.lower()
+        for board, value_of in LEADERBOARDS.items():
+            value = value_of(movie)
+            if value is None or (board == 'top_rated' and movie.votes < self._min_votes):
+                continue
+            key = (-value, movie.id)
+            for year in (None, movie.year):
+                yield (board, genre_name, year), key
@@ -1,37 +1,157 @@
 import csv
 import os
+from array import array
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
-
-from bisect import bisect_left, insort_left
-
-from werkzeug.security import generate_password_hash
-
-from movies.adapters.repository import AbstractRepository
+from itertools import chain
+from time import perf_counter
+from typing import List, Sequence, Tuple
+
+from bisect import bisect_left
+
+from movies.adapters.entity_registry import EntityRegistry
+from movies.authentication import hashing
+from movies.adapters.bitmap_index import BitmapIndex, GENRE, ACTOR, DIRECTOR, DECADE, RATING
+from movies.adapters.leaderboards import Leaderboards, DEFAULT_MIN_VOTES
+from movies.adapters.query_planner import QueryPlanner
+from movies.adapters.repository import AbstractRepository, RepositoryException
 from movies.domain.model import Movie, Genre, User, Comment, make_comment, Director, Actor, make_genre_association, \
-    make_actor_association, make_director_association
+    make_actor_association, make_director_association, remove_genre_association, remove_actor_association, \
+    remove_director_association
 
 
 class MemoryRepository(AbstractRepository):
 
-    def __init__(self):
-        self._movies: List[Movie] = list()
+    def __init__(self, leaderboard_min_votes: int = DEFAULT_MIN_VOTES):
+        # Movie ids in increasing order. get_all_movie_ids hands out read-only views of the array, so it is never
+        # changed: new ids go into a new array, published with a single assignment, once per batch of movies.
+        self._movie_ids = array('i')
+        self._pending_movie_ids = None
         self._movies_index = dict()
         self._genres: List[Genre] = list()
-        self._actors: List[Genre] = list()
-        self._directors: List[Genre] = list()
+        self._actors: List[Actor] = list()
+        self._directors: List[Director] = list()
+        self._registry = EntityRegistry()
         self._users: List[User] = list()
+        self._users_index = dict()
         self._comments: List[Comment] = list()
+        self._leaderboards = Leaderboards(leaderboard_min_votes)
+        self._leaderboards_deferred = False
+        self._bitmap_index = BitmapIndex()
+        self._query_planner = QueryPlanner(self._bitmap_index)
 
     def add_user(self, user: User):
         self._users.append(user)
+        self._users_index[user.username] = user
 
     def get_user(self, username) -> User:
-        return next((user for user in self._users if user.username == username), None)
+        return self._users_index.get(username)
+
+    def get_users(self) -> List[User]:
+        return self._users
+
+    def _add_movie_id(self, movie_id: int):
+        if movie_id in self._movies_index:
+            return
+        if self._pending_movie_ids is not None:
+            self._pending_movie_ids.append(movie_id)
+        else:
+            self._publish_movie_ids([movie_id])
+
+    def _publish_movie_ids(self, movie_ids: List[int]):
+        if not movie_ids:
+            return
+        movie_ids.sort()
+        if not self._movie_ids or movie_ids[0] > self._movie_ids[-1]:
+            self._movie_ids = self._movie_ids + array('i', movie_ids)
+        else:
+            self._movie_ids = array('i', sorted(chain(self._movie_ids, movie_ids)))
+
+    @contextmanager
+    def _movie_id_batch(self):
+        """ Collects the ids of the movies added in the with block, publishing them together when it ends. """
+        if self._pending_movie_ids is not None:
+            yield
+            return
+        self._pending_movie_ids = list()
+        try:
+            yield
+        finally:
+            pending, self._pending_movie_ids = self._pending_movie_ids, None
+            self._publish_movie_ids(pending)
+
+    @contextmanager
+    def bulk_load(self):
+        """ Leaves the leaderboards and the numeric columns of the bitmap index unsorted while the with block adds movies
+        and genres, then sorts each board and column once, instead of keeping them sorted one movie at a time. """
+        self._leaderboards_deferred = True
+        try:
+            with self._movie_id_batch(), self._bitmap_index.bulk_load():
+                yield self
+        finally:
+            self._leaderboards_deferred = False
+            self._leaderboards.rebuild(self._movies_index.values())
 
     def add_movie(self, movie: Movie):
-        insort_left(self._movies, movie)
+        self._add_movie_id(movie.id)
         self._movies_index[movie.id] = movie
+        if not self._leaderboards_deferred:
+            self._leaderboards.add_movie(movie)
+        self._bitmap_index.add_movie(movie)
+
+    def upsert_movie(self, movie: Movie, genre_names: List[str], actor_names: List[str],
+                     director_name: str) -> Movie:
+        stored = self._movies_index.get(movie.id)
+        if stored is None:
+            stored = movie
+            self._add_movie_id(movie.id)
+            self._movies_index[movie.id] = movie
+        else:
+            if not self._leaderboards_deferred:
+                # Leaderboard entries are keyed by the figures and genres the movie has now, so go before they change.
+                self._leaderboards.remove_movie(stored)
+            stored.update_details(movie)
+
+        for genre in [genre for genre in stored.genres if genre.genre_name not in genre_names]:
+            remove_genre_association(stored, genre)
+        for genre_name in genre_names:
+            genre = self._registry.get(Genre, genre_name)
+            if genre is None:
+                genre = Genre(genre_name)
+                self.add_genre(genre)
+            if not stored.is_belong_to_genre(genre):
+                stored.add_genre(genre)
+                genre.add_movie(stored)
+
+        for actor in [actor for actor in stored.actors if actor.actor_name not in actor_names]:
+            remove_actor_association(stored, actor)
+        current_actors = list(stored.actors)
+        for actor_name in actor_names:
+            actor = self._registry.get(Actor, actor_name)
+            if actor is None:
+                actor = Actor(actor_name)
+                self.add_actor(actor)
+            if actor not in current_actors:
+                stored.add_actor(actor)
+                actor.add_movie(stored)
+
+        if stored.director is None or stored.director.director_name != director_name:
+            remove_director_association(stored)
+            director = self._registry.get(Director, director_name)
+            if director is None:
+                director = Director(director_name)
+                self.add_director(director)
+            stored.belongs_to_director(director)
+            director.add_movie(stored)
+
+        if not self._leaderboards_deferred:
+            self._leaderboards.add_movie(stored)
+        self._bitmap_index.update_movie(stored)
+        return stored
+
+    def upsert_movies(self, rows: List[Tuple[Movie, List[str], List[str], str]]) -> List[Movie]:
+        with self._movie_id_batch():
+            return [self.upsert_movie(*row) for row in rows]
 
     def get_movie(self, id: int) -> Movie:
         movie = None
@@ -44,31 +164,42 @@ class MemoryRepository(AbstractRepository):
         return movie
 
     def filter_movies(self, actor_name: str = "", director_name: str = "", genre_name: str = ""):
-        movie_ids = list()
-        for movie in self._movies:
-            actor_names = [actor.actor_name.lower() for actor in movie.actors]
-            genre_names = [genre.genre_name.lower() for genre in movie.genres]
-            if (not actor_name or actor_name.lower() in actor_names) and (
-                    not genre_name or genre_name.lower() in genre_names) and (
-                    not director_name or director_name.lower() == movie.director.director_name.lower()):
-                movie_ids.append(movie.id)
-        return movie_ids
+        bitmap = self._bitmap_index.universe
+        for field, name in ((ACTOR, actor_name), (DIRECTOR, director_name), (GENRE, genre_name)):
+            if name:
+                bitmap &= self._bitmap_index.bitmap(field, name)
+        # Highest id first, the order the movies are stored in.
+        return sorted(self._bitmap_index.ids_of(bitmap), reverse=True)
+
+    def query_movies(self, expression) -> List[int]:
+        bitmap, _ = self._query_planner.execute(expression)
+        return self._ids_of_matches(bitmap)
+
+    def explain_query(self, expression) -> dict:
+        bitmap, stages = self._query_planner.execute(expression)
+        explanation = self._query_planner.describe(expression, bitmap, stages)
+        explanation['movie_ids'] = self._ids_of_matches(bitmap)
+        return explanation
+
+    def _ids_of_matches(self, bitmap: int) -> List[int]:
+        # Highest id first, as filter_movies lists them, since both fill the same listing.
+        return sorted(self._bitmap_index.ids_of(bitmap), reverse=True)
 
     def get_number_of_movies(self):
-        return len(self._movies)
+        return len(self._movie_ids)
 
     def get_first_movie(self):
         movie = None
 
-        if len(self._movies) > 0:
-            movie = self._movies[-1]
+        if len(self._movie_ids) > 0:
+            movie = self._movies_index[self._movie_ids[0]]
         return movie
 
     def get_last_movie(self):
         movie = None
 
-        if len(self._movies) > 0:
-            movie = self._movies[0]
+        if len(self._movie_ids) > 0:
+            movie = self._movies_index[self._movie_ids[-1]]
         return movie
 
     def get_movies_by_id(self, id_list):
@@ -77,11 +208,11 @@ class MemoryRepository(AbstractRepository):
         movies = [self._movies_index[id] for id in existing_ids]
         return movies
 
-    def get_all_movie_ids(self):
-        return [movie.id for movie in reversed(self._movies)]
+    def get_all_movie_ids(self) -> Sequence[int]:
+        return memoryview(self._movie_ids).toreadonly()
 
     def get_movie_ids_for_genre(self, genre_name: str):
-        genre = next((genre for genre in self._genres if genre.genre_name == genre_name), None)
+        genre = self._registry.get(Genre, genre_name)
 
         if genre is not None:
             movie_ids = [movie.id for movie in genre.genre_movies]
@@ -90,18 +221,55 @@ class MemoryRepository(AbstractRepository):
 
         return movie_ids
 
+    def _register(self, entity):
+        if self._registry.intern(entity) is not entity:
+            raise RepositoryException(f'{entity!r} is already in the repository')
+
     def add_genre(self, genre: Genre):
+        self._register(genre)
         self._genres.append(genre)
+        for movie in genre.genre_movies:
+            if not self._leaderboards_deferred:
+                self._leaderboards.add_to_genre(movie, genre.genre_name)
+            self._bitmap_index.add_value(movie, GENRE, genre.genre_name)
 
     def add_actor(self, actor: Actor):
+        self._register(actor)
         self._actors.append(actor)
+        for movie in actor.movies_starring_actor:
+            self._bitmap_index.add_value(movie, ACTOR, actor.actor_name)
 
     def add_director(self, director: Director):
+        self._register(director)
         self._directors.append(director)
+        for movie in director.movies_directed_by_director:
+            self._bitmap_index.add_value(movie, DIRECTOR, director.director_name)
 
     def get_genres(self) -> List[Genre]:
         return self._genres
 
+    def get_genre(self, genre_name: str) -> Genre:
+        return self._registry.get(Genre, genre_name)
+
+    def get_actor(self, actor_name: str) -> Actor:
+        return self._registry.get(Actor, actor_name)
+
+    def get_director(self, director_name: str) -> Director:
+        return self._registry.get(Director, director_name)
+
+    def get_leaderboard(self, board: str, k: int, genre_name: str = None, year: int = None) -> List[Movie]:
+        try:
+            movie_ids = self._leaderboards.top(board, k, genre_name, year)
+        except KeyError:
+            raise RepositoryException(f'Unknown leaderboard {board}')
+        return [self._movies_index[movie_id] for movie_id in movie_ids]
+
+    def get_facet_counts(self, movie_ids: List[int], limits: dict = None) -> dict:
+        limits = limits or dict()
+        bitmap = self._bitmap_index.bitmap_of_ids(movie_ids)
+        return {field: self._bitmap_index.facet_counts(bitmap, field, limits.get(field))
+                for field in (GENRE, DECADE, RATING, DIRECTOR)}
+
     def add_comment(self, comment: Comment):
         super().add_comment(comment)
         self._comments.append(comment)
@@ -111,25 +279,60 @@ class MemoryRepository(AbstractRepository):
 
     # Helper method to return movies index.
     def movie_index(self, movie: Movie):
-        index = bisect_left(self._movies, movie)
-        if index != len(self._movies) and self._movies[index].title == movie.title and self._movies[
-            index].director == movie.director:
-            return index
+        # Movies are indexed from the highest id down, the order Movie.__lt__ sorts them in.
+        index = bisect_left(self._movie_ids, movie.id)
+        if index != len(self._movie_ids) and self._movie_ids[index] == movie.id:
+            stored_movie = self._movies_index[movie.id]
+            if stored_movie.title == movie.title and stored_movie.director == movie.director:
+                return len(self._movie_ids) - 1 - index
         raise ValueError
 
 
-def read_csv_file(filename: str):
-    with open(filename, encoding='utf-8-sig') as infile:
-        reader = csv.reader(infile)
+def read_csv_rows(infile):
+    reader = csv.reader(infile)
+
+    # Read first line of the the CSV file.
+    headers = next(reader, None)
+
+    # Read remaining rows from the CSV file.
+    for row in reader:
+        # Strip any leading/trailing white space from data read.
+        row = [item.strip() for item in row]
+        yield row
 
-        # Read first line of the the CSV file.
-        headers = next(reader)
 
-        # Read remaining rows from the CSV file.
-        for row in reader:
-            # Strip any leading/trailing white space from data read.
-            row = [item.strip() for item in row]
-            yield row
+def read_csv_file(filename: str):
+    with open(filename, encoding='utf-8-sig') as infile:
+        yield from read_csv_rows(infile)
+
+
+def movie_from_row(data_row):
+    """ Returns the Movie a movies.csv row describes, with the names of its genres, actors and director. """
+    if data_row[10] == "N/A":
+        revenue = None
+    else:
+        revenue = float(data_row[10])
+
+    if data_row[11] == "N/A":
+        metascore = None
+    else:
+        metascore = int(data_row[11])
+
+    movie = Movie(
+        id=int(data_row[0]),
+        title=data_row[1],
+        description=data_row[3],
+        year=int(data_row[6]),
+        runtime=int(data_row[7]),
+        rating=float(data_row[8]),
+        votes=int(data_row[9]),
+        revenue=revenue,
+        metascore=metascore
+    )
+    genre_names = data_row[2].split(",")
+    actor_names = data_row[5].replace(", ", ",").split(",")
+    director_name = data_row[4]
+    return movie, genre_names, actor_names, director_name
 
 
 def load_movies_and_genres_and_actors_and_directors(data_path: str, repo: MemoryRepository):
@@ -138,47 +341,21 @@ def load_movies_and_genres_and_actors_and_directors(data_path: str, repo: Memory
     directors = dict()
 
     for data_row in read_csv_file(os.path.join(data_path, 'movies.csv')):
-
-        movie_id = int(data_row[0])
-        movie_genres = data_row[2].split(",")
-        movie_director = data_row[4]
-        movie_actors = data_row[5].replace(", ", ",").split(",")
+        movie, movie_genres, movie_actors, movie_director = movie_from_row(data_row)
 
         for genre in movie_genres:
             if genre not in genres.keys():
                 genres[genre] = list()
-            genres[genre].append(movie_id)
+            genres[genre].append(movie.id)
 
         for actor in movie_actors:
             if actor not in actors.keys():
                 actors[actor] = list()
-            actors[actor].append(movie_id)
+            actors[actor].append(movie.id)
 
         if movie_director not in directors.keys():
             directors[movie_director] = list()
-        directors[movie_director].append(movie_id)
-
-        if data_row[10] == "N/A":
-            revenue = None
-        else:
-            revenue = float(data_row[10])
-
-        if data_row[11] == "N/A":
-            metascore = None
-        else:
-            metascore = int(data_row[11])
-
-        movie = Movie(
-            id=movie_id,
-            title=data_row[1],
-            description=data_row[3],
-            year=int(data_row[6]),
-            runtime=int(data_row[7]),
-            rating=float(data_row[8]),
-            votes=int(data_row[9]),
-            revenue=revenue,
-            metascore=metascore
-        )
+        directors[movie_director].append(movie.id)
 
         repo.add_movie(movie)
 
@@ -204,13 +381,51 @@ def load_movies_and_genres_and_actors_and_directors(data_path: str, repo: Memory
         repo.add_director(director)
 
 
+def import_movies(infile, repo: AbstractRepository) -> dict:
+    """ Upserts the movies of a movies.csv formatted file into repo, as a single batch.
+
+    Returns how many movies were added and updated, and the line number and problem of every row that was skipped.
+    """
+    rows = list()
+    seen = set()
+    added = 0
+    updated = 0
+    errors = list()
+    for line_number, data_row in enumerate(read_csv_rows(infile), start=2):
+        try:
+            movie, genre_names, actor_names, director_name = movie_from_row(data_row)
+        except (ValueError, IndexError) as exception:
+            errors.append({'line': line_number, 'error': str(exception)})
+            continue
+        if movie.id in seen or repo.get_movie(movie.id) is not None:
+            updated += 1
+        else:
+            added += 1
+        seen.add(movie.id)
+        rows.append((movie, [name for name in genre_names if name], [name for name in actor_names if name],
+                     director_name))
+    # Upserted as one batch, so the listing of movie ids is copied once for the whole file.
+    repo.upsert_movies(rows)
+    return {'added': added, 'updated': updated, 'errors': errors}
+
+
+def is_password_hash(password: str) -> bool:
+    # Hashes written by werkzeug's generate_password_hash look like 'pbkdf2:sha256:150000$salt$hash'.
+    return password.startswith('pbkdf2:') and password.count('$') == 2
+
+
 def load_users(data_path: str, repo: MemoryRepository):
     users = dict()
 
     for data_row in read_csv_file(os.path.join(data_path, 'users.csv')):
+        # Generated catalogs may store passwords already hashed, which saves hashing every row on startup.
+        password = data_row[2]
+        if not is_password_hash(password):
+            password = hashing.hasher.hash(password)
+
         user = User(
             username=data_row[1],
-            password=generate_password_hash(data_row[2])
+            password=password
         )
         repo.add_user(user)
         users[data_row[0]] = user
@@ -228,12 +443,22 @@ def load_comments(data_path: str, repo: MemoryRepository, users):
         repo.add_comment(comment)
 
 
-def populate(data_path: str, repo: MemoryRepository):
+def populate(data_path: str, repo: MemoryRepository, timings: dict = None):
+    """ Loads the catalog, users and comments in data_path into repo, recording how long each took in timings. """
+    started = perf_counter()
     # Load articles and tags into the repository.
-    load_movies_and_genres_and_actors_and_directors(data_path, repo)
+    with repo.bulk_load():
+        load_movies_and_genres_and_actors_and_directors(data_path, repo)
+    loaded_movies = perf_counter()
 
     # Load users into the repository.
     users = load_users(data_path, repo)
+    loaded_users = perf_counter()
 
     # Load comments into the repository.
     load_comments(data_path, repo, users)
+
+    if timings is not None:
+        timings['populate.movies'] = loaded_movies - started
+        timings['populate.users'] = loaded_users - loaded_movies
+        timings['populate.comments'] = perf_counter() - loaded_users
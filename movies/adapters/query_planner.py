@@ -0,0 +1,89 @@
+from typing import List, Tuple
+
+from movies.adapters.bitmap_index import BitmapIndex, popcount, TEXT, words_of
+from movies.domain.query import Term, Range, And, Or, Not
+
+BITMAP = 'bitmap'
+PROBE = 'probe'
+
+
+class QueryPlanner:
+    """ Runs a query as a pipeline over its top level AND, most selective predicate first.
+
+    Each predicate's selectivity is estimated from the index statistics (BitmapIndex.estimate). The most selective
+    one is evaluated as a bitmap and gives the first candidates; every other predicate then either intersects its own
+    bitmap with the candidates or, when the candidates are few and the bitmap is costly to build (a wide range, a
+    negation, several words of free text), is probed against each candidate in turn.
+
+    Costs are counted in movie checks: probing costs one check per candidate and predicate term, building a bitmap
+    about one check per matching movie for a range and a single step for a term, whose bitmap is cached.
+    """
+
+    def __init__(self, index: BitmapIndex):
+        self._index = index
+
+    def plan(self, expression) -> List[Tuple[object, int]]:
+        """ Returns the (predicate, estimated number of matches) pairs of expression, in the order they will run. """
+        predicates = expression.operands if isinstance(expression, And) else [expression]
+        estimates = [(predicate, self._index.estimate(predicate)) for predicate in predicates]
+        return sorted(estimates, key=lambda item: (item[1], self._bitmap_cost(item[0])))
+
+    def execute(self, expression) -> Tuple[int, List[dict]]:
+        """ Returns the bitmap of the movies matching expression and, for explaining it, the stages that ran. """
+        stages = list()
+        candidates = None
+        for predicate, estimate in self.plan(expression):
+            if candidates is None:
+                method = BITMAP
+                candidates = self._index.evaluate(predicate)
+            else:
+                number_of_candidates = popcount(candidates)
+                if number_of_candidates * self._probe_cost(predicate) < self._bitmap_cost(predicate):
+                    method = PROBE
+                    candidates = self._index.bitmap_of_ordinals(
+                        ordinal for ordinal in self._index.ordinals_of(candidates)
+                        if self._index.matches(ordinal, predicate))
+                else:
+                    method = BITMAP
+                    candidates &= self._index.evaluate(predicate)
+            stages.append({
+                'predicate': repr(predicate),
+                'estimate': estimate,
+                'method': method,
+                'candidates': popcount(candidates),
+            })
+            if not candidates:
+                break
+        return candidates, stages
+
+    def explain(self, expression) -> dict:
+        bitmap, stages = self.execute(expression)
+        return self.describe(expression, bitmap, stages)
+
+    def describe(self, expression, bitmap: int, stages: List[dict]) -> dict:
+        """ Describes a run of execute, from the bitmap and stages it returned. """
+        return {
+            'query': repr(expression),
+            'number_of_movies': self._index.number_of_movies,
+            'plan': ' -> '.join(f"{stage['method']} {stage['predicate']}" for stage in stages),
+            'stages': stages,
+            'number_of_matches': popcount(bitmap),
+        }
+
+    def _bitmap_cost(self, expression) -> int:
+        if isinstance(expression, Term):
+            return len(words_of(expression.value)) if expression.field == TEXT else 1
+        if isinstance(expression, Range):
+            return self._index.estimate(expression)
+        if isinstance(expression, Not):
+            return 1 + self._bitmap_cost(expression.operand)
+        if isinstance(expression, (And, Or)):
+            return sum(self._bitmap_cost(operand) for operand in expression.operands)
+        raise TypeError(f'Not a query expression: {expression!r}')
+
+    def _probe_cost(self, expression) -> int:
+        if isinstance(expression, Not):
+            return self._probe_cost(expression.operand)
+        if isinstance(expression, (And, Or)):
+            return sum(self._probe_cost(operand) for operand in expression.operands)
+        return 1
@@ -1,5 +1,5 @@
 import abc
-from typing import List
+from typing import List, Sequence, Tuple
 from datetime import date
 
 from movies.domain.model import User, Movie, Genre, Actor, Director, Comment
@@ -28,11 +28,34 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_users(self) -> List[User]:
+        """ Returns every User in the repository, in the order they were added. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_movie(self, movie: Movie):
         """ Adds a Movie to the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def upsert_movie(self, movie: Movie, genre_names: List[str], actor_names: List[str],
+                     director_name: str) -> Movie:
+        """ Adds movie, or updates the details of the Movie with its id in place, keeping that Movie's comments.
+
+        The Movie's genres, actors and director become those named, with any the repository doesn't have yet added
+        to it, and every index is updated for this Movie alone. Returns the stored Movie.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def upsert_movies(self, rows: List[Tuple[Movie, List[str], List[str], str]]) -> List[Movie]:
+        """ Upserts each (movie, genre_names, actor_names, director_name) row in turn, as upsert_movie does.
+
+        The movies added only show up in get_all_movie_ids once every row has been upserted. Returns the stored Movies.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_movie(self, id: int) -> Movie:
         """ Returns Movie with id from the repository.
@@ -43,12 +66,31 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def filter_movies(self, actor_name: str = "", director_name: str = "", genre_name: str = "") -> List[int]:
-        """Returns a list of ids representing Movies filter by actor name or director name or genre.
+        """Returns a list of ids representing Movies filter by actor name or director name or genre, highest first.
 
         If there are no matches, this method returns an empty list.
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def query_movies(self, expression) -> List[int]:
+        """ Returns the ids, highest first as filter_movies does, of the Movies matching a query expression.
+
+        The expression is a tree of movies.domain.query Term, Range, And, Or and Not nodes, as returned by
+        movies.domain.query.parse. If it is malformed, this method raises a QuerySyntaxException.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def explain_query(self, expression) -> dict:
+        """ Runs a query expression as query_movies does and describes how: the plan that ran, and for every stage of
+        it the predicate, its estimated number of matches, how it was evaluated and the candidates left after it.
+
+        The matching ids, as query_movies would return them, are included as movie_ids, so explaining a query doesn't
+        take running it again.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_number_of_movies(self) -> int:
         """ Returns the number of Movies in the repository. """
@@ -79,9 +121,11 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_all_movie_ids(self) -> List[int]:
+    def get_all_movie_ids(self) -> Sequence[int]:
         """
-        Returns a list of all ids representing Movies.
+        Returns the ids of all Movies, in increasing order.
+
+        The sequence may be a read-only view (slicing it doesn't copy the ids); it won't change as Movies are added.
         """
         raise NotImplementedError
 
@@ -95,17 +139,35 @@ class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
     def add_genre(self, genre: Genre):
-        """ Adds a Genre to the repository. """
+        """ Adds a Genre to the repository, which registers it as the shared Genre of that name and gives it an id.
+
+        If the repository already has a Genre with the same name, this method raises a RepositoryException.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
     def add_director(self, director: Director):
-        """ Adds a Director to the repository. """
+        """ Adds a Director to the repository, registering it as add_genre does Genres. """
         raise NotImplementedError
 
     @abc.abstractmethod
     def add_actor(self, actor: Actor):
-        """ Adds an Actor to the repository. """
+        """ Adds an Actor to the repository, registering it as add_genre does Genres. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_genre(self, genre_name: str) -> Genre:
+        """ Returns the repository's Genre named genre_name, or None if there is none. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_actor(self, actor_name: str) -> Actor:
+        """ Returns the repository's Actor named actor_name, or None if there is none. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_director(self, director_name: str) -> Director:
+        """ Returns the repository's Director named director_name, or None if there is none. """
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -113,6 +175,24 @@ class AbstractRepository(abc.ABC):
         """ Returns the Genres stored in the repository. """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_leaderboard(self, board: str, k: int, genre_name: str = None, year: int = None) -> List[Movie]:
+        """ Returns the top k Movies of a leaderboard ('top_rated', 'most_voted' or 'highest_grossing'), best first.
+
+        The board covers every Movie unless it is narrowed to a genre, a year or both. If board isn't a known
+        leaderboard, this method raises a RepositoryException.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_facet_counts(self, movie_ids: List[int], limits: dict = None) -> dict:
+        """ Returns, for each facet (genre, decade, rating and director), how many of the Movies have each value.
+
+        Every facet maps to a list of {'value', 'name', 'count'} dicts, most frequent first; limits optionally caps
+        the length of some of those lists, e.g. {'director': 5}.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_comment(self, comment: Comment):
         """ Adds a Comment to the repository.
@@ -120,12 +200,128 @@ class AbstractRepository(abc.ABC):
         If the Comment doesn't have bidirectional links with an Movie and a User, this method raises a
         RepositoryException and doesn't update the repository.
         """
-        if comment.user is None or comment not in comment.user.comments:
+        if comment.user is None or not comment.user.has_comment(comment):
             raise RepositoryException('Comment not correctly attached to a User')
-        if comment.movie is None or comment not in comment.movie.comments:
+        if comment.movie is None or not comment.movie.has_comment(comment):
             raise RepositoryException('Comment not correctly attached to an Movie')
 
     @abc.abstractmethod
     def get_comments(self):
         """ Returns the Comments stored in the repository. """
         raise NotImplementedError
+
+
+class AbstractAsyncRepository(abc.ABC):
+    """ Async variant of AbstractRepository for implementations backed by I/O (databases, remote services).
+
+    The methods have the same meaning as their AbstractRepository counterparts.
+    """
+
+    @abc.abstractmethod
+    async def add_user(self, user: User):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_user(self, username) -> User:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_users(self) -> List[User]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_movie(self, movie: Movie):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def upsert_movie(self, movie: Movie, genre_names: List[str], actor_names: List[str],
+                           director_name: str) -> Movie:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def upsert_movies(self, rows: List[Tuple[Movie, List[str], List[str], str]]) -> List[Movie]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movie(self, id: int) -> Movie:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def filter_movies(self, actor_name: str = "", director_name: str = "", genre_name: str = "") -> List[int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def query_movies(self, expression) -> List[int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def explain_query(self, expression) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_number_of_movies(self) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_first_movie(self) -> Movie:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_last_movie(self) -> Movie:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movies_by_id(self, id_list) -> List[Movie]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_all_movie_ids(self) -> Sequence[int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_movie_ids_for_genre(self, genre_name: str) -> List[int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_genre(self, genre: Genre):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_director(self, director: Director):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_actor(self, actor: Actor):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_genre(self, genre_name: str) -> Genre:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_actor(self, actor_name: str) -> Actor:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_director(self, director_name: str) -> Director:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_genres(self) -> List[Genre]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_leaderboard(self, board: str, k: int, genre_name: str = None, year: int = None) -> List[Movie]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_facet_counts(self, movie_ids: List[int], limits: dict = None) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def add_comment(self, comment: Comment):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_comments(self):
+        raise NotImplementedError
@@ -0,0 +1,65 @@
+import hmac
+import io
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, jsonify, request
+
+import movies.adapters.repository as repo
+from movies.adapters.hot_reload import catalog_lock
+from movies.adapters.memory_repository import import_movies
+
+admin_blueprint = Blueprint(
+    'admin_bp', __name__, url_prefix='/admin')
+
+
+def admin_required(view):
+    """ Lets a request through only if it carries the configured ADMIN_TOKEN as a bearer token.
+
+    Without an ADMIN_TOKEN the admin endpoints don't exist, as far as clients can tell.
+    """
+    @wraps(view)
+    def wrapped_view(**kwargs):
+        token = current_app.config.get('ADMIN_TOKEN')
+        if not token:
+            abort(404)
+        authorization = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+            return jsonify({'error': 'Not authorized'}), 401
+        return view(**kwargs)
+
+    return wrapped_view
+
+
+@admin_blueprint.route('/import', methods=['POST'])
+@admin_required
+def import_catalog():
+    """ Upserts the rows of a movies.csv formatted body, or of an uploaded 'file', into the live catalog. """
+    upload = request.files.get('file')
+    if upload is not None:
+        infile = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+    else:
+        infile = io.StringIO(request.get_data().decode('utf-8-sig'))
+
+    with catalog_lock:
+        # Not the generation this request pinned: a reload may have replaced it while the import waited for the lock.
+        repository = repo.repo_instance.current
+        result = import_movies(infile, repository)
+    if result['added'] or result['updated']:
+        current_app.extensions['catalog_reloader'].catalog_changed(repository)
+    return jsonify(result)
+
+
+@admin_blueprint.route('/reload', methods=['POST'])
+@admin_required
+def reload_catalog():
+    """ Starts reloading the catalog from its data files in the background, keeping users and comments. """
+    reloader = current_app.extensions['catalog_reloader']
+    if reloader.start() is None:
+        return jsonify(dict(reloader.status(), error='A reload is already running')), 409
+    return jsonify(reloader.status()), 202
+
+
+@admin_blueprint.route('/reload', methods=['GET'])
+@admin_required
+def reload_status():
+    return jsonify(current_app.extensions['catalog_reloader'].status())
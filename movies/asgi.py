@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import io
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from movies import create_app
+from movies.utilities import offload
+
+# How many chunks of a response may wait for a slow client before the thread producing them waits as well.
+BUFFERED_CHUNKS = 4
+
+
+class AsgiAdapter:
+    """ Serves a WSGI application (the Flask app and its blueprints) to an ASGI server.
+
+    The request body is read and the response is written on the event loop. The call into the WSGI application and
+    the iteration over its response run as one task on a bounded thread pool, in a copy of the caller's context, so a
+    streamed response keeps its request context (which Flask keys by thread) and context variables to the end. The
+    chunks reach the event loop through a small buffer: only a streamed response with a slow client holds its thread,
+    and only once the buffer is full.
+    """
+
+    def __init__(self, wsgi_app, max_threads: int = None, executor: Executor = None):
+        self._wsgi_app = wsgi_app
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi-request')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]}')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Both wait for the work still running, which must not stall the event loop meanwhile.
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._executor.shutdown)
+                await loop.run_in_executor(None, offload.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return  # Client went away before sending the whole request.
+
+        environ = self._build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        chunks = _ChunkChannel(loop, BUFFERED_CHUNKS)
+        response = _WsgiResponse(self._wsgi_app, environ)
+        running = loop.run_in_executor(self._executor, contextvars.copy_context().run, response.run, chunks)
+        try:
+            chunk = await chunks.get()
+            if chunk is None:
+                await running  # Raises whatever stopped the application before it produced a chunk.
+            await send({
+                'type': 'http.response.start',
+                'status': response.status,
+                'headers': response.headers,
+            })
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await chunks.get()
+            await running
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            # Lets the thread stop iterating if the client went away, and waits for it to close the response.
+            chunks.close()
+            await asyncio.wait({running})
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = list()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    @staticmethod
+    def _build_environ(scope, body: bytes) -> dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+        return environ
+
+
+class _ChunkChannel:
+    """ Hands the chunks a pool thread produces to the event loop, blocking the thread while the buffer is full. """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int):
+        self._loop = loop
+        self._chunks = asyncio.Queue(max_chunks)
+        self._closed = False
+
+    def put(self, chunk) -> bool:
+        """ Called from the pool thread. Returns False once the event loop no longer takes chunks. """
+        if self._closed:
+            return False
+        asyncio.run_coroutine_threadsafe(self._chunks.put(chunk), self._loop).result()
+        return not self._closed
+
+    async def get(self):
+        return await self._chunks.get()
+
+    def close(self):
+        """ Called on the event loop. Stops taking chunks, freeing a thread waiting to hand one over. """
+        self._closed = True
+        while not self._chunks.empty():
+            self._chunks.get_nowait()
+
+
+class _WsgiResponse:
+    """ Runs one WSGI call, collecting the status and headers passed to start_response. """
+
+    def __init__(self, wsgi_app, environ: dict):
+        self._wsgi_app = wsgi_app
+        self._environ = environ
+        self._result = None
+        self._iterating = False
+        self._written = list()
+        self.status = 500
+        self.headers = list()
+
+    def _start_response(self, status, headers, exc_info=None):
+        if exc_info is not None and self._iterating:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return self._written.append
+
+    def _take_written(self) -> bytes:
+        written = b''.join(self._written)
+        self._written.clear()
+        return written
+
+    def run(self, chunks: _ChunkChannel):
+        """ Calls the application and iterates over its response, handing chunks over until the channel is closed,
+        and finally None. A WSGI application may only call start_response once iteration begins, so the status and
+        headers are only known once the first chunk (or None) has been handed over. """
+        try:
+            self._result = self._wsgi_app(self._environ, self._start_response)
+            self._iterating = True
+            for chunk in self._result:
+                if not chunks.put(self._take_written() + chunk):
+                    return
+            chunks.put(self._take_written())
+        finally:
+            try:
+                if hasattr(self._result, 'close'):
+                    self._result.close()
+            finally:
+                chunks.put(None)
+
+
+def create_asgi_app(test_config=None):
+    app = create_app(test_config)
+    return AsgiAdapter(app, app.config.get('ASGI_THREADS'))
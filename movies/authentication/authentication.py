@@ -1,16 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, session, request, flash
+from flask import Blueprint, render_template, redirect, url_for, session, request, flash, current_app, abort
 
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Length, ValidationError
 
-from password_validator import PasswordValidator
-
 from functools import wraps
 
 import movies.utilities.utilities as utilities
 import movies.authentication.services as services
 import movies.adapters.repository as repo
+from movies.movies.services import COMMENTS_PER_PAGE
+from movies.utilities.services import get_genre_names
 
 # Configure Blueprint.
 authentication_blueprint = Blueprint(
@@ -26,12 +26,20 @@ def register():
         # Successful POST, i.e. the username and password have passed validation checking.
         # Use the service layer to attempt to add the new user.
         try:
-            services.add_user(form.username.data, form.password.data, repo.repo_instance)
+            user_dict = services.add_user(form.username.data, form.password.data, repo.repo_instance)
             flash("Registration success!")
 
+            # Share the new user with the other worker processes, if configured.
+            comment_log = current_app.extensions.get('comment_log')
+            if comment_log is not None:
+                comment_log.append_user(user_dict)
+
         except services.NameNotUniqueException:
             flash('Your username is already taken - please supply another')
 
+        except services.HashingBusyException:
+            flash('We are handling too many registrations right now - please try again shortly')
+
     for error in form.username.errors:
         flash(error)
     for error in form.password.errors:
@@ -45,7 +53,6 @@ def login():
     form = utilities.LoginForm()
 
     if form.validate_on_submit():
-        print(form.username.data, form.password.data)
         # Successful POST, i.e. the username and password have passed validation checking.
         # Use the service layer to lookup the user.
         try:
@@ -67,6 +74,10 @@ def login():
             # Authentication failed, set a suitable error message.
             flash('Password does not match supplied username - please check and try again')
 
+        except services.HashingBusyException:
+            # Every password hashing slot is taken, ask the user to retry rather than queueing indefinitely.
+            flash('We are handling too many logins right now - please try again shortly')
+
     # For a GET or a failed POST, return the Login Web page.
     return redirect(url_for("home_bp.home"))
 
@@ -87,14 +98,54 @@ def login_required(view):
     return wrapped_view
 
 
+@authentication_blueprint.route('/profile', methods=['GET'])
+@login_required
+def my_profile():
+    return redirect(url_for('authentication_bp.profile', username=session['username']))
+
+
+@authentication_blueprint.route('/profile/<username>', methods=['GET'])
+def profile(username):
+    comments_per_page = current_app.config.get('COMMENTS_PER_PAGE', COMMENTS_PER_PAGE)
+    cursor = request.args.get('cursor')
+    try:
+        activity = services.get_user_activity(username, repo.repo_instance, cursor, comments_per_page)
+    except services.UnknownUserException:
+        abort(404)
+    except services.InvalidCursorException:
+        abort(400)
+
+    return render_template(
+        'profile.html',
+        activity=activity,
+        cursor=cursor,
+        genres=get_genre_names(repo.repo_instance),
+        selected_movies=utilities.get_selected_movies(),
+        top_rated_movies=utilities.get_top_rated_movies(),
+        filter_form=utilities.filter_form,
+        sign_up_form=utilities.sign_up_form,
+        login_form=utilities.login_form,
+        username=session.get('username'),
+    )
+
+
 class PasswordValid:
     def __init__(self, message=None):
         if not message:
             message = u'Your password must be at least 8 characters, and contain an upper case letter, a lower case letter and a digit'
         self.message = message
+        self._schema = None
+
+    @property
+    def schema(self):
+        # Build the validation schema on the first validation rather than at import, and only once.
+        if self._schema is None:
+            from password_validator import PasswordValidator
+            schema = PasswordValidator()
+            schema.min(8).has().uppercase().has().lowercase().has().digits()
+            self._schema = schema
+        return self._schema
 
     def __call__(self, form, field):
-        schema = PasswordValidator()
-        schema.min(8).has().uppercase().has().lowercase().has().digits()
-        if not schema.validate(field.data):
+        if not self.schema.validate(field.data):
             raise ValidationError(self.message)
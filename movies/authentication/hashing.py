@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from movies.utilities import offload
+
+DEFAULT_ITERATIONS = 150000
+
+
+class HashingBusyException(Exception):
+    pass
+
+
+class PasswordHasher:
+    """ Derives and checks password hashes away from the request thread.
+
+    With workers > 0, key derivation runs in a dedicated pool of that many processes, and at most max_pending more
+    requests may queue for it; callers that can't get a slot within acquire_timeout seconds get a
+    HashingBusyException. With workers == 0 it runs on the shared bounded CPU executor instead.
+    """
+
+    def __init__(self, iterations: int = DEFAULT_ITERATIONS, workers: int = 0, max_pending: int = None,
+                 acquire_timeout: float = None):
+        self._method = f'pbkdf2:sha256:{iterations}'
+        self._iterations = iterations
+        self._acquire_timeout = acquire_timeout
+        self._hash_time = None
+        self._executor = None
+        self._slots = None
+
+        if workers > 0:
+            if max_pending is None:
+                max_pending = 4 * workers
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    @property
+    def method(self) -> str:
+        return self._method
+
+    @property
+    def iterations(self) -> int:
+        return self._iterations
+
+    @property
+    def hash_time(self) -> float:
+        """ Seconds taken by one hash at the configured cost, once benchmark() has run. """
+        return self._hash_time
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self._method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """ Returns True if password_hash was derived with a different method or cost than the configured one. """
+        return password_hash.split('$', 1)[0] != self._method
+
+    def benchmark(self, samples: int = 1) -> float:
+        started = perf_counter()
+        for _ in range(samples):
+            self.hash('Benchmark1')
+        self._hash_time = (perf_counter() - started) / samples
+        return self._hash_time
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _run(self, func, *args):
+        if self._executor is None:
+            return offload.run_cpu_bound(func, *args)
+
+        if not self._slots.acquire(timeout=self._acquire_timeout):
+            raise HashingBusyException
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+
+# Replaced by create_app with a hasher built from the application's configuration.
+hasher = PasswordHasher()
+
+
+def configure(iterations: int = DEFAULT_ITERATIONS, workers: int = 0, max_pending: int = None,
+              acquire_timeout: float = None) -> PasswordHasher:
+    global hasher
+
+    previous = hasher
+    hasher = PasswordHasher(iterations, workers, max_pending, acquire_timeout)
+    previous.shutdown()
+    return hasher
@@ -1,7 +1,9 @@
-from werkzeug.security import generate_password_hash, check_password_hash
-
 from movies.adapters.repository import AbstractRepository
-from movies.domain.model import User
+from movies.authentication import hashing
+from movies.authentication.hashing import HashingBusyException
+from movies.domain.model import User, Comment
+from movies.movies.services import comment_to_dict, decode_comments_cursor, encode_comments_cursor, \
+    InvalidCursorException, COMMENTS_PER_PAGE
 
 
 class NameNotUniqueException(Exception):
@@ -23,12 +25,14 @@ def add_user(username: str, password: str, repo: AbstractRepository):
         raise NameNotUniqueException
 
     # Encrypt password so that the database doesn't store passwords 'in the clear'.
-    password_hash = generate_password_hash(password)
+    password_hash = hashing.hasher.hash(password)
 
     # Create and store the new User, with password encrypted.
     user = User(username, password_hash)
     repo.add_user(user)
 
+    return user_to_dict(user)
+
 
 def get_user(username: str, repo: AbstractRepository):
     user = repo.get_user(username)
@@ -38,15 +42,36 @@ def get_user(username: str, repo: AbstractRepository):
     return user_to_dict(user)
 
 
+def get_user_activity(username: str, repo: AbstractRepository, cursor: str = None,
+                      comments_per_page: int = COMMENTS_PER_PAGE):
+    """ Returns the user's comment counts and a page of their comments, newest first, starting after cursor. """
+    user = repo.get_user(username)
+    if user is None:
+        raise UnknownUserException
+
+    comments, next_cursor = user.comments_before(decode_comments_cursor(cursor), comments_per_page)
+    return {
+        'username': user.username,
+        'number_of_comments': user.number_of_comments,
+        'number_of_movies_commented': user.number_of_movies_commented,
+        'comments': [activity_to_dict(comment) for comment in comments],
+        'next_cursor': encode_comments_cursor(next_cursor),
+    }
+
+
 def authenticate_user(username: str, password: str, repo: AbstractRepository):
     authenticated = False
 
     user = repo.get_user(username)
     if user is not None:
-        authenticated = check_password_hash(user.password, password)
+        authenticated = hashing.hasher.verify(user.password, password)
     if not authenticated:
         raise AuthenticationException
 
+    # The password is known to be right, so upgrade a hash made with an outdated cost.
+    if hashing.hasher.needs_rehash(user.password):
+        user.password = hashing.hasher.hash(password)
+
 
 # ===================================================
 # Functions to convert model entities to dictionaries
@@ -58,3 +83,9 @@ def user_to_dict(user: User):
         'password': user.password
     }
     return user_dict
+
+
+def activity_to_dict(comment: Comment):
+    activity_dict = comment_to_dict(comment)
+    activity_dict['movie_title'] = comment.movie.title
+    return activity_dict
@@ -1,5 +1,6 @@
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import List, Iterable
+from typing import Dict, List, Iterable, Optional, Tuple
 
 
 class User:
@@ -8,7 +9,8 @@ class User:
     ):
         self._username: str = username
         self._password: str = password
-        self._comments: List[Comment] = list()
+        self._comments: CommentTimeline = CommentTimeline()
+        self._comment_counts: Dict[int, int] = dict()
 
     @property
     def username(self) -> str:
@@ -18,12 +20,35 @@ class User:
     def password(self) -> str:
         return self._password
 
+    @password.setter
+    def password(self, password: str):
+        self._password = password
+
     @property
     def comments(self) -> Iterable['Comment']:
         return iter(self._comments)
 
+    @property
+    def number_of_comments(self) -> int:
+        return len(self._comments)
+
+    @property
+    def number_of_movies_commented(self) -> int:
+        return len(self._comment_counts)
+
+    def number_of_comments_on(self, movie: 'Movie') -> int:
+        return self._comment_counts.get(movie.id, 0)
+
     def add_comment(self, comment: 'Comment'):
-        self._comments.append(comment)
+        self._comments.add(comment)
+        self._comment_counts[comment.movie.id] = self._comment_counts.get(comment.movie.id, 0) + 1
+
+    def has_comment(self, comment: 'Comment') -> bool:
+        return comment in self._comments
+
+    def comments_before(self, cursor: Tuple[float, int] = None,
+                        limit: int = 10) -> Tuple[List['Comment'], Optional[Tuple[float, int]]]:
+        return self._comments.before(cursor, limit)
 
     def __repr__(self) -> str:
         return f'<User {self._username} {self._password}>'
@@ -41,7 +66,7 @@ class Comment:
         self._user: User = user
         self._movie: Movie = movie
         self._comment: str = comment
-        self._timestamp: str = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        self._timestamp: float = timestamp.timestamp()
 
     @property
     def user(self) -> User:
@@ -56,7 +81,7 @@ class Comment:
         return self._comment
 
     @property
-    def timestamp(self) -> str:
+    def timestamp(self) -> float:
         return self._timestamp
 
     def __eq__(self, other):
@@ -65,13 +90,67 @@ class Comment:
         return other._user == self._user and other._movie == self._movie and other._comment == self._comment and other._timestamp == self._timestamp
 
 
+class CommentTimeline:
+    """ Comments ordered oldest first by (timestamp, order of arrival), with those keys alongside for bisecting. """
+
+    def __init__(self):
+        self._comments: List[Comment] = list()
+        self._keys: List[Tuple[float, int]] = list()
+
+    def __iter__(self):
+        return iter(self._comments)
+
+    def __len__(self) -> int:
+        return len(self._comments)
+
+    def __contains__(self, comment: Comment) -> bool:
+        index = bisect_left(self._keys, (comment.timestamp,))
+        while index < len(self._keys) and self._keys[index][0] == comment.timestamp:
+            if self._comments[index] == comment:
+                return True
+            index += 1
+        return False
+
+    def add(self, comment: Comment):
+        key = (comment.timestamp, len(self._keys))
+        if not self._keys or key > self._keys[-1]:
+            self._comments.append(comment)
+            self._keys.append(key)
+        else:
+            index = bisect_right(self._keys, key)
+            self._comments.insert(index, comment)
+            self._keys.insert(index, key)
+
+    def before(self, cursor: Tuple[float, int] = None,
+               limit: int = 10) -> Tuple[List[Comment], Optional[Tuple[float, int]]]:
+        """ Returns up to limit comments older than cursor, newest first, and the cursor for the page after them.
+
+        A cursor of None starts from the newest comment; the returned cursor is None on the last page.
+        """
+        end = len(self._keys) if cursor is None else bisect_left(self._keys, tuple(cursor))
+        start = max(0, end - limit)
+        page = self._comments[start:end]
+        page.reverse()
+        return page, self._keys[start] if start > 0 else None
+
+
 # Genres Model
 class Genre:
+    __slots__ = ('_id', '_hash', '_genre_name', '_genre_movies')
+
     def __init__(
-            self, genre_name: str
+            self, genre_name: str, id: int = None
     ):
+        self._id: int = id
         self._genre_name: str = genre_name
-        self._genre_movies: List[Movie] = list()
+        # Equality is by name, so the hash is the name's, worked out once; the id only indexes the registry.
+        self._hash: int = hash(genre_name)
+        # Movies by id, in the order they were added, so membership and removal don't scan the genre's movies.
+        self._genre_movies: Dict[int, Movie] = dict()
+
+    @property
+    def id(self) -> int:
+        return self._id
 
     @property
     def genre_name(self) -> str:
@@ -79,31 +158,50 @@ class Genre:
 
     @property
     def genre_movies(self) -> Iterable['Movie']:
-        return iter(self._genre_movies)
+        return iter(self._genre_movies.values())
 
     @property
     def number_of_genre_movies(self) -> int:
         return len(self._genre_movies)
 
     def is_applied_to(self, movie: 'Movie') -> bool:
-        return movie in self._genre_movies
+        return movie.id in self._genre_movies
 
     def add_movie(self, movie: 'Movie'):
-        self._genre_movies.append(movie)
+        self._genre_movies[movie.id] = movie
+
+    def remove_movie(self, movie: 'Movie'):
+        self._genre_movies.pop(movie.id, None)
+
+    def __repr__(self):
+        return f'<Genre {self._genre_name}>'
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Genre):
             return False
         return other._genre_name == self._genre_name
 
+    def __hash__(self):
+        return self._hash
+
 
 # actor
 class Actor:
+    __slots__ = ('_id', '_hash', '_name', '_movies_starring_actor')
+
     def __init__(
-            self, name: str
+            self, name: str, id: int = None
     ):
+        self._id: int = id
         self._name: str = name
-        self._movies_starring_actor: List[Movie] = list()
+        self._hash: int = hash(name)
+        self._movies_starring_actor: Dict[int, Movie] = dict()
+
+    @property
+    def id(self) -> int:
+        return self._id
 
     @property
     def actor_name(self) -> str:
@@ -111,31 +209,50 @@ class Actor:
 
     @property
     def movies_starring_actor(self) -> Iterable['Movie']:
-        return iter(self._movies_starring_actor)
+        return iter(self._movies_starring_actor.values())
 
     @property
     def number_of_movies_starring_actor(self) -> int:
         return len(self._movies_starring_actor)
 
     def is_applied_to(self, movie: 'Movie') -> bool:
-        return movie in self._movies_starring_actor
+        return movie.id in self._movies_starring_actor
 
     def add_movie(self, movie: 'Movie'):
-        self._movies_starring_actor.append(movie)
+        self._movies_starring_actor[movie.id] = movie
+
+    def remove_movie(self, movie: 'Movie'):
+        self._movies_starring_actor.pop(movie.id, None)
+
+    def __repr__(self):
+        return f'<Actor {self._name}>'
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Actor):
             return False
         return other._name == self._name
 
+    def __hash__(self):
+        return self._hash
+
 
 # director
 class Director:
+    __slots__ = ('_id', '_hash', '_name', '_movies_directed_by_director')
+
     def __init__(
-            self, name: str
+            self, name: str, id: int = None
     ):
+        self._id: int = id
         self._name: str = name
-        self._movies_directed_by_director: List[Movie] = list()
+        self._hash: int = hash(name)
+        self._movies_directed_by_director: Dict[int, Movie] = dict()
+
+    @property
+    def id(self) -> int:
+        return self._id
 
     @property
     def director_name(self) -> str:
@@ -143,23 +260,34 @@ class Director:
 
     @property
     def movies_directed_by_director(self) -> Iterable['Movie']:
-        return iter(self._movies_directed_by_director)
+        return iter(self._movies_directed_by_director.values())
 
     @property
     def number_of_movies_directed_by_director(self) -> int:
         return len(self._movies_directed_by_director)
 
     def is_applied_to(self, movie: 'Movie') -> bool:
-        return movie in self._movies_directed_by_director
+        return movie.id in self._movies_directed_by_director
 
     def add_movie(self, movie: 'Movie'):
-        self._movies_directed_by_director.append(movie)
+        self._movies_directed_by_director[movie.id] = movie
+
+    def remove_movie(self, movie: 'Movie'):
+        self._movies_directed_by_director.pop(movie.id, None)
+
+    def __repr__(self):
+        return f'<Director {self._name}>'
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Director):
             return False
         return other._name == self._name
 
+    def __hash__(self):
+        return self._hash
+
 
 class Movie:
     def __init__(self, id: int, title: str, description: str, year: int,
@@ -175,9 +303,10 @@ class Movie:
         self._director: Director = None
         self._metascore: int = metascore
         self._actors: List[Actor] = list()
-        self._comments: List[Comment] = list()
         self._genres: List[Genre] = list()
 
+        self._comments: CommentTimeline = CommentTimeline()
+
     @property
     def id(self) -> int:
         return self._id
@@ -219,8 +348,9 @@ class Movie:
         return self._director
 
     @director.setter
-    def director(self, director_name: str):
-        self._director = Director(director_name)
+    def director(self, director):
+        # Prefer passing the repository's shared Director; a name makes a Director of this movie's own.
+        self._director = director if isinstance(director, Director) else Director(director)
 
     @property
     def actors(self) -> Iterable[Actor]:
@@ -249,9 +379,26 @@ class Movie:
     def add_genre(self, genre: Genre):
         self._genres.append(genre)
 
+    def remove_genre(self, genre: Genre):
+        self._genres.remove(genre)
+
     def add_actor(self, actor: Actor):
         self._actors.append(actor)
 
+    def remove_actor(self, actor: Actor):
+        self._actors.remove(actor)
+
+    def update_details(self, movie: 'Movie'):
+        """ Copies the title, description and figures of movie, a newer version of this one. """
+        self._title = movie._title
+        self._description = movie._description
+        self._year = movie._year
+        self._runtime = movie._runtime
+        self._rating = movie._rating
+        self._votes = movie._votes
+        self._revenue = movie._revenue
+        self._metascore = movie._metascore
+
     def belongs_to_director(self, director: Director):
         self._director = director
 
@@ -259,7 +406,14 @@ class Movie:
         return genre in self._genres
 
     def add_comment(self, comment: Comment):
-        self._comments.append(comment)
+        self._comments.add(comment)
+
+    def has_comment(self, comment: Comment) -> bool:
+        return comment in self._comments
+
+    def comments_before(self, cursor: Tuple[float, int] = None,
+                        limit: int = 10) -> Tuple[List[Comment], Optional[Tuple[float, int]]]:
+        return self._comments.before(cursor, limit)
 
     def __repr__(self):
         return f'<Movie {self._year} {self._title}>'
@@ -286,7 +440,9 @@ class ModelException(Exception):
     pass
 
 
-def make_comment(comment_text: str, user: User, movie: Movie, timestamp: datetime = datetime.today()):
+def make_comment(comment_text: str, user: User, movie: Movie, timestamp: datetime = None):
+    if timestamp is None:
+        timestamp = datetime.today()
     comment = Comment(user, movie, comment_text, timestamp)
     user.add_comment(comment)
     movie.add_comment(comment)
@@ -310,6 +466,22 @@ def make_actor_association(movie: Movie, actor: Actor):
     actor.add_movie(movie)
 
 
+def remove_genre_association(movie: Movie, genre: Genre):
+    movie.remove_genre(genre)
+    genre.remove_movie(movie)
+
+
+def remove_actor_association(movie: Movie, actor: Actor):
+    movie.remove_actor(actor)
+    actor.remove_movie(movie)
+
+
+def remove_director_association(movie: Movie):
+    if movie.director is not None:
+        movie.director.remove_movie(movie)
+        movie.belongs_to_director(None)
+
+
 def make_director_association(movie: Movie, director: Director):
     if director.is_applied_to(movie):
         raise ModelException(f'Director {director.director_name} already applied to Movie "{movie.title}"')
@@ -0,0 +1,255 @@
+import re
+from typing import List
+
+# Fields a term can name. A term without a field is free text, matching a genre of that name or else the words of a
+# movie's title and description.
+FIELDS = ('genre', 'actor', 'director', 'year', 'decade', 'rating', 'runtime', 'votes', 'text')
+NUMERIC_FIELDS = ('year', 'decade', 'rating', 'runtime', 'votes')
+# Numeric fields that also take ranges: year:2010..2015, rating:>=8, runtime:<90.
+RANGE_FIELDS = ('year', 'rating', 'runtime', 'votes')
+DEFAULT_FIELD = 'text'
+
+KEYWORDS = ('AND', 'OR', 'NOT')
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_NUMBER = r'(-?\d+(?:\.\d+)?)'
+_RANGE = re.compile(rf'^(?:(>=|<=|>|<)\s*{_NUMBER}|{_NUMBER}?\.\.{_NUMBER}?)$')
+
+
+class QuerySyntaxException(Exception):
+    pass
+
+
+class Term:
+    def __init__(self, field: str, value: str):
+        self.field = field
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Term) and (other.field, other.value) == (self.field, self.value)
+
+    def __repr__(self):
+        return f'{self.field}:"{self.value}"'
+
+
+class Range:
+    """ The movies whose field lies between low and high; a missing bound leaves that end open. """
+
+    def __init__(self, field: str, low: float = None, high: float = None, include_low: bool = True,
+                 include_high: bool = True):
+        self.field = field
+        self.low = low
+        self.high = high
+        self.include_low = include_low
+        self.include_high = include_high
+
+    def contains(self, value) -> bool:
+        if value is None:
+            return False
+        if self.low is not None and (value < self.low or (value == self.low and not self.include_low)):
+            return False
+        if self.high is not None and (value > self.high or (value == self.high and not self.include_high)):
+            return False
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, Range) and (other.field, other.low, other.high, other.include_low,
+                                             other.include_high) == (self.field, self.low, self.high,
+                                                                     self.include_low, self.include_high)
+
+    def __repr__(self):
+        if self.low is not None and self.high is not None and self.include_low and self.include_high:
+            return f'{self.field}:{_format(self.low)}..{_format(self.high)}'
+        bounds = list()
+        if self.low is not None:
+            bounds.append(f'{self.field}:{">=" if self.include_low else ">"}{_format(self.low)}')
+        if self.high is not None:
+            bounds.append(f'{self.field}:{"<=" if self.include_high else "<"}{_format(self.high)}')
+        return ' AND '.join(bounds)
+
+
+def _format(number: float) -> str:
+    return str(int(number)) if number == int(number) else str(number)
+
+
+def parse_range(field: str, text: str):
+    """ Returns the Range that text such as '2010..2015', '>=8' or '..90' describes, or None if it is not a range. """
+    match = _RANGE.match(text.strip())
+    if match is None:
+        return None
+    operator, bound, low, high = match.groups()
+    if operator is not None:
+        bound = float(bound)
+        if operator.startswith('>'):
+            return Range(field, low=bound, include_low=operator == '>=')
+        return Range(field, high=bound, include_high=operator == '<=')
+    if low is None and high is None:
+        raise QuerySyntaxException(f'A range for {field} needs at least one bound')
+    low = float(low) if low is not None else None
+    high = float(high) if high is not None else None
+    if low is not None and high is not None and low > high:
+        raise QuerySyntaxException(f'Empty range for {field}: {text}')
+    return Range(field, low, high)
+
+
+class And:
+    def __init__(self, operands: List):
+        self.operands = operands
+
+    def __eq__(self, other):
+        return isinstance(other, And) and other.operands == self.operands
+
+    def __repr__(self):
+        return '(' + ' AND '.join(repr(operand) for operand in self.operands) + ')'
+
+
+class Or:
+    def __init__(self, operands: List):
+        self.operands = operands
+
+    def __eq__(self, other):
+        return isinstance(other, Or) and other.operands == self.operands
+
+    def __repr__(self):
+        return '(' + ' OR '.join(repr(operand) for operand in self.operands) + ')'
+
+
+class Not:
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __eq__(self, other):
+        return isinstance(other, Not) and other.operand == self.operand
+
+    def __repr__(self):
+        return f'NOT {self.operand!r}'
+
+
+def tokenize(text: str) -> List[tuple]:
+    """ Splits text into ('(' | ')' | 'keyword' | 'quoted' | 'word', text) tokens. """
+    tokens = list()
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise QuerySyntaxException(f'Unbalanced quote at position {position}')
+        position = match.end()
+        opening, closing, quoted, word = match.groups()
+        if opening:
+            tokens.append(('(', opening))
+        elif closing:
+            tokens.append((')', closing))
+        elif quoted is not None:
+            tokens.append(('quoted', quoted))
+        elif word in KEYWORDS:
+            tokens.append(('keyword', word))
+        else:
+            tokens.append(('word', word))
+    return tokens
+
+
+class _Parser:
+    """ Recursive descent parser for:
+
+        expression := and_expression ('OR' and_expression)*
+        and_expression := not_expression (['AND'] not_expression)*
+        not_expression := 'NOT' not_expression | '(' expression ')' | term
+        term := [field ':'] (quoted | word+ | range)
+
+    Terms side by side are ANDed. The words of an unquoted value run up to the next keyword, parenthesis or field, so
+    actor:Chris Pratt needs no quotes; a numeric value is a single word.
+    """
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._position = 0
+
+    def parse(self):
+        if not self._tokens:
+            raise QuerySyntaxException('Empty query')
+        expression = self._expression()
+        if self._position != len(self._tokens):
+            raise QuerySyntaxException(f'Unexpected {self._tokens[self._position][1]!r}')
+        return expression
+
+    def _peek(self):
+        return self._tokens[self._position] if self._position < len(self._tokens) else (None, None)
+
+    def _take(self):
+        token = self._peek()
+        self._position += 1
+        return token
+
+    def _expression(self):
+        operands = [self._and_expression()]
+        while self._peek() == ('keyword', 'OR'):
+            self._take()
+            operands.append(self._and_expression())
+        return operands[0] if len(operands) == 1 else Or(operands)
+
+    def _and_expression(self):
+        operands = [self._not_expression()]
+        while self._peek() == ('keyword', 'AND') or self._starts_operand():
+            if self._peek() == ('keyword', 'AND'):
+                self._take()
+            operands.append(self._not_expression())
+        return operands[0] if len(operands) == 1 else And(operands)
+
+    def _starts_operand(self) -> bool:
+        kind, text = self._peek()
+        return kind in ('word', 'quoted', '(') or (kind, text) == ('keyword', 'NOT')
+
+    def _names_field(self) -> bool:
+        kind, text = self._peek()
+        return kind == 'word' and ':' in text and text.split(':', 1)[0].lower() in FIELDS
+
+    def _not_expression(self):
+        kind, text = self._peek()
+        if (kind, text) == ('keyword', 'NOT'):
+            self._take()
+            return Not(self._not_expression())
+        if kind == '(':
+            self._take()
+            expression = self._expression()
+            if self._take()[0] != ')':
+                raise QuerySyntaxException('Missing )')
+            return expression
+        if kind in ('word', 'quoted'):
+            return self._term()
+        raise QuerySyntaxException(f'Expected a term, found {text!r}' if text else 'Query ends too early')
+
+    def _term(self):
+        kind, text = self._take()
+        field = DEFAULT_FIELD
+        words = list()
+        if kind == 'word' and ':' in text:
+            prefix, rest = text.split(':', 1)
+            if prefix.lower() in FIELDS:
+                field = prefix.lower()
+                text = rest
+        if kind == 'quoted':
+            words.append(text)
+        elif text:
+            words.append(text)
+
+        # An unquoted value, or a field followed by a quoted value, takes the words that follow it.
+        while kind == 'word' and self._peek()[0] in ('word', 'quoted') and not self._names_field() and \
+                (field not in NUMERIC_FIELDS or not words):
+            words.append(self._take()[1])
+        if not words:
+            raise QuerySyntaxException(f'Missing value for {field}')
+        value = ' '.join(words)
+        if field in NUMERIC_FIELDS:
+            value_range = parse_range(field, value)
+            if value_range is not None:
+                if field not in RANGE_FIELDS:
+                    raise QuerySyntaxException(f'{field} does not take ranges, try year')
+                return value_range
+        return Term(field, value)
+
+
+def parse(text: str):
+    """ Parses a boolean query such as '(Action OR Sci-Fi) AND NOT Horror AND actor:Chris Pratt rating:>=7' into an
+    expression tree of Term, Range, And, Or and Not nodes. """
+    return _Parser(tokenize(text)).parse()
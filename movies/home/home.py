@@ -1,8 +1,8 @@
-from flask import Blueprint, render_template, request, url_for, session
+from flask import Blueprint, current_app, jsonify, request, url_for, session
 import movies.adapters.repository as repo
 import movies.utilities.utilities as utilities
 import movies.utilities.services as services
-from movies.movies.services import get_movies_by_id, get_all_movie_ids
+from movies.movies.services import get_all_movie_ids
 
 home_blueprint = Blueprint(
     'home_bp', __name__)
@@ -12,17 +12,14 @@ home_blueprint = Blueprint(
 def home():
     username = session.get('username')
 
-    movies_per_page = 4
+    movies_per_page = utilities.get_movies_per_page()
     cursor = request.args.get("cursor", 0, type=int)
 
-    filter_form = utilities.FilterForm()
-    sign_up_form = utilities.RegistrationForm()
-    login_form = utilities.LoginForm()
-
     selected_movies = utilities.get_selected_movies()
+    top_rated_movies = utilities.get_top_rated_movies()
 
     movie_ids = get_all_movie_ids(repo.repo_instance)
-    movies = get_movies_by_id(movie_ids[cursor: cursor + movies_per_page], repo.repo_instance)
+    movies = utilities.get_listing_movies(movie_ids[cursor: cursor + movies_per_page])
     genres = services.get_genre_names(repo.repo_instance)
 
     first_movie_url = None
@@ -40,17 +37,30 @@ def home():
             last_cursor -= movies_per_page
         last_movie_url = url_for("home_bp.home", cursor=last_cursor)
 
-    return render_template(
+    return utilities.render_listing(
         'home.html',
         movies=movies,
         genres=genres,
         selected_movies=selected_movies,
+        top_rated_movies=top_rated_movies,
         first_movie_url=first_movie_url,
         last_movie_url=last_movie_url,
         next_movie_url=next_movie_url,
         prev_movie_url=prev_movie_url,
-        filter_form=filter_form,
-        sign_up_form=sign_up_form,
-        login_form=login_form,
+        filter_form=utilities.filter_form,
+        sign_up_form=utilities.sign_up_form,
+        login_form=utilities.login_form,
         username=username,
     )
+
+
+@home_blueprint.route('/health', methods=['GET'])
+def health():
+    """ 200 once the application can serve the catalog, 503 while a fast start is still loading it or if it
+    couldn't. """
+    warmup = current_app.extensions['warmup']
+    if not warmup.ready:
+        return jsonify({'status': 'starting'}), 503
+    if warmup.failed:
+        return jsonify({'status': 'failed', 'failures': warmup.failures}), 503
+    return jsonify({'status': 'ok', 'generation': repo.repo_instance.generation})
@@ -0,0 +1,102 @@
+from flask import Blueprint, Response, current_app, request
+from jinja2 import Template
+
+import movies.metrics.services as services
+
+metrics_blueprint = Blueprint(
+    'metrics_bp', __name__)
+
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def metrics():
+    registry = current_app.extensions['metrics']
+    return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+class TimedTemplate(Template):
+    """ Jinja template whose rendering time is attributed to the render phase of the current request. """
+
+    def render(self, *args, **kwargs):
+        with services.phase(services.RENDER_PHASE):
+            return super().render(*args, **kwargs)
+
+    def generate(self, *args, **kwargs):
+        # Only the time spent producing each chunk counts, not the time spent waiting for the client.
+        iterator = super().generate(*args, **kwargs)
+        while True:
+            with services.phase(services.RENDER_PHASE):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+def _start_timer():
+    services.start_request_timer()
+
+
+def _record_status(response):
+    timer = services.current_request_timer()
+    if timer is not None:
+        timer.status = response.status_code
+    return response
+
+
+def _record_request(exception=None):
+    timer = services.stop_request_timer()
+    if timer is None:
+        return
+
+    status = timer.status if timer.status is not None else 500
+    elapsed, phases = timer.finish()
+    current_app.extensions['metrics'].record(
+        endpoint=request.endpoint or 'unmatched',
+        method=request.method,
+        status=status,
+        elapsed=elapsed,
+        phases=phases,
+        error=exception is not None or status >= 500
+    )
+
+
+def init_app(app):
+    app.extensions['metrics'] = services.MetricsRegistry()
+    app.jinja_env.template_class = TimedTemplate
+
+    app.before_request(_start_timer)
+    app.after_request(_record_status)
+    app.teardown_request(_record_request)
+
+    app.register_blueprint(metrics_blueprint)
+
+
+def _start_repository_profile():
+    services.start_repository_profile(current_app.config.get('REPOSITORY_PROFILING_SLOWEST', 5))
+
+
+def _report_repository_profile(response):
+    profile = services.current_repository_profile()
+    if profile is None:
+        return response
+
+    output = current_app.config.get('REPOSITORY_PROFILING_OUTPUT', 'log')
+    if output in ('header', 'both'):
+        # The headers go out before a streamed body is produced, so they only count the calls made until now.
+        response.headers['X-Repository-Calls'] = profile.summary()
+
+    # A streamed body keeps calling the repository after this, so the profile is only finished once it is closed.
+    logger = current_app.logger if output in ('log', 'both') else None
+    method, path = request.method, request.path
+
+    def finish_profile():
+        services.stop_repository_profile()
+        if logger is not None:
+            logger.info('Repository calls for %s %s: %s', method, path, profile.summary())
+
+    response.call_on_close(finish_profile)
+    return response
+
+
+def init_repository_profiling(app):
+    app.before_request(_start_repository_profile)
+    app.after_request(_report_repository_profile)
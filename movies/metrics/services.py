@@ -0,0 +1,298 @@
+import heapq
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Tuple
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REPOSITORY_PHASE = 'repository'
+SERIALIZATION_PHASE = 'serialization'
+RENDER_PHASE = 'render'
+OTHER_PHASE = 'other'
+
+_current_timer: ContextVar = ContextVar('request_timer', default=None)
+_current_profile: ContextVar = ContextVar('repository_profile', default=None)
+
+
+class RequestTimer:
+    """ Splits the wall time of one request into phases.
+
+    Phases nest: time spent in an inner phase is not counted towards the phase enclosing it. Time outside any phase
+    is reported as OTHER_PHASE.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.status = None
+        self.phases: Dict[str, float] = dict()
+        self._stack = list()
+
+    def enter(self, phase: str):
+        stack = self._stack
+        if stack and stack[-1][0] == phase:
+            # Re-entering the phase we are already in (e.g. movies_to_dict calling movie_to_dict) costs nothing.
+            stack[-1][2] += 1
+            return
+        now = perf_counter()
+        if stack:
+            outer = stack[-1]
+            self.phases[outer[0]] = self.phases.get(outer[0], 0.0) + now - outer[1]
+        stack.append([phase, now, 1])
+
+    def exit(self):
+        stack = self._stack
+        top = stack[-1]
+        top[2] -= 1
+        if top[2]:
+            return
+        now = perf_counter()
+        stack.pop()
+        self.phases[top[0]] = self.phases.get(top[0], 0.0) + now - top[1]
+        if stack:
+            stack[-1][1] = now
+
+    def finish(self) -> Tuple[float, Dict[str, float]]:
+        elapsed = perf_counter() - self.started
+        phases = dict(self.phases)
+        phases[OTHER_PHASE] = max(0.0, elapsed - sum(phases.values()))
+        return elapsed, phases
+
+
+def start_request_timer() -> RequestTimer:
+    timer = RequestTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def stop_request_timer() -> RequestTimer:
+    timer = _current_timer.get()
+    _current_timer.set(None)
+    return timer
+
+
+def current_request_timer() -> RequestTimer:
+    return _current_timer.get()
+
+
+@contextmanager
+def phase(name: str):
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+def timed_phase(name: str):
+    """ Decorator attributing the time spent in the decorated function to phase name. """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = _current_timer.get()
+            if timer is None:
+                return func(*args, **kwargs)
+            timer.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.exit()
+
+        return wrapper
+
+    return decorator
+
+
+class RepositoryPhaseObserver:
+    """ Attributes the time spent in repository calls to REPOSITORY_PHASE. """
+
+    def call_started(self, method_name: str):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.enter(REPOSITORY_PHASE)
+
+    def call_finished(self, method_name: str, elapsed: float):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.exit()
+
+
+class RepositoryCallProfile:
+    """ Per-method call counts, cumulative time and the slowest calls made to the repository during one request. """
+
+    def __init__(self, slowest_kept: int = 5):
+        self.methods: Dict[str, list] = dict()
+        self.slowest = list()
+        self._slowest_kept = slowest_kept
+        self._sequence = 0
+
+    def add(self, method_name: str, elapsed: float):
+        stats = self.methods.get(method_name)
+        if stats is None:
+            stats = self.methods[method_name] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+
+        # Min-heap holding the slowest calls seen so far.
+        self._sequence += 1
+        entry = (elapsed, self._sequence, method_name)
+        if len(self.slowest) < self._slowest_kept:
+            heapq.heappush(self.slowest, entry)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def number_of_calls(self) -> int:
+        return sum(count for count, _ in self.methods.values())
+
+    @property
+    def total_time(self) -> float:
+        return sum(seconds for _, seconds in self.methods.values())
+
+    def slowest_calls(self):
+        return [(method_name, elapsed) for elapsed, _, method_name in sorted(self.slowest, reverse=True)]
+
+    def summary(self) -> str:
+        """ One-line breakdown, e.g. '5 calls 0.120ms; get_genres=2x0.020ms; ... | slowest get_genres=0.015ms'. """
+        by_time = sorted(self.methods.items(), key=lambda item: item[1][1], reverse=True)
+        methods = '; '.join(f'{name}={count}x{seconds * 1000:.3f}ms' for name, (count, seconds) in by_time)
+        slowest = ', '.join(f'{name}={elapsed * 1000:.3f}ms' for name, elapsed in self.slowest_calls())
+        return f'{self.number_of_calls} calls {self.total_time * 1000:.3f}ms; {methods} | slowest {slowest}'
+
+
+def start_repository_profile(slowest_kept: int = 5) -> RepositoryCallProfile:
+    profile = RepositoryCallProfile(slowest_kept)
+    _current_profile.set(profile)
+    return profile
+
+
+def current_repository_profile() -> RepositoryCallProfile:
+    return _current_profile.get()
+
+
+def stop_repository_profile() -> RepositoryCallProfile:
+    profile = _current_profile.get()
+    _current_profile.set(None)
+    return profile
+
+
+class RepositoryProfiler:
+    """ Adds every repository call to the RepositoryCallProfile of the current request. """
+
+    def call_started(self, method_name: str):
+        pass
+
+    def call_finished(self, method_name: str, elapsed: float):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add(method_name, elapsed)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class MetricsRegistry:
+    """ Per-endpoint request counts, error counts, latency histograms and phase totals. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Histogram] = dict()
+        self._requests: Dict[Tuple[str, str, int], int] = dict()
+        self._errors: Dict[str, int] = dict()
+        self._phases: Dict[Tuple[str, str], float] = dict()
+
+    def record(self, endpoint: str, method: str, status: int, elapsed: float, phases: Dict[str, float],
+               error: bool = False):
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram()
+            histogram.observe(elapsed)
+
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+            for phase_name, seconds in phases.items():
+                key = (endpoint, phase_name)
+                self._phases[key] = self._phases.get(key, 0.0) + seconds
+
+    def request_count(self, endpoint: str) -> int:
+        with self._lock:
+            return sum(count for (name, _, _), count in self._requests.items() if name == endpoint)
+
+    def error_count(self, endpoint: str) -> int:
+        with self._lock:
+            return self._errors.get(endpoint, 0)
+
+    def render_prometheus(self) -> str:
+        """ Returns the metrics in the Prometheus text exposition format. """
+        with self._lock:
+            latency = {endpoint: (histogram.buckets, list(histogram.cumulative_counts()), histogram.sum,
+                                  histogram.count) for endpoint, histogram in self._latency.items()}
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            phases = dict(self._phases)
+
+        lines = list()
+
+        lines.append('# HELP movies_requests_total Requests handled, by endpoint, method and status.')
+        lines.append('# TYPE movies_requests_total counter')
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f'movies_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+
+        lines.append('# HELP movies_request_errors_total Requests that raised or returned a 5xx status.')
+        lines.append('# TYPE movies_request_errors_total counter')
+        for endpoint, count in sorted(errors.items()):
+            lines.append(f'movies_request_errors_total{{endpoint="{_escape(endpoint)}"}} {count}')
+
+        lines.append('# HELP movies_request_duration_seconds Request latency.')
+        lines.append('# TYPE movies_request_duration_seconds histogram')
+        for endpoint, (buckets, cumulative, total, count) in sorted(latency.items()):
+            label = _escape(endpoint)
+            for bound, bucket_count in zip(buckets, cumulative):
+                lines.append(f'movies_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} '
+                             f'{bucket_count}')
+            lines.append(f'movies_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {count}')
+            lines.append(f'movies_request_duration_seconds_sum{{endpoint="{label}"}} {total}')
+            lines.append(f'movies_request_duration_seconds_count{{endpoint="{label}"}} {count}')
+
+        lines.append('# HELP movies_request_phase_seconds_total Time spent per request phase.')
+        lines.append('# TYPE movies_request_phase_seconds_total counter')
+        for (endpoint, phase_name), seconds in sorted(phases.items()):
+            lines.append(f'movies_request_phase_seconds_total{{endpoint="{_escape(endpoint)}",'
+                         f'phase="{phase_name}"}} {seconds}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
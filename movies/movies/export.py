@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, List, Sequence
+
+from movies.adapters.repository import AbstractRepository
+from movies.domain.model import Movie
+
+CSV = 'csv'
+JSON_LINES = 'jsonl'
+EXPORT_FORMATS = (CSV, JSON_LINES)
+
+MIMETYPES = {CSV: 'text/csv', JSON_LINES: 'application/x-ndjson'}
+
+# The columns of movies.csv, so an export can be loaded back like the catalog itself.
+CSV_HEADER = ['Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)', 'Rating',
+              'Votes', 'Revenue (Millions)', 'Metascore']
+
+# Movies fetched from the repository, and written out as one chunk, at a time.
+DEFAULT_BATCH_SIZE = 100
+
+
+class UnknownExportFormatException(Exception):
+    pass
+
+
+def _missing(value):
+    return 'N/A' if value is None else value
+
+
+def movie_to_row(movie: Movie) -> List:
+    return [
+        movie.id,
+        movie.title,
+        ','.join(genre.genre_name for genre in movie.genres),
+        movie.description,
+        movie.director.director_name if movie.director is not None else '',
+        ', '.join(actor.actor_name for actor in movie.actors),
+        movie.year,
+        movie.runtime,
+        movie.rating,
+        movie.votes,
+        _missing(movie.revenue),
+        _missing(movie.metascore),
+    ]
+
+
+def movie_to_json(movie: Movie) -> str:
+    return json.dumps({
+        'id': movie.id,
+        'title': movie.title,
+        'genres': [genre.genre_name for genre in movie.genres],
+        'description': movie.description,
+        'director': movie.director.director_name if movie.director is not None else None,
+        'actors': [actor.actor_name for actor in movie.actors],
+        'year': movie.year,
+        'runtime': movie.runtime,
+        'rating': movie.rating,
+        'votes': movie.votes,
+        'revenue': movie.revenue,
+        'metascore': movie.metascore,
+    })
+
+
+def _batches(movie_ids: Sequence[int], repo: AbstractRepository, batch_size: int) -> Iterator[List[Movie]]:
+    for start in range(0, len(movie_ids), batch_size):
+        yield repo.get_movies_by_id(movie_ids[start:start + batch_size])
+
+
+def export_movies(movie_ids: Sequence[int], repo: AbstractRepository, export_format: str = CSV,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """ Yields the movies with movie_ids as CSV or JSON Lines text, one chunk per batch of movies.
+
+    Only one batch of movies is held at a time, so the memory an export takes doesn't grow with its size.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise UnknownExportFormatException(export_format)
+
+    if export_format == JSON_LINES:
+        for movies in _batches(movie_ids, repo, batch_size):
+            if movies:
+                yield ''.join(movie_to_json(movie) + '\n' for movie in movies)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for movies in _batches(movie_ids, repo, batch_size):
+        writer.writerows(movie_to_row(movie) for movie in movies)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """ Compresses text chunks into a gzip stream as they come. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
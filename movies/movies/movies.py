@@ -1,65 +1,89 @@
-from flask import Blueprint, jsonify
-from flask import request, render_template, redirect, url_for, session
+from flask import Blueprint, Response, jsonify
+from flask import request, render_template, redirect, url_for, session, current_app, abort, stream_with_context
 
 import movies.adapters.repository as repo
 import movies.utilities.utilities as utilities
 import movies.movies.services as services
+import movies.movies.export as export
 from movies.authentication.authentication import login_required
 
+from movies.utilities import profanity
+from movies.utilities.offload import run_cpu_bound
 from movies.utilities.services import get_genre_names
 
 movies_blueprint = Blueprint(
     'movies_bp', __name__)
 
+MAX_COMMENTS_PER_REQUEST = 100
+MAX_LEADERBOARD_SIZE = 100
+
 
 @movies_blueprint.route('/details/<int:id>/', methods=['GET'])
 def get_movie_by_id(id):
     username = session.get('username')
 
-    filter_form = utilities.FilterForm()
-    sign_up_form = utilities.RegistrationForm()
-    login_form = utilities.LoginForm()
-    comment_form = utilities.CommentForm()
-
-    movie = services.get_movie(id, repo.repo_instance)
+    comments_cursor = request.args.get('comments_cursor')
+    comments_per_page = current_app.config.get('COMMENTS_PER_PAGE', services.COMMENTS_PER_PAGE)
+    try:
+        movie = services.get_movie(id, repo.repo_instance, comments_cursor, comments_per_page)
+    except services.InvalidCursorException:
+        abort(400)
     genres = get_genre_names(repo.repo_instance)
     selected_movies = utilities.get_selected_movies()
+    top_rated_movies = utilities.get_top_rated_movies()
+    similar_movies = services.get_similar_movies(id, current_app.extensions.get('similar_movies'), repo.repo_instance)
     return render_template(
         "details.html",
         movie=movie,
+        similar_movies=similar_movies,
         genres=genres,
         selected_movies=selected_movies,
-        filter_form=filter_form,
-        sign_up_form=sign_up_form,
-        login_form=login_form,
-        comment_form=comment_form,
+        top_rated_movies=top_rated_movies,
+        filter_form=utilities.filter_form,
+        sign_up_form=utilities.sign_up_form,
+        login_form=utilities.login_form,
         username=username,
+        comments_cursor=comments_cursor,
     )
 
 
+@movies_blueprint.route('/details/<int:id>/comments', methods=['GET'])
+def get_comments(id):
+    comments_per_page = current_app.config.get('COMMENTS_PER_PAGE', services.COMMENTS_PER_PAGE)
+    limit = min(max(request.args.get('limit', comments_per_page, type=int), 1), MAX_COMMENTS_PER_REQUEST)
+    try:
+        page = services.get_comments_page(id, repo.repo_instance, request.args.get('cursor'), limit)
+    except services.NonExistentMovieException:
+        return jsonify({'error': 'Unknown movie'}), 404
+    except services.InvalidCursorException:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify(page)
+
+
 @movies_blueprint.route('/filter_movies', methods=['GET', 'POST'])
 def filter_movies():
     username = session.get('username')
 
-    filter_form = utilities.FilterForm()
-    sign_up_form = utilities.RegistrationForm()
-    login_form = utilities.LoginForm()
-
-    if filter_form.validate_on_submit():
-        return redirect(url_for("movies_bp.filter_movies", genre=filter_form.genre.data, actor=filter_form.actor.data,
-                                director=filter_form.director.data))
+    if request.method == 'POST':
+        # Only a submitted filter form is worth constructing and validating.
+        form = utilities.FilterForm()
+        if form.validate_on_submit():
+            return redirect(url_for("movies_bp.filter_movies", genre=form.genre.data, actor=form.actor.data,
+                                    director=form.director.data))
 
-    movies_per_page = 4
+    movies_per_page = utilities.get_movies_per_page()
     cursor = request.args.get("cursor", 0, type=int)
 
     selected_movies = utilities.get_selected_movies()
+    top_rated_movies = utilities.get_top_rated_movies()
 
     genre_name = request.args.get("genre", '')
     actor_name = request.args.get("actor", '')
     director_name = request.args.get("director", '')
 
     movie_ids = services.filter_movies(actor_name, director_name, genre_name, repo.repo_instance)
-    movies = services.get_movies_by_id(movie_ids[cursor: cursor + movies_per_page], repo.repo_instance)
+    movies = utilities.get_listing_movies(movie_ids[cursor: cursor + movies_per_page])
+    facets = services.get_facet_counts(movie_ids, repo.repo_instance)
     genres = get_genre_names(repo.repo_instance)
 
     first_movie_url = None
@@ -80,22 +104,127 @@ def filter_movies():
         last_movie_url = url_for("movies_bp.filter_movies", cursor=last_cursor, genre=genre_name.lower(),
                                  actor=actor_name.lower(), director=director_name.lower())
 
-    return render_template(
+    return utilities.render_listing(
+        'home.html',
+        movies=movies,
+        facets=facets,
+        filter_args={'genre': genre_name.lower(), 'actor': actor_name.lower(), 'director': director_name.lower()},
+        genres=genres,
+        selected_movies=selected_movies,
+        top_rated_movies=top_rated_movies,
+        first_movie_url=first_movie_url,
+        last_movie_url=last_movie_url,
+        next_movie_url=next_movie_url,
+        prev_movie_url=prev_movie_url,
+        filter_form=utilities.filter_form,
+        sign_up_form=utilities.sign_up_form,
+        login_form=utilities.login_form,
+        username=username,
+    )
+
+
+@movies_blueprint.route('/search', methods=['GET'])
+def search():
+    username = session.get('username')
+
+    movies_per_page = utilities.get_movies_per_page()
+    cursor = request.args.get("cursor", 0, type=int)
+    query_text = request.args.get("q", '').strip()
+    explain = request.args.get("explain", '') not in ('', '0')
+
+    selected_movies = utilities.get_selected_movies()
+    top_rated_movies = utilities.get_top_rated_movies()
+    genres = get_genre_names(repo.repo_instance)
+
+    movie_ids = []
+    explanation = None
+    search_error = None
+    if query_text:
+        try:
+            if explain:
+                # One run of the query gives both the matches and how they were found.
+                movie_ids, explanation = services.explain_query(query_text, repo.repo_instance)
+            else:
+                movie_ids = services.query_movies(query_text, repo.repo_instance)
+        except services.InvalidQueryException as exception:
+            search_error = str(exception)
+    movies = utilities.get_listing_movies(movie_ids[cursor: cursor + movies_per_page])
+
+    first_movie_url = None
+    last_movie_url = None
+    next_movie_url = None
+    prev_movie_url = None
+
+    search_args = {'q': query_text, 'explain': 1} if explain else {'q': query_text}
+    if cursor > 0:
+        prev_movie_url = url_for("movies_bp.search", cursor=cursor - movies_per_page, **search_args)
+        first_movie_url = url_for("movies_bp.search", **search_args)
+    if cursor + movies_per_page < len(movie_ids):
+        next_movie_url = url_for("movies_bp.search", cursor=cursor + movies_per_page, **search_args)
+        last_cursor = movies_per_page * int(len(movie_ids) / movies_per_page)
+        if len(movie_ids) % movies_per_page == 0:
+            last_cursor -= movies_per_page
+        last_movie_url = url_for("movies_bp.search", cursor=last_cursor, **search_args)
+
+    return utilities.render_listing(
         'home.html',
         movies=movies,
+        search_query=query_text,
+        search_error=search_error,
+        explanation=explanation,
         genres=genres,
         selected_movies=selected_movies,
+        top_rated_movies=top_rated_movies,
         first_movie_url=first_movie_url,
         last_movie_url=last_movie_url,
         next_movie_url=next_movie_url,
         prev_movie_url=prev_movie_url,
-        filter_form=filter_form,
-        sign_up_form=sign_up_form,
-        login_form=login_form,
+        filter_form=utilities.filter_form,
+        sign_up_form=utilities.sign_up_form,
+        login_form=utilities.login_form,
         username=username,
     )
 
 
+@movies_blueprint.route('/export', methods=['GET'])
+def export_movies():
+    export_format = request.args.get('format', export.CSV)
+    if export_format not in export.EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown format'}), 400
+    try:
+        movie_ids = services.select_movie_ids(request.args.get('genre', ''), request.args.get('actor', ''),
+                                              request.args.get('director', ''), request.args.get('q', '').strip(),
+                                              repo.repo_instance)
+    except services.InvalidQueryException as exception:
+        return jsonify({'error': str(exception)}), 400
+
+    # No Content-Length, so the export goes out with chunked transfer encoding as it's produced.
+    chunks = export.export_movies(movie_ids, repo.repo_instance, export_format)
+    filename = f'movies.{export_format}'
+    mimetype = export.MIMETYPES[export_format]
+    if request.args.get('gzip', '') not in ('', '0'):
+        chunks = export.gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    # Keep the request context, and with it the pinned repository generation, until the export has been sent, so
+    # a catalog reload halfway through doesn't mix rows from two generations.
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+@movies_blueprint.route('/leaderboards/<board>', methods=['GET'])
+def leaderboard(board):
+    k = min(max(request.args.get('k', 10, type=int), 1), MAX_LEADERBOARD_SIZE)
+    genre_name = request.args.get('genre') or None
+    year = request.args.get('year', type=int)
+    try:
+        movies = services.get_leaderboard(board, k, repo.repo_instance, genre_name, year)
+    except services.UnknownLeaderboardException:
+        return jsonify({'error': 'Unknown leaderboard'}), 404
+    return jsonify({'board': board, 'genre': genre_name, 'year': year, 'movies': movies})
+
+
 @movies_blueprint.route('/comment', methods=['POST'])
 @login_required
 def comment():
@@ -107,7 +236,19 @@ def comment():
         return jsonify({
             'success': False,
         }), 200
-    services.add_comment(movie_id, comment, username, repo.repo_instance)
+    # The same check the comment form makes, which comments posted here would otherwise skip.
+    if run_cpu_bound(profanity.contains_profanity, comment):
+        return jsonify({
+            'success': False,
+            'error': 'Your comment must not contain profanity',
+        }), 200
+    comment_dict = services.add_comment(movie_id, comment, username, repo.repo_instance)
+
+    # Share the comment with the other worker processes, if configured.
+    comment_log = current_app.extensions.get('comment_log')
+    if comment_log is not None:
+        comment_log.append_comment(comment_dict)
+
     return jsonify({
         "success": True,
     }), 201
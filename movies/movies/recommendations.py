@@ -0,0 +1,167 @@
+import heapq
+import logging
+import math
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from movies.adapters.repository import AbstractRepository
+from movies.domain.model import Movie
+
+logger = logging.getLogger(__name__)
+
+# How much sharing a genre, an actor or the director counts towards two movies being similar, before the rarer a
+# feature is, the more it counts.
+FEATURE_WEIGHTS = {'genre': 1.0, 'actor': 2.0, 'director': 3.0}
+
+DEFAULT_NEIGHBOURS = 5
+
+# Features shared by more movies than this (typically the big genres) don't nominate candidates, they only add to the
+# score of candidates found through rarer features. This keeps each movie's work proportional to its close neighbours
+# rather than to the size of the catalog.
+DEFAULT_MAX_POSTINGS = 1000
+
+
+def movie_features(movie: Movie) -> List[str]:
+    features = [f'genre:{genre.genre_name}' for genre in movie.genres]
+    features.extend(f'actor:{actor.actor_name}' for actor in movie.actors)
+    if movie.director is not None:
+        features.append(f'director:{movie.director.director_name}')
+    return features
+
+
+def build_vectors(movies, weights: dict = None) -> Dict[int, Dict[str, float]]:
+    """ Returns a unit length sparse vector per movie id, weighting each feature by its kind and its rarity (idf). """
+    weights = weights or FEATURE_WEIGHTS
+    features = {movie.id: set(movie_features(movie)) for movie in movies}
+
+    document_frequency = defaultdict(int)
+    for feature_set in features.values():
+        for feature in feature_set:
+            document_frequency[feature] += 1
+
+    number_of_movies = len(features)
+    vectors = dict()
+    for movie_id, feature_set in features.items():
+        vector = {
+            feature: weights[feature.split(':', 1)[0]] * math.log(1 + number_of_movies / document_frequency[feature])
+            for feature in feature_set
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors[movie_id] = {feature: weight / norm for feature, weight in vector.items()}
+    return vectors
+
+
+def build_postings(vectors: Dict[int, Dict[str, float]]) -> Dict[str, List[int]]:
+    postings = defaultdict(list)
+    for movie_id, vector in vectors.items():
+        for feature in vector:
+            postings[feature].append(movie_id)
+    return postings
+
+
+def top_neighbours(movie_id: int, vectors, postings, k: int = DEFAULT_NEIGHBOURS,
+                   max_postings: int = DEFAULT_MAX_POSTINGS) -> List[int]:
+    """ Returns the ids of the k movies with the highest cosine similarity to movie_id, most similar first. """
+    vector = vectors[movie_id]
+    scores = defaultdict(float)
+    common = list()
+    for feature, weight in vector.items():
+        posting = postings[feature]
+        if len(posting) > max_postings:
+            common.append((feature, weight))
+            continue
+        for other_id in posting:
+            if other_id != movie_id:
+                scores[other_id] += weight * vectors[other_id][feature]
+
+    for other_id in scores:
+        other_vector = vectors[other_id]
+        for feature, weight in common:
+            if feature in other_vector:
+                scores[other_id] += weight * other_vector[feature]
+
+    best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [other_id for other_id, _ in best]
+
+
+# Set up once in every worker process by _init_worker, so each chunk only carries movie ids.
+_worker_state = None
+
+
+def _init_worker(vectors, k: int, max_postings: int):
+    global _worker_state
+    _worker_state = (vectors, build_postings(vectors), k, max_postings)
+
+
+def _neighbours_for_chunk(movie_ids) -> Dict[int, List[int]]:
+    vectors, postings, k, max_postings = _worker_state
+    return {movie_id: top_neighbours(movie_id, vectors, postings, k, max_postings) for movie_id in movie_ids}
+
+
+class SimilarMovies:
+    """ Precomputed top-k similar movies for every movie, so serving them is a single dict lookup. """
+
+    def __init__(self, neighbours: Dict[int, List[int]] = None):
+        self._neighbours = neighbours or dict()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._neighbours)
+
+    def __len__(self) -> int:
+        return len(self._neighbours)
+
+    def similar_to(self, movie_id: int) -> List[int]:
+        return self._neighbours.get(movie_id, [])
+
+    @classmethod
+    def build(cls, repository: AbstractRepository, k: int = DEFAULT_NEIGHBOURS, workers: int = 0,
+              weights: dict = None, max_postings: int = DEFAULT_MAX_POSTINGS) -> 'SimilarMovies':
+        """ Scores every movie against the others sharing its genres, actors or director.
+
+        With workers > 0 the movies are split into chunks scored in that many processes.
+        """
+        movie_ids = repository.get_all_movie_ids()
+        vectors = build_vectors(repository.get_movies_by_id(movie_ids), weights)
+
+        if workers <= 0:
+            postings = build_postings(vectors)
+            return cls({movie_id: top_neighbours(movie_id, vectors, postings, k, max_postings)
+                        for movie_id in movie_ids})
+
+        chunk_size = max(1, math.ceil(len(movie_ids) / (workers * 4)))
+        chunks = [list(movie_ids[start:start + chunk_size]) for start in range(0, len(movie_ids), chunk_size)]
+        neighbours = dict()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(vectors, k, max_postings)) as executor:
+            for chunk_neighbours in executor.map(_neighbours_for_chunk, chunks):
+                neighbours.update(chunk_neighbours)
+        return cls(neighbours)
+
+
+def init_app(app, repository: AbstractRepository):
+    """ Builds the similar movies for app, in a background thread unless SIMILAR_MOVIES_BACKGROUND is False.
+
+    Until the first build finishes, the details pages simply show no similar movies; a rebuild after a catalog reload
+    keeps serving the previous neighbours until it finishes.
+    """
+    app.extensions.setdefault('similar_movies', SimilarMovies())
+    k = app.config.get('SIMILAR_MOVIES_K', DEFAULT_NEIGHBOURS)
+    workers = app.config.get('SIMILAR_MOVIES_WORKERS', 0)
+
+    def build():
+        try:
+            app.extensions['similar_movies'] = SimilarMovies.build(repository, k, workers)
+        except Exception:
+            logger.exception('Could not build the similar movies')
+            return
+        logger.info('Built similar movies for %d movies', len(app.extensions['similar_movies']))
+
+    if app.config.get('SIMILAR_MOVIES_BACKGROUND', True):
+        thread = threading.Thread(target=build, name='similar-movies', daemon=True)
+        thread.start()
+        return thread
+    build()
+    return None
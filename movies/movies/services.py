@@ -1,7 +1,10 @@
+from datetime import datetime
 from typing import List, Iterable
 
-from movies.adapters.repository import AbstractRepository
+from movies.adapters.repository import AbstractRepository, RepositoryException
 from movies.domain.model import make_comment, Movie, Comment, Genre, Actor, Director
+from movies.domain import query
+from movies.metrics.services import timed_phase, SERIALIZATION_PHASE
 
 
 class NonExistentMovieException(Exception):
@@ -12,6 +15,21 @@ class UnknownUserException(Exception):
     pass
 
 
+class InvalidCursorException(Exception):
+    pass
+
+
+class UnknownLeaderboardException(Exception):
+    pass
+
+
+class InvalidQueryException(Exception):
+    pass
+
+
+COMMENTS_PER_PAGE = 10
+
+
 def add_comment(movie_id: int, comment_text: str, username: str, repo: AbstractRepository):
     # Check that the movies exists.
     movie = repo.get_movie(movie_id)
@@ -28,14 +46,17 @@ def add_comment(movie_id: int, comment_text: str, username: str, repo: AbstractR
     # Update the repository.
     repo.add_comment(comment)
 
+    return comment_to_dict(comment)
 
-def get_movie(movie_id: int, repo: AbstractRepository):
+
+def get_movie(movie_id: int, repo: AbstractRepository, comments_cursor: str = None,
+              comments_per_page: int = COMMENTS_PER_PAGE):
     movie = repo.get_movie(movie_id)
 
     if movie is None:
         raise NonExistentMovieException
 
-    return movie_to_dict(movie)
+    return movie_to_dict(movie, decode_comments_cursor(comments_cursor), comments_per_page)
 
 
 def get_first_movie(repo: AbstractRepository):
@@ -68,6 +89,24 @@ def get_movies_by_id(id_list, repo: AbstractRepository):
     return movies_as_dict
 
 
+class MoviePage:
+    """ The movies of one listing page, fetched from the repository and converted one at a time as they're iterated,
+    so a streamed template can send each movie as soon as it's ready. """
+
+    def __init__(self, id_list, repo: AbstractRepository):
+        self._id_list = id_list
+        self._repo = repo
+
+    def __len__(self) -> int:
+        return len(self._id_list)
+
+    def __iter__(self):
+        for movie_id in self._id_list:
+            movie = self._repo.get_movie(movie_id)
+            if movie is not None:
+                yield movie_to_dict(movie)
+
+
 def get_comments_for_movie(movie_id, repo: AbstractRepository):
     movie = repo.get_movie(movie_id)
 
@@ -77,16 +116,103 @@ def get_comments_for_movie(movie_id, repo: AbstractRepository):
     return comments_to_dict(movie.comments)
 
 
+def get_comments_page(movie_id: int, repo: AbstractRepository, cursor: str = None,
+                      comments_per_page: int = COMMENTS_PER_PAGE):
+    """ Returns a page of the movie's comments, newest first, starting after the comment cursor points at. """
+    movie = repo.get_movie(movie_id)
+
+    if movie is None:
+        raise NonExistentMovieException
+
+    comments, next_cursor = movie.comments_before(decode_comments_cursor(cursor), comments_per_page)
+    return {
+        'movie_id': movie.id,
+        'number_of_comments': movie.number_of_comments,
+        'comments': comments_to_dict(comments),
+        'next_cursor': encode_comments_cursor(next_cursor),
+    }
+
+
+def encode_comments_cursor(key):
+    if key is None:
+        return None
+    timestamp, sequence = key
+    return f'{timestamp!r}_{sequence}'
+
+
+def decode_comments_cursor(cursor: str):
+    if not cursor:
+        return None
+    try:
+        timestamp, sequence = cursor.split('_')
+        return float(timestamp), int(sequence)
+    except ValueError:
+        raise InvalidCursorException
+
+
+def get_similar_movies(movie_id: int, similar_movies, repo: AbstractRepository):
+    """ Returns the id and title of the movies precomputed as most similar to the movie, most similar first. """
+    if similar_movies is None:
+        return []
+    return [{'id': movie.id, 'title': movie.title}
+            for movie in repo.get_movies_by_id(similar_movies.similar_to(movie_id))]
+
+
+def get_leaderboard(board: str, k: int, repo: AbstractRepository, genre_name: str = None, year: int = None):
+    try:
+        movies = repo.get_leaderboard(board, k, genre_name, year)
+    except RepositoryException:
+        raise UnknownLeaderboardException
+    return leaderboard_to_dict(movies)
+
+
 def filter_movies(actor_name: str, director_name: str, genre_name: str, repo: AbstractRepository):
     movie_ids = repo.filter_movies(actor_name, director_name, genre_name)
     return movie_ids
 
 
+def query_movies(query_text: str, repo: AbstractRepository):
+    """ Returns the ids of the movies matching a query, e.g. '(Action OR Sci-Fi) AND NOT Horror rating:>=7'. """
+    try:
+        return repo.query_movies(query.parse(query_text))
+    except query.QuerySyntaxException as exception:
+        raise InvalidQueryException(str(exception))
+
+
+def select_movie_ids(genre_name: str, actor_name: str, director_name: str, query_text: str,
+                     repo: AbstractRepository):
+    """ Returns the ids of the movies matching query_text if there is one, else those filter_movies picks. """
+    if query_text:
+        return query_movies(query_text, repo)
+    return filter_movies(actor_name, director_name, genre_name, repo)
+
+
+def explain_query(query_text: str, repo: AbstractRepository):
+    """ Returns the ids of the movies matching a query, as query_movies does, and how the query ran. """
+    try:
+        explanation = repo.explain_query(query.parse(query_text))
+        return explanation['movie_ids'], explanation
+    except query.QuerySyntaxException as exception:
+        raise InvalidQueryException(str(exception))
+
+
+# The most frequent values shown for facets that can have very many of them.
+FACET_LIMITS = {'director': 5}
+
+
+def get_facet_counts(movie_ids, repo: AbstractRepository):
+    """ Returns how the movies break down by genre, decade, rating and director (the top ones only). """
+    return repo.get_facet_counts(movie_ids, FACET_LIMITS)
+
+
 # ============================================
 # Functions to convert model entities to dicts
 # ============================================
 
-def movie_to_dict(movie: Movie):
+@timed_phase(SERIALIZATION_PHASE)
+def movie_to_dict(movie: Movie, comments_cursor=None, comments_per_page: int = COMMENTS_PER_PAGE):
+    # Only one page of comments is serialized, newest first; comments_cursor leads to the next one.
+    comments, next_cursor = movie.comments_before(comments_cursor, comments_per_page)
     movie_dict = {
         'id': movie.id,
         'title': movie.title,
@@ -98,13 +224,16 @@ def movie_to_dict(movie: Movie):
         'revenue': movie.revenue,
         'metascore': movie.metascore,
         "genres": genres_to_dict(movie.genres),
-        'comments': comments_to_dict(movie.comments),
+        'comments': comments_to_dict(comments),
+        'number_of_comments': movie.number_of_comments,
+        'comments_cursor': encode_comments_cursor(next_cursor),
         'actors': actors_to_dict(movie.actors),
         'director': director_to_dict(movie.director)
     }
     return movie_dict
 
 
+@timed_phase(SERIALIZATION_PHASE)
 def movies_to_dict(movies: Iterable[Movie]):
     return [movie_to_dict(movie) for movie in movies]
 
@@ -114,15 +243,35 @@ def comment_to_dict(comment: Comment):
         'username': comment.user.username,
         'movie_id': comment.movie.id,
         'comment_text': comment.comment,
-        'timestamp': comment.timestamp
+        'timestamp': datetime.fromtimestamp(comment.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+        # Seconds since the epoch, to the microsecond; timestamp is rounded to the second for display.
+        'posted_at': comment.timestamp
     }
     return comment_dict
 
 
+@timed_phase(SERIALIZATION_PHASE)
 def comments_to_dict(comments: Iterable[Comment]):
     return [comment_to_dict(comment) for comment in comments]
 
 
+def leaderboard_entry_to_dict(movie: Movie):
+    entry_dict = {
+        'id': movie.id,
+        'title': movie.title,
+        'year': movie.year,
+        'rating': movie.rating,
+        'votes': movie.votes,
+        'revenue': movie.revenue
+    }
+    return entry_dict
+
+
+@timed_phase(SERIALIZATION_PHASE)
+def leaderboard_to_dict(movies: Iterable[Movie]):
+    return [leaderboard_entry_to_dict(movie) for movie in movies]
+
+
 def genre_to_dict(genre: Genre):
     genre_dict = {
         'name': genre.genre_name,
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app, request, safe_join, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional: without it the build only writes the gzip variants.
+    brotli = None
+
+# Fingerprinted and precompressed copies of the static files are written here, inside the static folder.
+BUILD_DIRECTORY = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Files of these types are worth compressing; images other than icons already are compressed.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.ico', '.svg', '.json', '.txt', '.html')
+# Smaller files gain too little from compression to be worth an extra variant.
+MIN_COMPRESS_SIZE = 256
+
+# Fingerprinted files never change, so browsers may keep them for a year without revalidating.
+MAX_AGE = 365 * 24 * 60 * 60
+IMMUTABLE_CACHE_CONTROL = f'public, max-age={MAX_AGE}, immutable'
+
+# Variants tried in order of preference, by Content-Encoding, with the suffix of the file holding each.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def fingerprint(filename: str, content: bytes) -> str:
+    """ Returns filename with a hash of content before its extension: css/style.css -> css/style.1a2b3c4d5e6f.css """
+    stem, extension = posixpath.splitext(filename)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def rewrite_css_urls(css: str, css_filename: str, manifest: dict) -> str:
+    """ Points the relative url(...) references of a stylesheet, built into the build directory, at the fingerprinted
+    files they refer to, or at the original ones for files not in the manifest. """
+    css_directory = posixpath.dirname(css_filename)
+    built_css_directory = posixpath.join(BUILD_DIRECTORY, css_directory)
+
+    def replace(match):
+        quote, url = match.groups()
+        if ':' in url or url.startswith(('/', '#')):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(css_directory, url))
+        return f'url({quote}{posixpath.relpath(manifest.get(target, target), built_css_directory)}{quote})'
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _compress(path: str, content: bytes):
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        # A variant that saves nothing would only cost a disk read.
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as outfile:
+                outfile.write(compressed)
+
+
+def build_assets(static_folder: str) -> dict:
+    """ Writes a fingerprinted copy of every static file, and gzip (and, with brotli installed, brotli) variants of
+    the compressible ones, to the build directory, and returns the manifest mapping each filename to its copy.
+
+    Stylesheets are built last, so their url(...) references can be pointed at the fingerprinted images.
+    """
+    build_folder = os.path.join(static_folder, BUILD_DIRECTORY)
+    shutil.rmtree(build_folder, ignore_errors=True)
+
+    filenames = list()
+    for directory, subdirectories, files in os.walk(static_folder):
+        if directory == static_folder and BUILD_DIRECTORY in subdirectories:
+            subdirectories.remove(BUILD_DIRECTORY)
+        for name in files:
+            filenames.append(os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/'))
+    filenames.sort(key=lambda filename: (filename.endswith('.css'), filename))
+
+    manifest = dict()
+    for filename in filenames:
+        with open(os.path.join(static_folder, filename), 'rb') as infile:
+            content = infile.read()
+        if filename.endswith('.css'):
+            content = rewrite_css_urls(content.decode('utf-8'), filename, manifest).encode('utf-8')
+
+        built_filename = posixpath.join(BUILD_DIRECTORY, fingerprint(filename, content))
+        path = os.path.join(static_folder, built_filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as outfile:
+            outfile.write(content)
+        if filename.endswith(COMPRESSIBLE_EXTENSIONS) and len(content) >= MIN_COMPRESS_SIZE:
+            _compress(path, content)
+        manifest[filename] = built_filename
+
+    with open(os.path.join(build_folder, MANIFEST_NAME), 'w') as outfile:
+        json.dump(manifest, outfile, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder: str) -> dict:
+    """ Returns the manifest written by build_assets, or an empty one if the assets haven't been built. """
+    try:
+        with open(os.path.join(static_folder, BUILD_DIRECTORY, MANIFEST_NAME)) as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return dict()
+
+
+def send_static_file(filename):
+    """ Serves a static file; a fingerprinted one as its best precompressed variant the client accepts, cached for
+    good. """
+    if not filename.startswith(BUILD_DIRECTORY + '/'):
+        return current_app.send_static_file(filename)
+
+    static_folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(safe_join(static_folder, filename + suffix)):
+            response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype,
+                                           cache_timeout=MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype, cache_timeout=MAX_AGE)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    """ Makes url_for('static', ...) point at the fingerprinted copies of the files listed in the built manifest, and
+    serves those copies precompressed. Without a built manifest the static files are served as they are. """
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return
+
+    def use_fingerprinted_filename(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    app.url_defaults(use_fingerprinted_filename)
+    app.view_functions['static'] = send_static_file
+    app.extensions['static_manifest'] = manifest
@@ -0,0 +1,67 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded executor used for CPU-bound work (password hashing, profanity checks) so that it cannot take over every
+# request thread. Configured by create_app from CPU_EXECUTOR_WORKERS and CPU_EXECUTOR_QUEUE.
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def configure(max_workers: int = None, max_pending: int = None):
+    global _executor, _slots
+
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * max_workers
+
+    with _lock:
+        previous = _executor
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cpu-bound')
+        # Callers block here once max_workers tasks are running and max_pending more are queued.
+        _slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def shutdown():
+    global _executor, _slots
+
+    with _lock:
+        previous = _executor
+        _executor = None
+        _slots = None
+
+    if previous is not None:
+        previous.shutdown(wait=True)
+
+
+def _get_executor():
+    if _executor is None:
+        configure()
+    return _executor, _slots
+
+
+def submit(func, *args, **kwargs):
+    executor, slots = _get_executor()
+    slots.acquire()
+    try:
+        future = executor.submit(func, *args, **kwargs)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def run_cpu_bound(func, *args, **kwargs):
+    """ Runs func on the bounded CPU executor and waits for its result.
+
+    Only for request threads: the views are synchronous under WSGI and ASGI alike, and the ASGI adapter runs them on
+    its own pool, so the event loop never waits here.
+    """
+    return submit(func, *args, **kwargs).result()
+
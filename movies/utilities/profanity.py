@@ -0,0 +1,229 @@
+import os
+import threading
+from collections import deque
+from importlib.util import find_spec
+from itertools import product
+
+from movies.adapters.memory_repository import read_csv_file
+
+# Characters that may stand in for a letter, as in better_profanity.
+LEETSPEAK = {
+    'a': ('a', '@', '*', '4'),
+    'i': ('i', '*', 'l', '1'),
+    'o': ('o', '*', '0', '@'),
+    'u': ('u', '*', 'v'),
+    'v': ('v', '*', 'u'),
+    'l': ('l', '1'),
+    'e': ('e', '*', '3'),
+    's': ('s', '$', '5'),
+    't': ('t', '7'),
+}
+
+# Besides letters and digits, these characters are part of a word rather than a separator between words.
+WORD_SYMBOLS = frozenset('@$*"\'')
+
+SEPARATOR = ' '
+
+
+def default_wordlist_path() -> str:
+    """ Path of the wordlist shipped with better_profanity, found without importing (and loading) that package. """
+    package_directory = find_spec('better_profanity').submodule_search_locations[0]
+    return os.path.join(package_directory, 'profanity_wordlist.txt')
+
+
+def read_wordlist(path: str):
+    with open(path, encoding='utf-8') as infile:
+        for line in infile:
+            word = line.strip().lower()
+            if word:
+                yield word
+
+
+class ProfanityScreener:
+    """ Finds wordlist words, and their leetspeak variants, in text with a single Aho–Corasick automaton.
+
+    Text characters that stand for the same set of letters are folded into one symbol before matching, so '1' and 'l'
+    both become the symbol for "i or l". Every word is then expanded into the symbol sequences that can spell it and
+    compiled, with a separator on either side, into the automaton; scanning the folded, separator padded text visits
+    each character once and only reports whole words, as better_profanity does.
+    """
+
+    def __init__(self, words, leetspeak: dict = None):
+        leetspeak = LEETSPEAK if leetspeak is None else leetspeak
+        self._symbols = self._fold_characters(leetspeak)
+        self._spellings = {
+            letter: tuple(sorted({self._symbol(char) for char in chars}))
+            for letter, chars in leetspeak.items()
+        }
+
+        # State 0 is the root. _goto[state] maps a symbol to the next state, _fail[state] is the state for the longest
+        # proper suffix that is also in the trie and _output[state] holds the words recognised on reaching it: its own,
+        # then those of its failure state, which end at the same place ('job' at the end of 'blow job').
+        self._goto = [dict()]
+        self._fail = [0]
+        self._output = [()]
+
+        self._number_of_words = 0
+        for word in words:
+            self._add_word(word)
+            self._number_of_words += 1
+        self._link()
+
+    @classmethod
+    def from_file(cls, path: str = None, leetspeak: dict = None) -> 'ProfanityScreener':
+        return cls(read_wordlist(path or default_wordlist_path()), leetspeak)
+
+    @property
+    def number_of_words(self) -> int:
+        return self._number_of_words
+
+    @property
+    def number_of_states(self) -> int:
+        return len(self._goto)
+
+    def contains_profanity(self, text: str) -> bool:
+        for _ in self._scan(text):
+            return True
+        return False
+
+    def find_profanity(self, text: str) -> list:
+        """ Returns the wordlist words found in text, in order of their first appearance. """
+        found = list()
+        for word in self._scan(text):
+            if word not in found:
+                found.append(word)
+        return found
+
+    def _scan(self, text: str):
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for symbol in self._fold(text):
+            while symbol not in goto[state] and state != 0:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            yield from output[state]
+
+    def _fold(self, text: str):
+        """ Yields the symbols of text with runs of separators collapsed into one and a separator at either end. """
+        yield SEPARATOR
+        previous = SEPARATOR
+        for char in text.lower():
+            symbol = self._symbol(char)
+            if symbol == SEPARATOR and previous == SEPARATOR:
+                continue
+            yield symbol
+            previous = symbol
+        if previous != SEPARATOR:
+            yield SEPARATOR
+
+    def _symbol(self, char: str) -> str:
+        symbol = self._symbols.get(char)
+        if symbol is not None:
+            return symbol
+        if char.isalnum() or char in WORD_SYMBOLS:
+            return char
+        return SEPARATOR
+
+    @staticmethod
+    def _fold_characters(leetspeak: dict) -> dict:
+        letters = dict()
+        for letter, chars in leetspeak.items():
+            for char in chars:
+                letters.setdefault(char, set()).add(letter)
+        # Characters standing for exactly the same letters share a symbol, named after the letters themselves.
+        return {char: ''.join(sorted(letter_set)) for char, letter_set in letters.items()}
+
+    def _add_word(self, word: str):
+        spellings = [(SEPARATOR,)]
+        previous = SEPARATOR
+        for char in word:
+            if char in self._spellings:
+                spellings.append(self._spellings[char])
+                previous = char
+                continue
+            symbol = self._symbol(char)
+            if symbol == SEPARATOR and previous == SEPARATOR:
+                continue
+            spellings.append((symbol,))
+            previous = symbol
+        if previous != SEPARATOR:
+            spellings.append((SEPARATOR,))
+
+        for spelling in product(*spellings):
+            state = 0
+            for symbol in spelling:
+                next_state = self._goto[state].get(symbol)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append(dict())
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][symbol] = next_state
+                state = next_state
+            if not self._output[state]:
+                self._output[state] = (word,)
+
+    def _link(self):
+        """ Sets the failure links breadth first and lets every state report the words recognised by its suffixes. """
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while symbol not in self._goto[fallback] and fallback != 0:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(symbol, 0)
+                # Breadth first, the failure state is shallower and already has its suffixes' words.
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+
+_screener = None
+_screener_lock = threading.Lock()
+
+
+def configure(wordlist_path: str = None) -> ProfanityScreener:
+    """ Compiles the screener used by contains_profanity from wordlist_path, or better_profanity's wordlist. """
+    global _screener
+
+    screener = ProfanityScreener.from_file(wordlist_path)
+    with _screener_lock:
+        _screener = screener
+    return screener
+
+
+def get_screener() -> ProfanityScreener:
+    global _screener
+
+    if _screener is None:
+        with _screener_lock:
+            if _screener is None:
+                # Compiled on first use when create_app hasn't configured one.
+                _screener = ProfanityScreener.from_file()
+    return _screener
+
+
+def contains_profanity(text: str) -> bool:
+    return get_screener().contains_profanity(text)
+
+
+def screen_comments(rows, screener: ProfanityScreener = None):
+    """ Yields a dict for every row of a comments file whose text contains profanity.
+
+    rows are (id, author id, movie id, comment text, timestamp) sequences, as read from comments.csv.
+    """
+    screener = screener or get_screener()
+    for comment_id, author_id, movie_id, text, timestamp in rows:
+        words = screener.find_profanity(text)
+        if words:
+            yield {
+                'id': int(comment_id),
+                'author_id': int(author_id),
+                'movie_id': int(movie_id),
+                'timestamp': timestamp,
+                'words': words,
+            }
+
+
+def screen_comments_file(path: str, screener: ProfanityScreener = None) -> list:
+    return list(screen_comments(read_csv_file(path), screener))
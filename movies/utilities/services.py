@@ -4,6 +4,7 @@ import random
 from movies.adapters.repository import AbstractRepository
 from movies.domain.model import Movie
 from movies.movies.services import genres_to_dict, actors_to_dict
+from movies.metrics.services import timed_phase, SERIALIZATION_PHASE
 
 
 def get_genre_names(repo: AbstractRepository):
@@ -42,5 +43,6 @@ def movie_to_dict(movie: Movie):
     return movie_dict
 
 
+@timed_phase(SERIALIZATION_PHASE)
 def movies_to_dict(movies: Iterable[Movie]):
     return [movie_to_dict(movie) for movie in movies]
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable
+
+from config import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# A line of python -X importtime output: self and cumulative microseconds, then the module indented by its depth.
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+# Run in a fresh interpreter by profile_startup, so every import is timed from scratch.
+_PROFILE_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+from movies import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.extensions['warmup'].wait()
+print(json.dumps({
+    'imports': imported - started,
+    'create_app': created - imported,
+    'ready': time.perf_counter() - imported,
+    'phases': app.extensions['startup_timings'],
+}))
+'''
+
+
+@contextmanager
+def timed(timings: dict, name: str):
+    """ Records how long the with block took as timings[name], in seconds. """
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = perf_counter() - started
+
+
+class Warmup:
+    """ Startup work that serving requests needs but creating the application doesn't: run in the order it was added.
+
+    Normally it runs before create_app returns. In fast start mode it runs in a background thread instead, so the
+    server can bind its socket (and answer health checks) while the catalog loads; other requests wait for it.
+    There a failing task is logged and recorded in failures; if it was required, the tasks after it are skipped and
+    the warm-up has failed.
+    """
+
+    def __init__(self, timings: dict):
+        self._timings = timings
+        self._tasks = list()
+        self._failures = dict()
+        self._failed = False
+        self._done = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def failed(self) -> bool:
+        """ Whether a required task failed, leaving the application unable to serve requests. """
+        return self._failed
+
+    @property
+    def failures(self) -> dict:
+        """ The error of each task that failed, by task name. """
+        return dict(self._failures)
+
+    def add(self, name: str, task: Callable[[], None], required: bool = False):
+        self._tasks.append((name, task, required))
+
+    def start(self, background: bool = False):
+        """ Runs the tasks, in a background thread if background is True, returning that thread. """
+        if not background:
+            self._run(raise_errors=True)
+            return None
+        self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _run(self, raise_errors: bool = False):
+        try:
+            for name, task, required in self._tasks:
+                with timed(self._timings, name):
+                    try:
+                        task()
+                    except Exception as exception:
+                        if raise_errors:
+                            raise
+                        logger.exception('Warm-up task %s failed', name)
+                        self._failures[name] = str(exception) or type(exception).__name__
+                        if required:
+                            self._failed = True
+                if self._failed:
+                    break
+        finally:
+            self._done.set()
+        logger.info('Warmed up in %.3f s', sum(self._timings.get(name, 0.0) for name, _, _ in self._tasks))
+
+
+def parse_import_times(output: str):
+    """ Returns (module, depth, own seconds, cumulative seconds) for each line of python -X importtime output. """
+    imports = list()
+    for line in output.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is not None:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, len(indent) // 2, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return imports
+
+
+def profile_startup(fast_start: bool = False, top: int = 15) -> dict:
+    """ Creates the application in a fresh interpreter, returning how long its imports, create_app and each startup
+    phase took, the import time of the top packages and the top slowest modules by their own import time. """
+    environment = dict(os.environ, FAST_START=str(fast_start))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROFILE_SCRIPT], cwd=BASE_DIR,
+                               env=environment, capture_output=True, text=True, check=True)
+    profile = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    imports = parse_import_times(completed.stderr)
+    packages = defaultdict(float)
+    for module, _, own, _ in imports:
+        packages[module.split('.', 1)[0]] += own
+    profile['packages'] = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    profile['slowest_imports'] = sorted(
+        ((module, own) for module, _, own, _ in imports), key=lambda item: item[1], reverse=True)[:top]
+    return profile
@@ -1,15 +1,21 @@
-from better_profanity import profanity
-from flask import Blueprint, url_for
+from flask import Blueprint, Response, current_app, render_template, stream_with_context, url_for
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
 from wtforms import StringField, SubmitField, PasswordField, TextAreaField, HiddenField
 from wtforms.validators import DataRequired, Length, ValidationError
 
 import movies.adapters.repository as repo
 import movies.utilities.services as services
+import movies.movies.services as movies_services
+from movies.utilities import profanity
+from movies.utilities.offload import run_cpu_bound
 
 # Configure Blueprint.
 from movies.authentication.authentication import PasswordValid
 
+MOVIES_PER_PAGE = 4
+
 
 def get_genres_and_urls():
     genre_names = services.get_genre_names(repo.repo_instance)
@@ -26,6 +32,31 @@ def get_selected_movies(quantity=3):
     return movies
 
 
+def get_top_rated_movies(quantity=5):
+    return movies_services.get_leaderboard('top_rated', quantity, repo.repo_instance)
+
+
+def get_movies_per_page():
+    return current_app.config.get('MOVIES_PER_PAGE', MOVIES_PER_PAGE)
+
+
+def get_listing_movies(movie_ids):
+    """ Returns the movies of a listing page: all at once, or lazily when listings are streamed. """
+    if current_app.config.get('STREAM_LISTINGS'):
+        return movies_services.MoviePage(movie_ids, repo.repo_instance)
+    return movies_services.get_movies_by_id(movie_ids, repo.repo_instance)
+
+
+def render_listing(template_name, **context):
+    """ Renders a listing page, or streams it chunk by chunk when STREAM_LISTINGS is set. """
+    if not current_app.config.get('STREAM_LISTINGS'):
+        return render_template(template_name, **context)
+
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
 class FilterForm(FlaskForm):
     genre = StringField('genre', render_kw={"placeholder": "Genre"})
     actor = StringField('actor', render_kw={"placeholder": "Actor"})
@@ -59,7 +90,7 @@ class ProfanityFree:
         self.message = message
 
     def __call__(self, form, field):
-        if profanity.contains_profanity(field.data):
+        if run_cpu_bound(profanity.contains_profanity, field.data):
             raise ValidationError(self.message)
 
 
@@ -70,3 +101,51 @@ class CommentForm(FlaskForm):
         ProfanityFree(message='Your comment must not contain profanity')], id='comment-text')
     movie_id = HiddenField("Movie id")
     submit = SubmitField('Submit')
+
+
+class RenderedField:
+    def __init__(self, markup: str, label: str):
+        self._markup = Markup(markup)
+        self.label = Markup(label)
+
+    def __html__(self):
+        return self._markup
+
+    def __str__(self):
+        return self._markup
+
+
+class RenderedForm:
+    """ Stands in for a form on pages that only display it, with the markup of its fields rendered once.
+
+    The pages show the filter, sign up and login forms on every GET, but constructing a form for each request only
+    pays off when it's submitted. The fields are rendered from an empty form the first time they're needed; only
+    the CSRF token, which belongs to the session, is rendered per request. Views build the real form on POST.
+    """
+
+    def __init__(self, form_class):
+        self._form_class = form_class
+        self._fields = None
+
+    @property
+    def csrf_token(self):
+        if not current_app.config.get('WTF_CSRF_ENABLED', True):
+            return Markup('')
+        return Markup('<input id="csrf_token" name="csrf_token" type="hidden" value="{}">').format(generate_csrf())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._fields is None:
+            # No form data and no CSRF field, so the markup is the same for every request and session.
+            form = self._form_class(formdata=None, meta={'csrf': False})
+            self._fields = {field.name: RenderedField(field(), field.label()) for field in form}
+        try:
+            return self._fields[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+filter_form = RenderedForm(FilterForm)
+sign_up_form = RenderedForm(RegistrationForm)
+login_form = RenderedForm(LoginForm)
@@ -0,0 +1,82 @@
+import os
+
+import movies.adapters.repository as repo
+from config import BASE_DIR
+from movies import create_app
+from movies.adapters import memory_repository
+from movies.adapters.memory_repository import MemoryRepository
+from movies.admin import admin
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+DELTA = '''Rank,Title,Genre,Description,Director,Actors,Year,Runtime (Minutes),Rating,Votes,Revenue (Millions),Metascore
+2,Prometheus,"Adventure,Mystery,Sci-Fi","Following clues to the origin of mankind, a team finds a structure on a distant moon.",Ridley Scott,"Noomi Rapace, Logan Marshall-Green, Michael Fassbender, Charlize Theron",2012,124,7.0,485820,126.46,65
+15,Colossal,"Action,Comedy,Drama,Sci-Fi",Gloria is an out-of-work party girl.,Nacho Vigalondo,"Anne Hathaway, Jason Sudeikis",2016,109,6.4,8612,2.87,70
+16,Broken,"Comedy",,,,,,,,,
+'''
+
+
+def make_client(admin_token):
+    return create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': True,
+        'ADMIN_TOKEN': admin_token,
+    }).test_client()
+
+
+def test_import_upserts_rows_into_the_live_catalog():
+    client = make_client('s3cret')
+
+    response = client.post('/admin/import', data=DELTA, headers={'Authorization': 'Bearer s3cret'})
+
+    assert response.status_code == 200
+    assert response.json['added'] == 1 and response.json['updated'] == 1
+    assert [error['line'] for error in response.json['errors']] == [4]
+    assert 'Prometheus' in client.get('/filter_movies?genre=mystery').get_data(as_text=True)
+    assert 'Colossal' in client.get('/filter_movies?genre=sci-fi').get_data(as_text=True)
+
+
+def test_import_lands_on_the_generation_a_reload_swapped_in_while_it_waited(monkeypatch):
+    client = make_client('s3cret')
+
+    class ReloadFirst:
+        """ Stands in for catalog_lock, held by a reload that swaps in a new generation before the import gets it. """
+
+        def __enter__(self):
+            repository = MemoryRepository()
+            memory_repository.populate(TEST_DATA_PATH, repository)
+            repo.repo_instance.swap(repository)
+
+        def __exit__(self, *exc_info):
+            pass
+
+    monkeypatch.setattr(admin, 'catalog_lock', ReloadFirst())
+
+    response = client.post('/admin/import', data=DELTA, headers={'Authorization': 'Bearer s3cret'})
+
+    assert response.json['added'] == 1
+    assert repo.repo_instance.generation == 2 and repo.repo_instance.current.get_movie(2) is not None
+
+
+def test_import_rebuilds_the_similar_movies():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'ADMIN_TOKEN': 's3cret',
+        'SIMILAR_MOVIES_ENABLED': True,
+        'SIMILAR_MOVIES_BACKGROUND': False,
+    })
+    assert app.extensions['similar_movies'].similar_to(2) == []
+
+    app.test_client().post('/admin/import', data=DELTA, headers={'Authorization': 'Bearer s3cret'})
+
+    assert app.extensions['similar_movies'].similar_to(2) != []
+
+
+def test_import_requires_the_admin_token():
+    assert make_client('s3cret').post('/admin/import', data=DELTA).status_code == 401
+    assert make_client('s3cret').post('/admin/import', data=DELTA,
+                                      headers={'Authorization': 'Bearer guess'}).status_code == 401
+    assert make_client(None).post('/admin/import', data=DELTA,
+                                  headers={'Authorization': 'Bearer None'}).status_code == 404
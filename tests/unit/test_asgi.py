@@ -0,0 +1,219 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, Future
+
+from config import BASE_DIR
+from movies.asgi import create_asgi_app
+from movies.adapters.async_repository import AsyncRepositoryAdapter
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def call_asgi(app, method, path, query_string=b'', body=b'', headers=None):
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': headers or [],
+        'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = list()
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+def make_asgi_app():
+    return create_asgi_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False
+    })
+
+
+def test_asgi_app_serves_blueprints():
+    sent = call_asgi(make_asgi_app(), 'GET', '/', query_string=b'cursor=4')
+
+    assert sent[0]['type'] == 'http.response.start'
+    assert sent[0]['status'] == 200
+    assert (b'content-type', b'text/html; charset=utf-8') in sent[0]['headers']
+
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    assert b'The Secret Life of Pets' in body
+    assert sent[-1]['more_body'] is False
+
+
+def test_asgi_app_passes_request_body_and_query_string():
+    app = make_asgi_app()
+
+    sent = call_asgi(app, 'GET', '/filter_movies', query_string=b'genre=drama')
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    assert b'Could not find related movies.' not in body
+
+    sent = call_asgi(app, 'GET', '/filter_movies', query_string=b'genre=love')
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    assert b'Could not find related movies.' in body
+
+    sent = call_asgi(
+        app, 'POST', '/authentication/login',
+        body=b'username=thorke&password=cLQ%5EC%23oFXloS',
+        headers=[(b'content-type', b'application/x-www-form-urlencoded')]
+    )
+    assert sent[0]['status'] == 302
+    assert any(name == b'set-cookie' for name, value in sent[0]['headers'])
+
+
+def test_async_repository_adapter(in_memory_repo):
+    async def fetch():
+        async_repo = AsyncRepositoryAdapter(in_memory_repo)
+        movie = await async_repo.get_movie(14)
+        movie_ids = await async_repo.filter_movies(genre_name='Action')
+        return movie, movie_ids
+
+    movie, movie_ids = asyncio.run(fetch())
+    assert movie.title == 'Moana'
+    assert set(movie_ids) == {1, 13, 15}
+
+
+class NewThreadExecutor(Executor):
+    """ Runs every call on a thread of its own, as a busy pool may, where an idle pool would reuse one thread. """
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exception:
+                future.set_exception(exception)
+
+        threading.Thread(target=run).start()
+        return future
+
+
+def test_asgi_adapter_keeps_the_request_context_while_streaming():
+    from flask import Flask, Response, request, stream_with_context
+
+    from movies.asgi import AsgiAdapter
+
+    app = Flask(__name__)
+
+    @app.route('/stream')
+    def stream():
+        def chunks():
+            for number in range(20):
+                yield f'{request.args["name"]}-{number};'
+        return Response(stream_with_context(chunks()))
+
+    sent = call_asgi(AsgiAdapter(app, executor=NewThreadExecutor()), 'GET', '/stream', query_string=b'name=chunk')
+
+    assert sent[0]['status'] == 200
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    assert body.decode() == ''.join(f'chunk-{number};' for number in range(20))
+    assert sent[-1]['more_body'] is False
+
+
+def test_asgi_app_streams_listings():
+    from movies import create_app
+    from movies.asgi import AsgiAdapter
+
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'STREAM_LISTINGS': True,
+        'METRICS_ENABLED': True,
+        'MOVIES_PER_PAGE': 2,
+    })
+    adapter = AsgiAdapter(app, executor=NewThreadExecutor())
+
+    sent = call_asgi(adapter, 'GET', '/filter_movies', query_string=b'genre=comedy')
+
+    assert sent[0]['status'] == 200
+    body = b''.join(message.get('body', b'') for message in sent[1:]).decode()
+    assert len(sent) > 3
+    assert body.count('class="blog_main"') == 2 and body.rstrip().endswith('</html>')
+
+
+def test_asgi_adapter_stops_streaming_when_the_client_goes_away():
+    from flask import Flask, Response
+
+    from movies.asgi import AsgiAdapter
+
+    app = Flask(__name__)
+    produced = list()
+    closed = threading.Event()
+
+    @app.route('/stream')
+    def stream():
+        def chunks():
+            try:
+                for number in range(1000):
+                    produced.append(number)
+                    yield f'{number};'
+            finally:
+                closed.set()
+        return Response(chunks())
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/stream', 'headers': [], 'server': ('testserver', 80)}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            raise ConnectionResetError
+
+    try:
+        asyncio.run(AsgiAdapter(app)(scope, receive, send))
+    except ConnectionResetError:
+        pass
+
+    assert closed.is_set()
+    assert len(produced) < 1000
+
+
+def test_asgi_lifespan_shutdown_does_not_block_the_event_loop():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from movies.asgi import AsgiAdapter
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    executor.submit(release.wait)
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = list()
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    async def serve():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        threading.Timer(0.2, release.set).start()
+        await AsgiAdapter(lambda environ, start_response: [], executor=executor)({'type': 'lifespan'}, receive, send)
+        ticker.cancel()
+        return ticks
+
+    # The event loop kept running while the executor waited for its task.
+    assert asyncio.run(serve()) >= 5
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,64 @@
+import gzip
+import os
+
+from flask import Flask, url_for
+
+from movies.utilities import assets
+
+
+def make_static_folder(tmpdir):
+    static_folder = str(tmpdir.mkdir('static'))
+    os.makedirs(os.path.join(static_folder, 'css'))
+    os.makedirs(os.path.join(static_folder, 'images'))
+    with open(os.path.join(static_folder, 'css', 'style.css'), 'w') as outfile:
+        outfile.write('body { background: url(../images/logo.png); }\n' * 20)
+        outfile.write('p { background: url("../images/missing.png"); }\n')
+    with open(os.path.join(static_folder, 'images', 'logo.png'), 'wb') as outfile:
+        outfile.write(b'\x89PNG not really')
+    return static_folder
+
+
+def test_build_assets_fingerprints_and_precompresses(tmpdir):
+    static_folder = make_static_folder(tmpdir)
+
+    manifest = assets.build_assets(static_folder)
+
+    logo = manifest['images/logo.png']
+    style = manifest['css/style.css']
+    assert logo.startswith('dist/images/logo.') and logo.endswith('.png')
+    assert assets.build_assets(static_folder) == manifest  # Same content, same names.
+    assert assets.load_manifest(static_folder) == manifest
+
+    with open(os.path.join(static_folder, style)) as infile:
+        css = infile.read()
+    assert f'url(../{logo[len("dist/"):]})' in css
+    assert 'url("../../images/missing.png")' in css
+    with gzip.open(os.path.join(static_folder, style + '.gz'), 'rt') as infile:
+        assert infile.read() == css
+    # Too small to gain from compressing.
+    assert not os.path.exists(os.path.join(static_folder, logo + '.gz'))
+
+
+def test_fingerprinted_files_are_served_precompressed_and_immutable(tmpdir):
+    static_folder = make_static_folder(tmpdir)
+    manifest = assets.build_assets(static_folder)
+    app = Flask(__name__, static_folder=static_folder)
+    assets.init_app(app)
+    client = app.test_client()
+
+    with app.test_request_context():
+        style_url = url_for('static', filename='css/style.css')
+    assert style_url == '/static/' + manifest['css/style.css']
+
+    response = client.get(style_url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Type'].startswith('text/css')
+    assert response.headers['Cache-Control'] == assets.IMMUTABLE_CACHE_CONTROL
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'url(../images/logo.' in gzip.decompress(response.data)
+
+    response = client.get(style_url)
+    assert 'Content-Encoding' not in response.headers
+    assert b'url(../images/logo.' in response.data
+
+    assert client.get('/static/css/style.css').headers['Cache-Control'] != assets.IMMUTABLE_CACHE_CONTROL
@@ -0,0 +1,81 @@
+import os
+import random
+
+import pytest
+
+from config import BASE_DIR
+from benchmarks import loadtest, run as benchmarks
+from benchmarks.generate_catalog import CatalogGenerator, ZipfSampler, password_for
+from movies.adapters.memory_repository import MemoryRepository, populate
+from movies.authentication import services as auth_services
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def test_benchmark_suite_runs_on_a_small_catalog():
+    results = benchmarks.run([20], repeat=1)
+
+    timings = results['results']['20']
+    for name in ('populate', 'filter_movies.genre', 'get_user', 'get_movies_by_id.page', 'add_comment',
+                 'movie_to_dict', 'render.home', 'render.filter', 'render.details'):
+        assert timings[name]['median'] > 0
+
+
+def test_compare_reports_benchmarks_slower_than_the_baseline():
+    baseline = {'results': {'1000': {'get_user': {'median': 0.010}, 'populate': {'median': 1.0}}}}
+    results = {'results': {'1000': {'get_user': {'median': 0.020}, 'populate': {'median': 1.1},
+                                    'movie_to_dict': {'median': 5.0}}}}
+
+    regressions = benchmarks.compare(results, baseline, tolerance=0.25)
+
+    assert regressions == [('1000', 'get_user', 0.010, 0.020)]
+
+
+def test_benchmarks_fail_without_the_baseline_they_compare_against(tmpdir):
+    with pytest.raises(SystemExit) as exit_info:
+        benchmarks.main(['--sizes', '20', '--repeat', '1', '--baseline', str(tmpdir.join('missing.json'))])
+
+    assert exit_info.value.code != 0
+
+
+def test_zipf_sampler_favours_low_ranks():
+    sampler = ZipfSampler(1000, 1.1, random.Random(0))
+    samples = [sampler.sample() for _ in range(5000)]
+
+    assert min(samples) >= 1 and max(samples) <= 1000
+    assert samples.count(1) > samples.count(2) > samples.count(10)
+
+
+def test_generated_catalog_is_deterministic_and_loads(tmpdir):
+    generator = CatalogGenerator(number_of_movies=50, number_of_users=5, number_of_comments=20, seed=3)
+    assert list(generator.movie_rows()) == list(CatalogGenerator(50, 5, 20, seed=3).movie_rows())
+    assert list(generator.movie_rows()) != list(CatalogGenerator(50, 5, 20, seed=4).movie_rows())
+
+    data_path = str(tmpdir)
+    generator.write(data_path, hash_passwords=True, hash_method='pbkdf2:sha256:1000')
+
+    repo = MemoryRepository()
+    populate(data_path, repo)
+
+    assert repo.get_number_of_movies() == 50
+    assert len(repo.get_comments()) == 20
+    assert repo.get_user('user5').password.startswith('pbkdf2:sha256:1000$')
+    auth_services.authenticate_user('user5', password_for(5, seed=3), repo)
+
+
+def test_load_test_reports_percentiles_per_route():
+    summary = loadtest.run_load_test(data_path=TEST_DATA_PATH, workers=2, requests=40, seed=1)
+
+    assert summary['requests'] == 40
+    for route, result in summary['routes'].items():
+        assert route in loadtest.ROUTES
+        assert result['errors'] == 0
+        assert result['p50'] <= result['p95'] <= result['p99']
+
+
+def test_percentile_uses_nearest_rank():
+    values = [0.1 * i for i in range(1, 101)]
+
+    assert loadtest.percentile(values, 50) == values[49]
+    assert loadtest.percentile(values, 99) == values[98]
+    assert loadtest.percentile([], 50) == 0.0
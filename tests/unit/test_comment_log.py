@@ -0,0 +1,109 @@
+import gc
+import os
+import weakref
+
+from config import BASE_DIR
+from movies.adapters import comment_log
+from movies.adapters.comment_log import CommentLog
+from movies.adapters.memory_repository import MemoryRepository
+from movies.adapters import memory_repository
+from movies.movies import services as movies_services
+from movies.authentication import services as auth_services
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def make_repo():
+    repo = MemoryRepository()
+    memory_repository.populate(TEST_DATA_PATH, repo)
+    return repo
+
+
+def test_comment_log_shares_comments_between_workers(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    repo_one, repo_two = make_repo(), make_repo()
+    log_one, log_two = CommentLog(path), CommentLog(path)
+
+    comment_dict = movies_services.add_comment(13, 'Shared between workers', 'fmercury', repo_one)
+    log_one.append_comment(comment_dict)
+
+    # The worker that wrote the record skips it, the other one applies it.
+    assert log_one.apply_new(repo_one) == 0
+    assert log_two.apply_new(repo_two) == 1
+
+    comments = movies_services.get_comments_for_movie(13, repo_two)
+    assert [comment['comment_text'] for comment in comments] == ['Shared between workers']
+    assert comments[0]['timestamp'] == comment_dict['timestamp']
+    assert comments[0]['posted_at'] == comment_dict['posted_at']
+
+
+def test_comment_log_keeps_the_order_of_comments_posted_within_a_second(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    repo_one, repo_two = make_repo(), make_repo()
+    log_one, log_two = CommentLog(path), CommentLog(path)
+
+    for text in ('First', 'Second', 'Third'):
+        log_one.append_comment(movies_services.add_comment(13, text, 'fmercury', repo_one))
+    log_two.apply_new(repo_two)
+
+    def comments_on(repo):
+        return [(comment['comment_text'], comment['posted_at'])
+                for comment in movies_services.get_comments_for_movie(13, repo)]
+    assert comments_on(repo_two) == comments_on(repo_one)
+    assert [text for text, _ in comments_on(repo_two)] == ['First', 'Second', 'Third']
+
+
+def test_comment_log_only_reads_new_records(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    repo_one, repo_two = make_repo(), make_repo()
+    log_one, log_two = CommentLog(path), CommentLog(path)
+
+    log_one.append_comment(movies_services.add_comment(13, 'First comment', 'fmercury', repo_one))
+    assert log_two.apply_new(repo_two) == 1
+
+    log_one.append_comment(movies_services.add_comment(13, 'Second comment', 'thorke', repo_one))
+    assert log_two.apply_new(repo_two) == 1
+    assert log_two.apply_new(repo_two) == 0
+
+    assert len(movies_services.get_comments_for_movie(13, repo_two)) == 2
+
+
+def test_comment_log_shares_users(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    repo_one, repo_two = make_repo(), make_repo()
+    log_one, log_two = CommentLog(path), CommentLog(path)
+
+    log_one.append_user(auth_services.add_user('jz', 'abcd1A23', repo_one))
+    log_one.append_comment(movies_services.add_comment(14, 'Posted by a new user', 'jz', repo_one))
+
+    assert log_two.apply_new(repo_two) == 2
+    auth_services.authenticate_user('jz', 'abcd1A23', repo_two)
+
+
+def test_comment_log_waits_for_partially_written_records(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    repo = make_repo()
+    log = CommentLog(path)
+
+    line = '{"kind": "comment", "username": "thorke", "movie_id": 14, "comment_text": "Half written", ' \
+           '"timestamp": 1601562686.0, "origin": "other"}\n'
+    with open(path, 'w') as outfile:
+        outfile.write(line[:40])
+    assert log.apply_new(repo) == 0
+
+    with open(path, 'a') as outfile:
+        outfile.write(line[40:])
+    assert log.apply_new(repo) == 1
+
+
+def test_one_fork_hook_renews_the_origin_of_every_live_log(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.log')
+    logs = [CommentLog(path) for _ in range(3)]
+    origins = [log._origin for log in logs]
+    forgotten = weakref.ref(CommentLog(path))
+    gc.collect()
+
+    comment_log._after_fork_in_child()
+
+    assert all(log._origin != origin for log, origin in zip(logs, origins))
+    assert forgotten() is None
@@ -1,5 +1,6 @@
 from movies.domain.model import User, Movie, Genre, Director, Actor, make_comment, make_genre_association, \
-    make_actor_association, make_director_association, ModelException
+    make_actor_association, make_director_association, remove_genre_association, \
+    ModelException
 
 import pytest
 
@@ -108,6 +109,23 @@ def test_make_comment_establishes_relationships(movie, user):
     assert comment.movie is movie
 
 
+def test_movie_pages_comments_newest_first(movie, user):
+    from datetime import datetime, timedelta
+    start = datetime(2020, 10, 1, 12, 0, 0)
+    # Added out of order, with two comments sharing a timestamp.
+    for minutes in (3, 0, 4, 1, 2, 2):
+        make_comment(f'comment {minutes}', user, movie, start + timedelta(minutes=minutes))
+
+    assert [comment.comment for comment in movie.comments] == [
+        'comment 0', 'comment 1', 'comment 2', 'comment 2', 'comment 3', 'comment 4']
+
+    page, cursor = movie.comments_before(limit=4)
+    assert [comment.comment for comment in page] == ['comment 4', 'comment 3', 'comment 2', 'comment 2']
+    page, cursor = movie.comments_before(cursor, limit=4)
+    assert [comment.comment for comment in page] == ['comment 1', 'comment 0']
+    assert cursor is None
+
+
 def test_make_genre_associations(movie, genre):
     make_genre_association(movie, genre)
 
@@ -151,3 +169,39 @@ def test_make_director_association_with_movie_already_was_applied_to_director(mo
 
     with pytest.raises(ModelException):
         make_director_association(movie, director)
+
+
+def test_genre_keeps_its_movies_by_id_in_the_order_added(movie, genre):
+    other_movie = Movie(2, "Prometheus", "A nice movie", 2012, 124, 7.0, 485820, 126.46, 65)
+    make_genre_association(other_movie, genre)
+    make_genre_association(movie, genre)
+
+    assert list(genre.genre_movies) == [other_movie, movie]
+    remove_genre_association(other_movie, genre)
+    assert not genre.is_applied_to(other_movie) and genre.is_applied_to(movie)
+    assert genre.number_of_genre_movies == 1
+    genre.remove_movie(other_movie)  # Removing a movie the genre doesn't have is a no-op.
+    assert list(genre.genre_movies) == [movie]
+
+
+def test_user_keeps_comment_counts(movie, user):
+    other_movie = Movie(2, "Prometheus", "A nice movie", 2012, 124, 7.0, 485820, 126.46, 65)
+    make_comment('first', user, movie)
+    make_comment('second', user, movie)
+    comment = make_comment('third', user, other_movie)
+
+    assert user.number_of_comments == 3
+    assert user.number_of_movies_commented == 2
+    assert user.number_of_comments_on(movie) == 2
+    assert user.has_comment(comment)
+    assert [c.comment for c in user.comments_before(limit=2)[0]] == ['third', 'second']
+
+
+def test_entities_compare_and_hash_by_name_whatever_their_ids():
+    assert Genre('Action', 1) == Genre('Action', 1)
+    assert Genre('Action', 1) == Genre('Action', 2)
+    assert hash(Genre('Action', 1)) == hash(Genre('Action', 2))
+    assert Genre('Action', 1) != Genre('Comedy', 1)
+    assert Genre('Action') == Genre('Action', 2)
+    assert len({Actor('Zoe Saldana', 1), Actor('Zoe Saldana', 1), Actor('Chris Pratt', 2)}) == 2
+    assert Director('James Gunn', 1) != Actor('James Gunn', 1)
@@ -0,0 +1,68 @@
+import csv
+import gzip
+import io
+import json
+import os
+
+from config import BASE_DIR
+from movies.movies.export import export_movies, gzip_chunks, JSON_LINES
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def test_csv_export_has_the_columns_and_rows_of_movies_csv(in_memory_repo):
+    with open(os.path.join(TEST_DATA_PATH, 'movies.csv'), encoding='utf-8-sig') as infile:
+        rows = list(csv.reader(infile))
+    header, expected = rows[0], {row[0]: row for row in rows[1:]}
+
+    chunks = list(export_movies([13, 14, 15], in_memory_repo, batch_size=2))
+    exported = list(csv.reader(io.StringIO(''.join(chunks))))
+
+    assert len(chunks) == 2
+    assert exported[0] == header
+    for row in exported[1:]:
+        source = expected[row[0]]
+        # Genres and actors are listed in the order they were associated, which needn't be the file's.
+        assert row[:2] + row[3:5] + row[6:] == source[:2] + source[3:5] + source[6:]
+        for column in (2, 5):
+            assert sorted(name.strip() for name in row[column].split(',')) == \
+                   sorted(name.strip() for name in source[column].split(','))
+
+
+def test_json_lines_export_compressed(in_memory_repo):
+    data = gzip.decompress(b''.join(gzip_chunks(export_movies([1, 16], in_memory_repo, JSON_LINES))))
+    movies = [json.loads(line) for line in data.decode().splitlines()]
+
+    assert [movie['title'] for movie in movies] == ['Guardians of the Galaxy', 'The Secret Life of Pets']
+    assert movies[0]['genres'] == ['Action', 'Adventure', 'Sci-Fi']
+
+
+def test_export_endpoint_streams_filter_results(client):
+    response = client.get('/export?genre=comedy&format=jsonl')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename=movies.jsonl'
+    assert sorted(json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()) == [14, 15, 16]
+
+    response = client.get('/export?q=Sci-Fi+year:>=2015&gzip=1')
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert lines[0].startswith('Rank,Title') and len(lines) == 2
+
+    assert client.get('/export?format=xml').status_code == 400
+
+
+def test_export_endpoint_reads_one_generation_across_a_reload(client, monkeypatch):
+    from functools import partial
+
+    import movies.adapters.repository as repo
+    from movies.adapters.memory_repository import MemoryRepository
+    from movies.movies import export
+
+    # Two movies per chunk, so most of the export is produced after the first chunk has gone out.
+    monkeypatch.setattr(export, 'export_movies', partial(export_movies, batch_size=2))
+    response = client.get('/export?format=jsonl', buffered=False)
+    repo.repo_instance.swap(MemoryRepository())  # A reload lands while the export is being sent.
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 5
@@ -0,0 +1,61 @@
+import os
+
+import movies.adapters.repository as repo
+from config import BASE_DIR
+from movies import create_app
+from movies.adapters import memory_repository
+from movies.adapters.hot_reload import SwappableRepository, migrate_runtime_state
+from movies.adapters.memory_repository import MemoryRepository
+from movies.domain.model import User
+from movies.movies import services as movies_services
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def make_repository():
+    repository = MemoryRepository()
+    memory_repository.populate(TEST_DATA_PATH, repository)
+    return repository
+
+
+def test_migrate_runtime_state_copies_new_users_and_comments_once():
+    old, new = make_repository(), make_repository()
+    old.add_user(User('newcomer', 'hashed'))
+    movies_services.add_comment(13, 'Worth a rewatch', 'newcomer', old)
+
+    assert migrate_runtime_state(old, new) == {'users': 1, 'comments': 1, 'dropped_comments': 0}
+    assert migrate_runtime_state(old, new) == {'users': 0, 'comments': 0, 'dropped_comments': 0}
+    assert [comment.comment for comment in new.get_user('newcomer').comments] == ['Worth a rewatch']
+    assert len(new.get_comments()) == len(old.get_comments())
+
+
+def test_pinned_context_keeps_its_generation_across_a_swap():
+    first, second = make_repository(), make_repository()
+    second.add_user(User('newcomer', 'hashed'))
+    repositories = SwappableRepository(first)
+
+    token = repositories.pin()
+    repositories.swap(second)
+    assert repositories.get_user('newcomer') is None
+    repositories.unpin(token)
+
+    assert repositories.get_user('newcomer') is not None
+    assert repositories.generation == 2
+
+
+def test_reload_keeps_comments_and_serves_the_new_generation():
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': TEST_DATA_PATH, 'WTF_CSRF_ENABLED': False,
+                      'ADMIN_TOKEN': 's3cret'})
+    client = app.test_client()
+    client.post('authentication/login', data={'username': 'thorke', 'password': 'cLQ^C#oFXloS'})
+    client.post('/comment', data={'comment': 'Still here after a reload', 'movieID': 14})
+    old_generation = repo.repo_instance.current
+
+    response = client.post('/admin/reload', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 202
+    app.extensions['catalog_reloader'].wait()
+
+    status = client.get('/admin/reload', headers={'Authorization': 'Bearer s3cret'}).json
+    assert status['generation'] == 2 and status['last_reload']['comments'] == 1
+    assert repo.repo_instance.current is not old_generation
+    assert 'Still here after a reload' in client.get('/details/14/').get_data(as_text=True)
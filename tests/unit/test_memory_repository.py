@@ -1,10 +1,19 @@
+import os
+import random
 from datetime import datetime
 from typing import List
 
 import pytest
 
+from config import BASE_DIR
+from movies.adapters import leaderboards, memory_repository
+from movies.adapters.leaderboards import Leaderboards, SortedKeys
+from movies.adapters.memory_repository import MemoryRepository
 from movies.domain.model import User, Movie, Genre, Actor, Director, Comment, make_comment
 from movies.adapters.repository import RepositoryException
+from movies.authentication import hashing
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
 
 
 def test_repository_can_add_a_user(in_memory_repo):
@@ -121,6 +130,57 @@ def test_repository_can_get_last_movie(in_memory_repo):
     assert article.title == 'The Secret Life of Pets'
 
 
+def test_repository_movie_id_view_is_ordered_and_unaffected_by_later_movies(in_memory_repo):
+    movie_ids = in_memory_repo.get_all_movie_ids()
+
+    in_memory_repo.add_movie(Movie(2, 'Prometheus', '', 2012, 124, 7.0, 485820))
+    in_memory_repo.add_movie(Movie(100, 'Split', '', 2016, 117, 7.3, 157606))
+
+    assert list(movie_ids) == [1, 13, 14, 15, 16]
+    assert list(movie_ids[1:3]) == [13, 14]
+    assert list(in_memory_repo.get_all_movie_ids()) == [1, 2, 13, 14, 15, 16, 100]
+    assert in_memory_repo.get_last_movie().title == 'Split'
+    assert in_memory_repo.movie_index(in_memory_repo.get_movie(2)) == 5
+
+
+def test_repository_publishes_a_batch_of_movie_ids_at_once(in_memory_repo):
+    movie_ids = in_memory_repo.get_all_movie_ids()
+
+    in_memory_repo.upsert_movies([
+        (Movie(100, 'Split', '', 2016, 117, 7.3, 157606), ['Horror'], ['James McAvoy'], 'M. Night Shyamalan'),
+        (Movie(2, 'Prometheus', '', 2012, 124, 7.0, 485820), ['Sci-Fi'], ['Noomi Rapace'], 'Ridley Scott'),
+        (Movie(14, 'Moana', 'A sea voyage.', 2016, 107, 8.4, 218151), ['Animation'], [], 'John Musker'),
+    ])
+
+    assert list(movie_ids) == [1, 13, 14, 15, 16]
+    assert list(in_memory_repo.get_all_movie_ids()) == [1, 2, 13, 14, 15, 16, 100]
+    assert in_memory_repo.get_movie(14).rating == 8.4
+
+
+def test_repository_updates_movies_upserted_during_a_bulk_load():
+    from movies.domain.query import parse
+    repository = MemoryRepository()
+
+    with repository.bulk_load():
+        repository.upsert_movie(Movie(1, 'Old', '', 2014, 121, 5.0, 757074), ['Action'], ['Chris Pratt'], 'James Gunn')
+        repository.upsert_movie(Movie(1, 'New', '', 2014, 121, 9.0, 757074), ['Action'], ['Chris Pratt'], 'James Gunn')
+
+    movie = repository.get_movie(1)
+    assert (movie.title, movie.rating) == ('New', 9.0)
+    assert repository.get_leaderboard('top_rated', 1) == [movie]
+    assert repository.query_movies(parse('rating:9..10')) == [1] and repository.query_movies(parse('rating:5..6')) == []
+
+
+def test_bulk_loaded_numeric_ranges_match_incrementally_indexed_ones(in_memory_repo):
+    from movies.domain.query import parse
+    incremental = MemoryRepository()
+    for movie_id in in_memory_repo.get_all_movie_ids():
+        incremental.add_movie(in_memory_repo.get_movie(movie_id))
+
+    for text in ('rating:6..8', 'year:2014..2016', 'runtime:100..120', 'votes:..100000', 'rating:7 OR year:2016'):
+        assert in_memory_repo.query_movies(parse(text)) == incremental.query_movies(parse(text))
+
+
 def test_repository_can_get_movies_by_ids(in_memory_repo):
     movies = in_memory_repo.get_movies_by_id([1, 13, 15])
 
@@ -228,3 +288,154 @@ def test_repository_filter_movies_by_genre_or_actor_name_or_director_name(in_mem
 
     movie_ids = in_memory_repo.filter_movies(director_name="James Gunn", genre_name="Action", actor_name='Chris Pratt')
     assert movie_ids == [1]
+
+
+def test_repository_keeps_leaderboards_sorted(in_memory_repo):
+    # Colossal has fewer votes than the top rated boards require.
+    assert [movie.id for movie in in_memory_repo.get_leaderboard('top_rated', 10)] == [1, 13, 14, 16]
+    assert [movie.id for movie in in_memory_repo.get_leaderboard('most_voted', 2)] == [1, 13]
+    assert [movie.id for movie in in_memory_repo.get_leaderboard('highest_grossing', 10, genre_name='comedy')] == [
+        16, 14, 15]
+    assert in_memory_repo.get_leaderboard('most_voted', 10, year=1999) == []
+
+    movie = Movie(17, "Blockbuster", "A new movie", 2016, 100, 9.0, 1000000, 999.0, 90)
+    genre = next(genre for genre in in_memory_repo.get_genres() if genre.genre_name == 'Comedy')
+    movie.add_genre(genre)
+    in_memory_repo.add_movie(movie)
+
+    assert in_memory_repo.get_leaderboard('top_rated', 1)[0] is movie
+    assert in_memory_repo.get_leaderboard('highest_grossing', 1, genre_name='Comedy', year=2016)[0] is movie
+
+    with pytest.raises(RepositoryException):
+        in_memory_repo.get_leaderboard('least_liked', 10)
+
+
+def test_sorted_keys_match_a_sorted_list_across_block_splits(monkeypatch):
+    monkeypatch.setattr(leaderboards, 'BLOCK_SIZE', 4)
+    rng = random.Random(0)
+    initial = [rng.randrange(100) for _ in range(30)]
+    keys, expected = SortedKeys(initial), set(initial)
+
+    for _ in range(500):
+        key = rng.randrange(100)
+        if rng.random() < 0.6:
+            keys.add(key)
+            expected.add(key)
+        else:
+            keys.discard(key)
+            expected.discard(key)
+        assert list(keys) == sorted(expected) and len(keys) == len(expected)
+    assert keys.head(5) == sorted(expected)[:5]
+
+
+def test_rebuilt_leaderboards_match_the_incremental_ones(in_memory_repo):
+    movies = [in_memory_repo.get_movie(movie_id) for movie_id in in_memory_repo.get_all_movie_ids()]
+    incremental = Leaderboards()
+    for movie in movies:
+        incremental.add_movie(movie)
+    rebuilt = Leaderboards()
+    rebuilt.rebuild(movies)
+
+    for board in leaderboards.LEADERBOARDS:
+        for genre_name, year in ((None, None), ('Comedy', None), (None, 2016), ('comedy', 2016)):
+            top = rebuilt.top(board, 10, genre_name, year)
+            assert top == incremental.top(board, 10, genre_name, year)
+            assert top == [movie.id for movie in in_memory_repo.get_leaderboard(board, 10, genre_name, year)]
+
+
+def test_repository_counts_facets_of_a_result_set(in_memory_repo):
+    movie_ids = in_memory_repo.filter_movies(genre_name="Action")
+    facets = in_memory_repo.get_facet_counts(movie_ids, {'director': 1})
+
+    genre_counts = {facet['name']: facet['count'] for facet in facets['genre']}
+    assert genre_counts == {'Action': 3, 'Adventure': 2, 'Sci-Fi': 2, 'Comedy': 1, 'Drama': 1}
+    assert facets['director'] == [{'value': 'james gunn', 'name': 'James Gunn', 'count': 2}]
+    assert sum(facet['count'] for facet in facets['decade']) == 3
+    assert sum(facet['count'] for facet in facets['rating']) == 3
+
+    assert in_memory_repo.get_facet_counts([])['genre'] == []
+
+
+def test_repository_evaluates_boolean_queries(in_memory_repo):
+    from movies.domain.query import parse
+
+    assert in_memory_repo.query_movies(parse('(Action OR Comedy) AND NOT Drama')) == [16, 14, 13, 1]
+    assert in_memory_repo.query_movies(parse('actor:eric stonestreet AND NOT director:James Gunn')) == []
+    assert in_memory_repo.query_movies(parse('rating:7 AND decade:2010s')) == [14, 13]
+    assert in_memory_repo.query_movies(parse('votes:100000 OR runtime:80')) == [16, 14, 13, 1]
+    assert in_memory_repo.query_movies(parse('Western')) == []
+
+
+def test_repository_plans_queries_most_selective_predicate_first(in_memory_repo):
+    from movies.domain.query import parse
+    query = parse('Adventure runtime:>=100 rating:<8 director:James Gunn')
+
+    explanation = in_memory_repo.explain_query(query)
+
+    assert in_memory_repo.query_movies(query) == [13]
+    assert [stage['predicate'] for stage in explanation['stages']] == [
+        'director:"James Gunn"', 'text:"Adventure"', 'runtime:>=100', 'rating:<8']
+    assert [stage['estimate'] for stage in explanation['stages']] == [3, 4, 4, 4]
+    assert [stage['method'] for stage in explanation['stages']] == ['bitmap', 'bitmap', 'probe', 'probe']
+    assert [stage['candidates'] for stage in explanation['stages']] == [3, 3, 2, 1]
+    assert explanation['number_of_matches'] == 1
+    assert in_memory_repo.query_movies(parse('moana OR "life of pets"')) == [16, 14]
+
+
+def test_negations_of_bounded_estimates_are_bounded_by_the_catalog(in_memory_repo):
+    from movies.domain.query import parse
+
+    def estimates(text):
+        return [stage['estimate'] for stage in in_memory_repo.explain_query(parse(text))['stages']]
+
+    assert estimates('NOT Comedy') == [2]
+    assert estimates('NOT "life of pets"') == [5]
+    assert estimates('NOT (Comedy OR Action)') == [5]
+    assert in_memory_repo.query_movies(parse('NOT "life of pets"')) == [15, 14, 13, 1]
+
+
+def test_repository_shares_one_registered_entity_per_name(in_memory_repo):
+    director = in_memory_repo.get_director('James Gunn')
+
+    assert director.id is not None
+    assert all(in_memory_repo.get_movie(movie_id).director is director for movie_id in (1, 13, 16))
+    assert in_memory_repo.get_actor('Eric Stonestreet') is next(in_memory_repo.get_movie(13).actors)
+    assert in_memory_repo.get_genre('Western') is None
+
+    with pytest.raises(RepositoryException):
+        in_memory_repo.add_genre(Genre('Action'))
+
+
+def test_repository_upserts_movies_and_updates_every_index(in_memory_repo):
+    from movies.domain.query import parse
+    moana = in_memory_repo.get_movie(14)
+    make_comment('Catchy songs', in_memory_repo.get_user('thorke'), moana)
+
+    in_memory_repo.upsert_movie(Movie(14, 'Moana', 'A sea voyage.', 2016, 107, 8.4, 218151, 248.75, 81),
+                                ['Animation', 'Musical'], ['Dwayne Johnson'], 'John Musker')
+    new_movie = in_memory_repo.upsert_movie(Movie(2, 'Prometheus', 'Explorers find a clue.', 2012, 124, 7.0, 485820),
+                                            ['Sci-Fi'], ['Noomi Rapace'], 'Ridley Scott')
+
+    assert in_memory_repo.get_movie(14) is moana and moana.number_of_comments == 1
+    assert moana.rating == 8.4 and moana.director.director_name == 'John Musker'
+    assert in_memory_repo.filter_movies(genre_name='Comedy') == [16, 15]
+    assert in_memory_repo.filter_movies(genre_name='Musical') == [14]
+    assert in_memory_repo.filter_movies(director_name='Ron Clements') == []
+    assert 14 not in in_memory_repo.get_movie_ids_for_genre('Adventure')
+    assert [movie.id for movie in in_memory_repo.get_leaderboard('top_rated', 2)] == [14, 1]
+    assert in_memory_repo.query_movies(parse('rating:8..9')) == [14, 1]
+    assert in_memory_repo.query_movies(parse('voyage OR clue')) == [14, 2]
+    assert in_memory_repo.get_genre('Sci-Fi').number_of_genre_movies == 3
+    assert list(in_memory_repo.get_all_movie_ids()) == [1, 2, 13, 14, 15, 16]
+    assert new_movie.director is in_memory_repo.get_director('Ridley Scott')
+
+
+def test_loaded_users_are_hashed_with_the_configured_cost():
+    hashing.configure(iterations=1000)
+    try:
+        repository = MemoryRepository()
+        memory_repository.populate(TEST_DATA_PATH, repository)
+    finally:
+        hashing.configure()
+
+    assert repository.get_user('thorke').password.startswith('pbkdf2:sha256:1000$')
@@ -0,0 +1,106 @@
+import logging
+import os
+
+import pytest
+
+from config import BASE_DIR
+from movies import create_app
+from movies.metrics import services as metrics_services
+
+
+def test_request_timer_attributes_nested_phases_exclusively():
+    timer = metrics_services.RequestTimer()
+
+    timer.enter('serialization')
+    timer.enter('repository')
+    timer.exit()
+    timer.enter('serialization')
+    timer.exit()
+    timer.exit()
+
+    elapsed, phases = timer.finish()
+
+    assert set(phases) == {'serialization', 'repository', 'other'}
+    assert abs(sum(phases.values()) - elapsed) < 1e-6
+
+
+def test_registry_renders_prometheus_histograms():
+    registry = metrics_services.MetricsRegistry()
+    registry.record('home_bp.home', 'GET', 200, 0.003, {'render': 0.002, 'other': 0.001})
+    registry.record('home_bp.home', 'GET', 500, 0.2, {'other': 0.2}, error=True)
+
+    text = registry.render_prometheus()
+
+    assert 'movies_requests_total{endpoint="home_bp.home",method="GET",status="200"} 1' in text
+    assert 'movies_request_errors_total{endpoint="home_bp.home"} 1' in text
+    assert 'movies_request_duration_seconds_bucket{endpoint="home_bp.home",le="0.005"} 1' in text
+    assert 'movies_request_duration_seconds_bucket{endpoint="home_bp.home",le="0.25"} 2' in text
+    assert 'movies_request_duration_seconds_count{endpoint="home_bp.home"} 2' in text
+    assert 'movies_request_phase_seconds_total{endpoint="home_bp.home",phase="render"} 0.002' in text
+
+
+def test_metrics_are_off_unless_enabled(client):
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_endpoint_reports_requests_per_endpoint():
+    client = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': os.path.join(BASE_DIR, 'tests', 'data'),
+        'METRICS_ENABLED': True,
+    }).test_client()
+    client.get('/')
+    client.get('/filter_movies?genre=action')
+
+    response = client.get('/metrics')
+    text = response.data.decode()
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'movies_requests_total{endpoint="home_bp.home",method="GET",status="200"} 1' in text
+    assert 'movies_request_phase_seconds_total{endpoint="movies_bp.filter_movies",phase="repository"}' in text
+    assert 'movies_request_phase_seconds_total{endpoint="movies_bp.filter_movies",phase="render"}' in text
+
+
+def test_repository_profile_counts_calls_and_keeps_slowest():
+    profile = metrics_services.RepositoryCallProfile(slowest_kept=2)
+    profile.add('get_genres', 0.001)
+    profile.add('get_movies_by_id', 0.004)
+    profile.add('get_genres', 0.002)
+
+    assert profile.number_of_calls == 3
+    assert profile.methods['get_genres'][0] == 2
+    assert profile.methods['get_genres'][1] == pytest.approx(0.003)
+    assert profile.slowest_calls() == [('get_movies_by_id', 0.004), ('get_genres', 0.002)]
+
+
+def test_repository_profiling_header():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': os.path.join(BASE_DIR, 'tests', 'data'),
+        'REPOSITORY_PROFILING': True,
+        'REPOSITORY_PROFILING_OUTPUT': 'header',
+    })
+
+    header = app.test_client().get('/').headers['X-Repository-Calls']
+
+    assert 'get_all_movie_ids=1x' in header
+    assert 'get_genres=1x' in header
+
+
+def test_repository_profile_log_covers_streamed_responses(caplog):
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': os.path.join(BASE_DIR, 'tests', 'data'),
+        'REPOSITORY_PROFILING': True,
+        'STREAM_LISTINGS': True,
+    })
+
+    with caplog.at_level(logging.INFO, logger=app.logger.name):
+        response = app.test_client().get('/filter_movies?genre=comedy')
+        response.get_data()
+        response.close()
+
+    [logged] = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Repository calls')]
+    # The three comedies are fetched one by one while the body streams.
+    assert 'get_movie=3x' in logged
@@ -0,0 +1,51 @@
+import os
+
+from movies.utilities.profanity import ProfanityScreener, screen_comments_file
+
+
+def test_screener_matches_whole_words_only():
+    screener = ProfanityScreener(['ass', 'blow job'])
+
+    assert screener.contains_profanity('What an ass.')
+    assert not screener.contains_profanity('The assassin was a classic character')
+    assert screener.find_profanity('Blow   job!') == ['blow job']
+    assert screener.find_profanity('blow-job, ass and more ass') == ['blow job', 'ass']
+
+
+def test_screener_reports_every_word_ending_at_the_same_place():
+    screener = ProfanityScreener(['blow job', 'job', 'a blow job'])
+
+    assert screener.find_profanity('Not a blow job.') == ['a blow job', 'blow job', 'job']
+    assert screener.find_profanity('Just a job') == ['job']
+    assert ProfanityScreener(['blow job', 'job']).contains_profanity('a job')
+
+
+def test_screener_matches_leetspeak_variants():
+    screener = ProfanityScreener(['shit', 'bitch'])
+
+    assert screener.contains_profanity('sh1t happens')
+    assert screener.contains_profanity('$h*t')
+    assert screener.contains_profanity('You are a B17CH')
+    assert not screener.contains_profanity('shot, shirt and ditch')
+
+
+def test_default_wordlist_agrees_with_better_profanity():
+    from better_profanity import profanity
+    screener = ProfanityScreener.from_file()
+
+    for text in ('f*ck this', 'a$$', 'a great movie', 'Scunthorpe', 'hello world', 'bullsh1t!', '2 girls 1 cup'):
+        assert screener.contains_profanity(text) == profanity.contains_profanity(text)
+
+
+def test_screen_comments_file(tmpdir):
+    path = os.path.join(str(tmpdir), 'comments.csv')
+    with open(path, 'w') as outfile:
+        outfile.write('id,author-id,movie-id,comment-text,timestamp\n')
+        outfile.write('1,2,3,"A fine film",2020-10-01 14:31:26\n')
+        outfile.write('2,4,5,"Total sh1t, an absolute a$$ of a movie",2020-10-02 14:39:51\n')
+
+    flagged = screen_comments_file(path, ProfanityScreener(['shit', 'ass']))
+
+    assert flagged == [
+        {'id': 2, 'author_id': 4, 'movie_id': 5, 'timestamp': '2020-10-02 14:39:51', 'words': ['shit', 'ass']}
+    ]
@@ -0,0 +1,43 @@
+import pytest
+
+from movies.domain.query import parse, Term, Range, And, Or, Not, QuerySyntaxException
+
+
+def test_parse_gives_and_precedence_over_or():
+    assert parse('Action OR Comedy AND NOT Drama') == Or([
+        Term('text', 'Action'), And([Term('text', 'Comedy'), Not(Term('text', 'Drama'))])
+    ])
+
+
+def test_parse_fields_parentheses_and_multi_word_values():
+    assert parse('(Action OR Sci-Fi) AND actor:Chris Pratt AND director:"James Gunn"') == And([
+        Or([Term('text', 'Action'), Term('text', 'Sci-Fi')]),
+        Term('actor', 'Chris Pratt'),
+        Term('director', 'James Gunn'),
+    ])
+
+
+def test_parse_ranges_and_implicit_and():
+    assert parse('space adventure rating:>=7.5 year:2010..2015 actor:Chris Pratt votes:<1000') == And([
+        Term('text', 'space adventure'),
+        Range('rating', low=7.5),
+        Range('year', 2010, 2016 - 1),
+        Term('actor', 'Chris Pratt'),
+        Range('votes', high=1000, include_high=False),
+    ])
+    assert parse('rating:7') == Term('rating', '7')
+
+
+@pytest.mark.parametrize('text', ['', 'Action AND', '(Action OR Comedy', 'Action)', 'actor:', '"Chris Pratt',
+                                  'year:..', 'year:2015..2010', 'decade:1990..2000'])
+def test_parse_rejects_malformed_queries(text):
+    with pytest.raises(QuerySyntaxException):
+        parse(text)
+
+
+def test_query_lists_movies_in_the_order_filter_movies_does(in_memory_repo):
+    by_query = in_memory_repo.query_movies(parse('genre:Comedy'))
+
+    assert by_query == in_memory_repo.filter_movies(genre_name='Comedy') == [16, 15, 14]
+    assert in_memory_repo.query_movies(parse('genre:Comedy AND actor:Dwayne Johnson')) == \
+        in_memory_repo.filter_movies(actor_name='Dwayne Johnson', genre_name='Comedy')
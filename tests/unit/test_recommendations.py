@@ -0,0 +1,45 @@
+import os
+
+from config import BASE_DIR
+from movies import create_app
+from movies.movies.recommendations import SimilarMovies, build_vectors, top_neighbours, build_postings
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def test_movies_sharing_rare_features_rank_first(in_memory_repo):
+    movies = in_memory_repo.get_movies_by_id(in_memory_repo.get_all_movie_ids())
+    vectors = build_vectors(movies)
+    postings = build_postings(vectors)
+
+    for movie in movies:
+        neighbours = top_neighbours(movie.id, vectors, postings, k=3)
+        assert movie.id not in neighbours
+        assert len(neighbours) == len(set(neighbours))
+
+    # Guardians of the Galaxy and Rogue One share every genre, the director and an actor.
+    assert top_neighbours(1, vectors, postings, k=1) == [13]
+    # Moana shares the most with The Secret Life of Pets.
+    assert top_neighbours(14, vectors, postings, k=1) == [16]
+
+
+def test_parallel_build_matches_serial_build(in_memory_repo):
+    serial = SimilarMovies.build(in_memory_repo, k=3)
+    parallel = SimilarMovies.build(in_memory_repo, k=3, workers=2)
+
+    for movie_id in in_memory_repo.get_all_movie_ids():
+        assert serial.similar_to(movie_id) == parallel.similar_to(movie_id)
+
+
+def test_details_page_lists_similar_movies():
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'SIMILAR_MOVIES_BACKGROUND': False,
+    })
+    similar_movies = app.extensions['similar_movies']
+    assert similar_movies.ready
+
+    response = app.test_client().get('/details/1/')
+    assert b'Similar Movies' in response.data
@@ -1,8 +1,9 @@
 import pytest
 
+import movies.adapters.repository as repo
 from movies.authentication.services import AuthenticationException
 from movies.movies import services as news_services
-from movies.authentication import services as auth_services
+from movies.authentication import services as auth_services, hashing
 from movies.movies.services import NonExistentMovieException
 
 
@@ -165,6 +166,209 @@ def test_get_comments_for_non_existent_article(in_memory_repo):
         comments_as_dict = news_services.get_comments_for_movie(7, in_memory_repo)
 
 
+def test_get_comments_page_follows_cursor(in_memory_repo):
+    for number in range(5):
+        news_services.add_comment(16, f'Comment number {number}', 'fmercury', in_memory_repo)
+
+    page = news_services.get_comments_page(16, in_memory_repo, comments_per_page=3)
+    assert page['number_of_comments'] == 5
+    assert [comment['comment_text'] for comment in page['comments']] == [
+        'Comment number 4', 'Comment number 3', 'Comment number 2']
+
+    page = news_services.get_comments_page(16, in_memory_repo, page['next_cursor'], comments_per_page=3)
+    assert [comment['comment_text'] for comment in page['comments']] == ['Comment number 1', 'Comment number 0']
+    assert page['next_cursor'] is None
+
+    with pytest.raises(news_services.InvalidCursorException):
+        news_services.get_comments_page(16, in_memory_repo, 'not-a-cursor')
+
+
+def test_comments_endpoint_returns_pages(client):
+    response = client.get('/details/1/comments?limit=1')
+    page = response.get_json()
+    assert response.status_code == 200
+    assert len(page['comments']) == 1
+
+    response = client.get(f'/details/1/comments?limit=1&cursor={page["next_cursor"]}')
+    assert len(response.get_json()['comments']) == 1
+    assert client.get('/details/1/comments?cursor=bad').status_code == 400
+    assert client.get('/details/999999/comments').status_code == 404
+
+
+def test_get_user_activity_pages_comments(in_memory_repo):
+    for movie_id in (16, 16, 14):
+        news_services.add_comment(movie_id, f'Comment on {movie_id}', 'thorke', in_memory_repo)
+
+    activity = auth_services.get_user_activity('thorke', in_memory_repo, comments_per_page=2)
+    assert activity['number_of_comments'] == 4
+    assert activity['number_of_movies_commented'] == 3
+    assert [comment['movie_id'] for comment in activity['comments']] == [14, 16]
+
+    activity = auth_services.get_user_activity('thorke', in_memory_repo, activity['next_cursor'], 2)
+    assert [comment['movie_id'] for comment in activity['comments']] == [16, 1]
+    assert activity['next_cursor'] is None
+
+    with pytest.raises(auth_services.UnknownUserException):
+        auth_services.get_user_activity('nobody', in_memory_repo)
+
+
+def test_profile_page_lists_comments(client, auth):
+    auth.login()
+    client.post('/comment', data={'comment': 'Profile page comment', 'movieID': 14})
+
+    response = client.get('/authentication/profile')
+    assert response.status_code == 302
+
+    response = client.get('/authentication/profile/thorke')
+    assert response.status_code == 200
+    assert b'Profile page comment' in response.data
+    assert client.get('/authentication/profile/nobody').status_code == 404
+
+
+def test_comment_endpoint_rejects_profanity(client, auth):
+    auth.login()
+
+    response = client.post('/comment', data={'comment': 'What a load of sh1t', 'movieID': 14})
+
+    assert response.status_code == 200 and response.json['success'] is False
+    assert repo.repo_instance.get_movie(14).number_of_comments == 0
+    assert client.post('/comment', data={'comment': 'What a lovely film', 'movieID': 14}).json['success'] is True
+
+
+def test_leaderboard_endpoint(client):
+    response = client.get('/leaderboards/most_voted?genre=action&k=2')
+    assert response.status_code == 200
+    assert [movie['id'] for movie in response.get_json()['movies']] == [1, 13]
+    assert client.get('/leaderboards/least_liked').status_code == 404
+
+
+def test_filter_page_shows_facet_counts(client):
+    response = client.get('/filter_movies?director=james+gunn')
+    assert response.status_code == 200
+    assert b'Top directors' in response.data
+    assert b'James Gunn</a> (3)' in response.data
+
+
 def test_get_comments_for_movie_without_comments(in_memory_repo):
     comments_as_dict = news_services.get_comments_for_movie(16, in_memory_repo)
     assert len(comments_as_dict) == 0
+
+
+def test_authentication_rehashes_password_with_outdated_cost(in_memory_repo):
+    auth_services.add_user('pmccartney', 'abcd1A23', in_memory_repo)
+    old_hash = in_memory_repo.get_user('pmccartney').password
+
+    hashing.configure(iterations=1000)
+    try:
+        auth_services.authenticate_user('pmccartney', 'abcd1A23', in_memory_repo)
+
+        new_hash = in_memory_repo.get_user('pmccartney').password
+        assert new_hash != old_hash
+        assert new_hash.startswith('pbkdf2:sha256:1000$')
+        auth_services.authenticate_user('pmccartney', 'abcd1A23', in_memory_repo)
+    finally:
+        hashing.configure()
+
+
+def test_password_hasher_uses_a_bounded_process_pool():
+    hasher = hashing.PasswordHasher(iterations=1000, workers=1, max_pending=0, acquire_timeout=0.01)
+    try:
+        password_hash = hasher.hash('abcd1A23')
+        assert hasher.verify(password_hash, 'abcd1A23')
+        assert not hasher.needs_rehash(password_hash)
+
+        # With the only slot taken, callers are turned away instead of queueing.
+        hasher._slots.acquire()
+        with pytest.raises(hashing.HashingBusyException):
+            hasher.hash('abcd1A23')
+    finally:
+        hasher.shutdown()
+
+
+def test_query_movies_reports_malformed_queries(in_memory_repo):
+    assert news_services.query_movies('Animation AND NOT actor:Kevin Hart', in_memory_repo) == [14]
+
+    with pytest.raises(news_services.InvalidQueryException):
+        news_services.query_movies('year:last', in_memory_repo)
+
+
+def test_explain_query_returns_the_matches_it_explains(in_memory_repo):
+    movie_ids, explanation = news_services.explain_query('Comedy rating:>=7', in_memory_repo)
+
+    assert movie_ids == news_services.query_movies('Comedy rating:>=7', in_memory_repo) == [14]
+    assert explanation['number_of_matches'] == 1
+
+
+def test_search_page_explains_the_plan(client, monkeypatch):
+    from movies.adapters.query_planner import QueryPlanner
+    runs = list()
+    execute = QueryPlanner.execute
+    monkeypatch.setattr(QueryPlanner, 'execute', lambda self, expression: runs.append(expression) or execute(
+        self, expression))
+
+    response = client.get('/search?q=Comedy+rating:>=7&explain=1')
+    html = response.get_data(as_text=True)
+    assert len(runs) == 1
+
+    assert response.status_code == 200
+    assert 'Moana' in html and 'Colossal' not in html
+    assert 'Plan:' in html
+
+    response = client.get('/search?q=rating:..')
+    assert 'Could not read the query' in response.get_data(as_text=True)
+
+
+def test_listings_stream_sidebar_first_with_configured_page_size():
+    import os
+    from config import BASE_DIR
+    from movies import create_app
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': os.path.join(BASE_DIR, "tests", "data"),
+        'WTF_CSRF_ENABLED': False,
+        'PASSWORD_HASH_BENCHMARK': False,
+        'SIMILAR_MOVIES_ENABLED': False,
+        'MOVIES_PER_PAGE': 2,
+        'STREAM_LISTINGS': True,
+    })
+    response = app.test_client().get('/', buffered=False)
+
+    assert response.is_streamed
+    chunks = list(response.response)
+    html = ''.join(chunk if isinstance(chunk, str) else chunk.decode() for chunk in chunks)
+    assert len(chunks) > 1
+    assert html.index('Selected Movies') < html.index('class="blog_main"')
+    assert html.count('class="blog_main"') == 2
+    assert '/?cursor=2' in html
+
+    response = app.test_client().get('/filter_movies?genre=comedy&cursor=2', buffered=False)
+    assert response.is_streamed
+    html = response.get_data(as_text=True)
+    assert html.count('class="blog_main"') == 1 and html.rstrip().endswith('</html>')
+
+
+def test_pages_render_cached_forms_with_a_session_csrf_token():
+    import os
+    import re
+    from config import BASE_DIR
+    from movies import create_app
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': os.path.join(BASE_DIR, "tests", "data"),
+        'PASSWORD_HASH_BENCHMARK': False,
+        'SIMILAR_MOVIES_ENABLED': False,
+    })
+    client = app.test_client()
+
+    html = client.get('/').get_data(as_text=True)
+    assert '<input id="login-username" name="username" required type="text" value="">' in html
+    assert '<label for="register-password">Password</label>' in html
+    assert '<input id="genre" name="genre" placeholder="Genre" type="text" value="">' in html
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', html).group(1)
+
+    response = client.post('/filter_movies', data={'csrf_token': token, 'genre': 'Comedy'})
+    assert response.status_code == 302 and 'genre=Comedy' in response.headers['Location']
+    response = client.post('/authentication/login',
+                           data={'csrf_token': token, 'username': 'thorke', 'password': 'cLQ^C#oFXloS'})
+    assert response.status_code == 302
+    assert 'thorke' in client.get('/').get_data(as_text=True)
@@ -0,0 +1,74 @@
+import os
+import threading
+
+from config import BASE_DIR
+from movies import create_app
+from movies.utilities.startup import Warmup, parse_import_times
+
+TEST_DATA_PATH = os.path.join(BASE_DIR, "tests", "data")
+
+
+def test_parse_import_times():
+    output = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |     _io',
+        'import time:      1500 |       2500 | flask',
+        'Some other line',
+    ])
+
+    assert parse_import_times(output) == [('_io', 2, 0.00012, 0.00012), ('flask', 0, 0.0015, 0.0025)]
+
+
+def test_warmup_in_the_background_is_ready_once_its_tasks_ran():
+    timings = dict()
+    warmup = Warmup(timings)
+    release = threading.Event()
+    ran = list()
+    warmup.add('slow', release.wait)
+    warmup.add('failing', lambda: 1 / 0)
+    warmup.add('last', lambda: ran.append('last'))
+
+    warmup.start(background=True)
+    assert not warmup.ready
+    release.set()
+
+    assert warmup.wait(5)
+    assert ran == ['last'] and set(timings) == {'slow', 'failing', 'last'}
+    assert not warmup.failed and warmup.failures == {'failing': 'division by zero'}
+
+
+def test_warmup_stops_at_a_failing_required_task():
+    warmup = Warmup(dict())
+    ran = list()
+    warmup.add('optional', lambda: 1 / 0)
+    warmup.add('required', lambda: 1 / 0, required=True)
+    warmup.add('last', lambda: ran.append('last'))
+
+    warmup.start(background=True)
+
+    assert warmup.wait(5)
+    assert warmup.failed and set(warmup.failures) == {'optional', 'required'} and ran == []
+
+
+def test_fast_start_loads_the_catalog_after_create_app():
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': TEST_DATA_PATH, 'WTF_CSRF_ENABLED': False,
+                      'FAST_START': True})
+    client = app.test_client()
+
+    response = client.get('/')  # Waits for the catalog.
+
+    assert response.status_code == 200 and 'Guardians of the Galaxy' in response.get_data(as_text=True)
+    assert client.get('/health').json == {'status': 'ok', 'generation': 2}
+    assert 'populate.movies' in app.extensions['startup_timings']
+
+
+def test_fast_start_answers_503_when_the_catalog_fails_to_load(tmpdir):
+    app = create_app({'TESTING': True, 'TEST_DATA_PATH': str(tmpdir), 'WTF_CSRF_ENABLED': False,
+                      'FAST_START': True})
+    client = app.test_client()
+
+    assert client.get('/').status_code == 503  # Waits for the catalog, which isn't there.
+
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.json['status'] == 'failed' and 'repository' in response.json['failures']
@@ -1,9 +1,130 @@
 from flask_script import Manager
 
+import json
+import sys
+import urllib.error
+import urllib.request
+
 from movies import create_app
+import movies.adapters.repository as repo
+from movies.movies import export, services
+from movies.utilities import assets, profanity, startup
 
 app = create_app()
 manager = Manager(app)
 
+
+@manager.option('path', help='Comments CSV file to screen')
+def screen_comments(path):
+    """Lists the comments in a comments CSV file that contain profanity."""
+    flagged = profanity.screen_comments_file(path)
+    for comment in flagged:
+        print(f"{comment['id']},{comment['author_id']},{comment['movie_id']},{'|'.join(comment['words'])}")
+    print(f'{len(flagged)} comments contain profanity')
+
+
+@manager.option('-f', '--format', dest='export_format', default=export.CSV, choices=export.EXPORT_FORMATS,
+                help='csv (the columns of movies.csv) or jsonl')
+@manager.option('-g', '--genre', dest='genre', default='')
+@manager.option('-a', '--actor', dest='actor', default='')
+@manager.option('-d', '--director', dest='director', default='')
+@manager.option('-q', '--query', dest='query', default='', help='Advanced search query, e.g. "Sci-Fi year:>=2010"')
+@manager.option('-o', '--output', dest='output', default=None, help='File to write (default: standard output)')
+@manager.option('-z', '--gzip', dest='compress', action='store_true', help='Compress the export with gzip')
+def export_movies(export_format, genre, actor, director, query, output, compress):
+    """Exports the movies matching a filter or query as CSV or JSON Lines."""
+    try:
+        movie_ids = services.select_movie_ids(genre, actor, director, query, repo.repo_instance)
+    except services.InvalidQueryException as exception:
+        print(f'Invalid query: {exception}', file=sys.stderr)
+        return 1
+
+    chunks = export.export_movies(movie_ids, repo.repo_instance, export_format)
+    chunks = export.gzip_chunks(chunks) if compress else (chunk.encode('utf-8') for chunk in chunks)
+    outfile = open(output, 'wb') if output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            outfile.write(chunk)
+    finally:
+        if output:
+            outfile.close()
+        else:
+            outfile.flush()
+    print(f'Exported {len(movie_ids)} movies', file=sys.stderr)
+
+
+@manager.option('path', help='CSV file of new or changed movies, with the columns of movies.csv')
+@manager.option('-u', '--url', dest='url', default='http://localhost:5000/admin/import',
+                help='Import endpoint of the running application')
+@manager.option('-t', '--token', dest='token', default=None, help='Admin token (default: ADMIN_TOKEN)')
+def import_movies(path, url, token):
+    """Sends new or changed movies to a running application, which adds them without restarting."""
+    token = token or app.config.get('ADMIN_TOKEN')
+    if not token:
+        print('No admin token: set ADMIN_TOKEN or pass --token', file=sys.stderr)
+        return 1
+    with open(path, 'rb') as infile:
+        request = urllib.request.Request(url, data=infile.read(), method='POST', headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'text/csv',
+        })
+    try:
+        with urllib.request.urlopen(request) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as exception:
+        print(f'Import failed: {exception.code} {exception.reason}', file=sys.stderr)
+        return 1
+    for error in result['errors']:
+        print(f"Line {error['line']} skipped: {error['error']}", file=sys.stderr)
+    print(f"Added {result['added']} and updated {result['updated']} movies")
+
+
+@manager.option('-u', '--url', dest='url', default='http://localhost:5000/admin/reload',
+                help='Reload endpoint of the running application')
+@manager.option('-t', '--token', dest='token', default=None, help='Admin token (default: ADMIN_TOKEN)')
+def reload_catalog(url, token):
+    """Asks a running application to reload its catalog from the data files, keeping users and comments."""
+    token = token or app.config.get('ADMIN_TOKEN')
+    if not token:
+        print('No admin token: set ADMIN_TOKEN or pass --token', file=sys.stderr)
+        return 1
+    request = urllib.request.Request(url, data=b'', method='POST', headers={'Authorization': f'Bearer {token}'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            status = json.load(response)
+    except urllib.error.HTTPError as exception:
+        print(f'Reload failed: {exception.code} {exception.reason}', file=sys.stderr)
+        return 1
+    print(f"Reloading as generation {status['generation'] + 1}, check progress with GET {url}")
+
+
+@manager.option('-n', '--top', dest='top', default=15, type=int, help='Number of imports to list')
+@manager.option('--fast-start', dest='fast_start', action='store_true', help='Profile with FAST_START on')
+def profile_startup(top, fast_start):
+    """Times a fresh start of the application: its imports, create_app and each startup phase."""
+    profile = startup.profile_startup(fast_start, top)
+    print(f"Imports     {profile['imports'] * 1000:8.1f} ms")
+    print(f"create_app  {profile['create_app'] * 1000:8.1f} ms")
+    print(f"Ready after {profile['ready'] * 1000:8.1f} ms")
+    print('\nStartup phases:')
+    for phase, seconds in profile['phases'].items():
+        print(f'  {seconds * 1000:8.1f} ms  {phase}')
+    print('\nImports by package:')
+    for package, seconds in profile['packages']:
+        print(f'  {seconds * 1000:8.1f} ms  {package}')
+    print('\nSlowest modules (own import time):')
+    for module, seconds in profile['slowest_imports']:
+        print(f'  {seconds * 1000:8.1f} ms  {module}')
+
+
+@manager.option('-s', '--static-folder', dest='static_folder', default=app.static_folder,
+                help='Static folder to build (default: the application\'s)')
+def build_assets(static_folder):
+    """Writes fingerprinted, precompressed copies of the static files and the manifest the templates use."""
+    manifest = assets.build_assets(static_folder)
+    compression = 'gzip and brotli' if assets.brotli is not None else 'gzip (install brotli for brotli too)'
+    print(f'Built {len(manifest)} static files with {compression} variants into {assets.BUILD_DIRECTORY}/')
+
+
 if __name__ == "__main__":
     manager.run()